@@ -6,6 +6,9 @@ from app.db.session import get_db
 from app import crud
 from app.schemas import user_schema, token_schema
 from app.core import security
+from app.core.auth_cache import user_cache
+from app.api.deps import get_current_user
+from app.models.user_models import User
 
 router = APIRouter()
 
@@ -14,13 +17,14 @@ router = APIRouter()
     response_model=user_schema.User, 
     status_code=status.HTTP_201_CREATED
 )
-def register_user(
+async def register_user(
     *,
     db: Session = Depends(get_db),
     user_in: user_schema.UserCreate
 ):
     """
     Registra um novo usuário (profissional de saúde).
+    O hash da senha roda no executor do bcrypt (503 se estiver saturado).
     """
     user = crud.get_by_email(db, email=user_in.email)
     if user:
@@ -29,12 +33,16 @@ def register_user(
             detail="Um usuário com este email já existe.",
         )
     
-    user = crud.create_user(db, user_in=user_in)
+    # Libera a conexão do pool antes de esperar o bcrypt: em uma rajada de
+    # cadastros/logins, conexões presas aqui esgotariam o pool
+    db.rollback()
+    hashed_password = await security.get_password_hash_async(user_in.password)
+    user = crud.create_user(db, user_in=user_in, hashed_password=hashed_password)
     return user
 
 
 @router.post("/login", response_model=token_schema.Token)
-def login_for_access_token(
+async def login_for_access_token(
     *,
     db: Session = Depends(get_db),
     login_data: user_schema.UserLogin # Recebe o JSON {email, password}
@@ -42,19 +50,30 @@ def login_for_access_token(
     """
     Autentica um usuário e retorna um token de acesso.
     Corresponde ao api.ts
+    O bcrypt roda no executor dedicado (503 se estiver saturado).
     """
     # 1. Busca o usuário pelo email
     user = crud.get_by_email(db, email=login_data.email)
 
     # 2. Verifica se o usuário existe E se a senha está correta
-    if not user or not security.verify_password(
-        login_data.password, user.hashed_password
-    ):
+    verified, new_hash = False, None
+    if user:
+        hashed_password = user.hashed_password
+        # Libera a conexão do pool antes de esperar o bcrypt (veja register_user)
+        db.rollback()
+        verified, new_hash = await security.verify_and_update_password(
+            login_data.password, hashed_password
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou senha incorretos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # 2.1 O BCRYPT_ROUNDS mudou: regrava o hash com o custo atual
+    if new_hash:
+        crud.update_password_hash(db, user=user, hashed_password=new_hash)
     
     # 3. Cria o token JWT
     access_token = security.create_access_token(
@@ -66,5 +85,14 @@ def login_for_access_token(
         "token_type": "bearer"
     }
 
+@router.get("/cache/stats")
+def auth_cache_stats(
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """
+    Contadores do cache de usuários autenticados (acertos, falhas, despejos).
+    """
+    return user_cache.stats()
+
 # NOTA: Os endpoints /forgot-password e /reset-password do seu api.ts
 # podem ser adicionados aqui seguindo um padrão similar.
\ No newline at end of file
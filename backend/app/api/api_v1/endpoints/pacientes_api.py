@@ -1,16 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Literal, Optional, List
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.response_cache import response_cache
+from app.core.responses import FastJSONResponse, etag_matches, not_modified
+from app.db.session import get_db, get_db_for_async_endpoints
 from app.api.deps import get_current_user
 from app.models.user_models import User # Necessário para a dependência
 from app.schemas import paciente_schema
-from app.services import paciente_service
+from app.services import paciente_service, paciente_import_service, paciente_export_service
+from app.services.llm_cache import llm_action_cache
 from app.crud import crud_paciente as crud
+from app.crud import crud_paciente_stats as crud_stats
 
 router = APIRouter()
 
+# Rota do detalhe no cache de respostas (também o rótulo das estatísticas)
+DETAIL_CACHE_ROUTE = "GET /pacientes/{id}"
+
+
+def _paciente_response(
+    paciente, response: Response, status_code: int = status.HTTP_200_OK
+):
+    """
+    Com FAST_JSON, serializa o paciente direto para bytes (mesmo JSON do
+    response_model); senão, devolve o objeto para o FastAPI validar.
+    Nos dois casos a resposta leva o ETag da versão do paciente.
+    """
+    etag = paciente_service.paciente_etag(paciente.id, paciente.version)
+    if not settings.FAST_JSON:
+        response.headers["ETag"] = etag
+        return paciente
+    return FastJSONResponse(
+        paciente_service.paciente_to_dict(paciente), status_code=status_code,
+        headers={"ETag": etag}
+    )
+
 @router.post(
     "/", 
     response_model=paciente_schema.Paciente,
@@ -18,25 +46,54 @@ router = APIRouter()
 )
 async def create_paciente_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_for_async_endpoints), # AsyncSession se DB_ASYNC=true
     paciente_in: paciente_schema.PacienteCreate, # O JSON do frontend
+    response: Response,
     current_user: User = Depends(get_current_user) # Rota protegida
 ):
     """
-    Cria um novo paciente e dispara o fluxo de orquestração (ML/LLM).
+    Cria um novo paciente e agenda o fluxo de orquestração (ML/LLM).
     Corresponde ao 'createPaciente' do api.ts.
+    A resposta volta com 'orchestration_status' = 'pending'; o resultado
+    pode ser acompanhado em GET /{id}/orchestration.
     """
-    # Note que esta função é 'async' porque ela 'await' (espera)
-    # o serviço de orquestração, que faz chamadas de rede (HTTP).
     db_paciente = await paciente_service.create_paciente_with_orchestration(
         db, paciente_in=paciente_in
     )
-    return db_paciente
+    return _paciente_response(db_paciente, response, status.HTTP_201_CREATED)
+
+
+@router.post(
+    "/bulk",
+    response_model=paciente_schema.BulkImportResponse
+)
+async def bulk_import_pacientes_endpoint(
+    *,
+    db: Session = Depends(get_db), # Usada em threads pelo import (não bloqueia o loop)
+    request: Request,
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """
+    Importa pacientes em massa (onboarding de clínicas).
+    Aceita o corpo como lista JSON (application/json), NDJSON
+    (application/x-ndjson) ou CSV com cabeçalho (text/csv), lido em streaming.
+    Cada linha é validada como PacienteCreate; erros são reportados por linha.
+    """
+    rows = paciente_import_service.parse_body(
+        request.stream(), request.headers.get("content-type", "")
+    )
+    if rows is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use application/json, application/x-ndjson ou text/csv",
+        )
+    return await paciente_import_service.import_pacientes(db, rows)
 
 
 @router.get(
     "/",
-    response_model=paciente_schema.PacienteListResponse
+    response_model=paciente_schema.PacienteSummaryListResponse,
+    response_model_exclude_unset=True # Só os campos pedidos em 'fields'/'view'
 )
 def list_pacientes_endpoint(
     *,
@@ -45,62 +102,239 @@ def list_pacientes_endpoint(
     page: int = Query(1, ge=1), 
     page_size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
+    # Cursor opaco (meta.next_cursor/prev_cursor); quando enviado, 'page' é ignorado
+    cursor: Optional[str] = Query(None),
+    # Campos de cada item, separados por vírgula (ex.: "id,nome,risco_diabetes")
+    fields: Optional[str] = Query(None),
+    # "summary": projeção leve (sem o texto do LLM); padrão: paciente completo
+    view: Literal["full", "summary"] = Query("full"),
+    if_none_match: Optional[str] = Header(None),
+    response: Response,
     current_user: User = Depends(get_current_user) # Rota protegida
 ):
     """
     Lista pacientes com paginação e busca.
     Corresponde ao 'fetchPacientes' do api.ts.
+    Os itens são pacientes completos, como sempre; 'view=summary' devolve
+    uma projeção leve (sem o texto do LLM) e 'fields' escolhe os campos.
+    A resposta traz um ETag; com If-None-Match igual, volta 304 sem corpo
+    (a checagem lê só id/versão dos pacientes da página).
     """
     # O service.py já formata a resposta como o frontend espera
-    return paciente_service.get_pacientes_paginados(
-        db, page=page, page_size=page_size, search=search
+    params = dict(
+        page=page, page_size=page_size, search=search, cursor=cursor, fields=fields, view=view
     )
+    try:
+        if if_none_match:
+            etag = paciente_service.get_pacientes_etag(db, **params)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        result, etag = paciente_service.get_pacientes_page(db, **params)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    # Os itens já são dicts só com os campos pedidos: com FAST_JSON vão
+    # direto para o JSON, sem passar pelo response_model
+    if settings.FAST_JSON:
+        return FastJSONResponse(result, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return result
 
 
     return paciente
 
 
+# Declaradas antes de "/{id}" para não serem capturadas por ela
+@router.get("/stats", response_model=paciente_schema.PacienteStats)
+def get_pacientes_stats_endpoint(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """
+    Totais para o dashboard: risco, orquestrações pendentes, faixa etária
+    e sexo. Lidos da tabela agregada 'paciente_stats', sem varrer 'pacientes'.
+    """
+    return crud_stats.get_stats(db)
+
+
+@router.get("/export")
+def export_pacientes_endpoint(
+    *,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    search: Optional[str] = Query(None),
+    gzip: bool = Query(False, description="Compacta a saída com gzip"),
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """
+    Exporta todos os pacientes (ou os da busca) em NDJSON ou CSV.
+    As linhas saem do banco em lotes direto para a resposta, sem paginação
+    nem COUNT, então a memória não cresce com o tamanho da tabela.
+    """
+    filename = f"pacientes.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else paciente_export_service.MEDIA_TYPES[format]
+    return StreamingResponse(
+        paciente_export_service.iter_export(format, search=search, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/llm-cache/stats")
+def llm_cache_stats(
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """
+    Contadores do cache de ações do LLM (acertos em memória/banco, falhas,
+    latência economizada). Também expostos em GET /metrics (llm_cache_*).
+    """
+    return llm_action_cache.stats()
+
+
+def _paciente_body(paciente) -> bytes:
+    """O JSON do paciente, idêntico ao que o response_model geraria."""
+    if settings.FAST_JSON:
+        return FastJSONResponse(paciente_service.paciente_to_dict(paciente)).body
+    return JSONResponse(
+        paciente_schema.Paciente.model_validate(paciente, from_attributes=True)
+        .model_dump(mode="json")
+    ).body
+
+
+@router.get("/response-cache/stats")
+def response_cache_stats(
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """Contadores do cache de respostas (acertos/falhas por rota)."""
+    return response_cache.stats()
+
+
 @router.get("/{id}", response_model=paciente_schema.Paciente)
 def get_paciente_by_id_endpoint(
     *,
     db: Session = Depends(get_db),
     id: int,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user) # Rota protegida
 ):
     """
     Busca um único paciente pelo ID.
     Corresponde ao 'getPacienteById' do api.ts.
+    A resposta traz um ETag; com If-None-Match igual, volta 304 sem corpo
+    (a checagem lê só a versão, sem carregar o paciente).
+    O JSON serializado fica no cache de respostas até a próxima escrita
+    no paciente.
     """
+    cached = response_cache.get(DETAIL_CACHE_ROUTE, id)
+    if cached is not None:
+        etag, body = cached
+        if if_none_match and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+
+    if if_none_match:
+        version = crud.get_version(db, id=id)
+        if version is not None:
+            etag = paciente_service.paciente_etag(id, version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+    generation = response_cache.generation
     paciente = crud.get_by_id(db, id=id)
     if not paciente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Paciente não encontrado",
         )
-    return paciente
+    etag = paciente_service.paciente_etag(paciente.id, paciente.version)
+    body = _paciente_body(paciente)
+    response_cache.set(DETAIL_CACHE_ROUTE, id, etag, body, generation=generation)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get(
+    "/{id}/orchestration",
+    response_model=paciente_schema.OrchestrationStatus
+)
+def get_orchestration_status_endpoint(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: User = Depends(get_current_user) # Rota protegida
+):
+    """
+    Consulta o estado da orquestração (ML/LLM) de um paciente.
+    Usado pelo frontend para polling após criar/atualizar.
+    """
+    orchestration = paciente_service.get_orchestration_status(db, id=id)
+    if not orchestration:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado",
+        )
+    return orchestration
+
+
+@router.get("/{id}/acoes/stream")
+def stream_acoes_endpoint(
+    *,
+    db: Session = Depends(get_db),
+    id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Envia as ações do paciente por Server-Sent Events, à medida que o LLM
+    as gera. Eventos: 'status', 'token' (trecho), 'done' (texto completo,
+    já salvo em 'acoes_geradas_llm') e 'error'. O 'data' é uma string JSON.
+    """
+    if not crud.get_by_id(db, id=id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paciente não encontrado",
+        )
+
+    async def event_stream():
+        async for event, data in paciente_service.stream_acoes(id):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.put("/{id}", response_model=paciente_schema.Paciente)
 async def update_paciente_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_for_async_endpoints), # AsyncSession se DB_ASYNC=true
     id: int,
     paciente_in: paciente_schema.PacienteCreate,
+    force: bool = Query(False, description="Re-executa o ML/LLM mesmo sem mudança nas features"),
+    if_match: Optional[str] = Header(None),
+    response: Response,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Atualiza um paciente e re-executa o fluxo de orquestração (ML/LLM).
+    Atualiza um paciente e re-agenda o fluxo de orquestração (ML/LLM).
     Corresponde ao 'updatePaciente' do api.ts.
+    Se só mudaram campos que o ML não usa (nome, email, endereço...), os
+    resultados atuais são mantidos; use '?force=true' para re-executar.
+    Com If-Match (ETag de um GET anterior), responde 412 se o paciente
+    tiver sido alterado nesse meio-tempo.
     """
     paciente = await paciente_service.update_paciente_with_orchestration(
-        db, id=id, paciente_in=paciente_in
+        db, id=id, paciente_in=paciente_in, force=force,
+        versions=paciente_service.if_match_versions(if_match, id)
     )
     if not paciente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Paciente não encontrado",
         )
-    return paciente
+    return _paciente_response(paciente, response)
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -108,11 +342,13 @@ def delete_paciente_endpoint(
     *,
     db: Session = Depends(get_db),
     id: int,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     Remove um paciente.
     Corresponde ao 'deletePaciente' do api.ts.
+    Com If-Match, responde 412 se o paciente tiver sido alterado.
     """
     paciente = crud.get_by_id(db, id=id)
     if not paciente:
@@ -120,4 +356,7 @@ def delete_paciente_endpoint(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Paciente não encontrado",
         )
+    versions = paciente_service.if_match_versions(if_match, id)
+    if versions is not None and not crud.lock_version(db, id=id, versions=versions):
+        raise paciente_service.PreconditionFailed()
     crud.remove(db, id=id)
\ No newline at end of file
@@ -5,6 +5,7 @@ from jose import jwt
 
 from app.core.config import settings
 from app.core import security
+from app.core.auth_cache import user_cache
 from app.db.session import get_db
 from app import crud
 from app.models.user_models import User
@@ -18,6 +19,7 @@ def get_current_user(
 ) -> User:
     """
     Dependência para obter o usuário logado a partir do token JWT.
+    Tokens já verificados ficam no 'user_cache' (sem decode nem consulta).
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -25,6 +27,11 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    # 0. Token já verificado recentemente?
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+
     # 1. Decodifica o token
     payload = security.decode_access_token(token)
     if payload is None:
@@ -36,7 +43,8 @@ def get_current_user(
     
     # 2. Busca o usuário no banco
     user = crud.get_by_email(db, email=email)
-    if user is None:
+    if user is None or not user.is_active:
         raise credentials_exception
-        
+
+    user_cache.set(token, user, token_exp=payload.get("exp"))
     return user
\ No newline at end of file
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from app.core.config import settings
+from app.models.user_models import User
+
+
+class AuthenticatedUserCache:
+    """
+    Cache LRU com TTL de tokens já verificados -> dados do usuário.
+
+    Evita o 'jwt.decode' e a ida ao banco do get_current_user em cada
+    requisição. A chave é o SHA-256 do token (o token em si não fica na
+    memória) e cada entrada expira no que vier primeiro: o TTL configurado
+    ou o 'exp' do próprio token.
+
+    Guarda apenas os valores das colunas; cada acerto devolve um novo
+    objeto User (transiente), nunca uma instância compartilhada entre threads.
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_email: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[User]:
+        """Retorna o usuário do token, se estiver no cache e não expirado."""
+        if self.maxsize <= 0:
+            return None
+        key = self._key(token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, values = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return User(**values)
+
+    def set(self, token: str, user: User, token_exp: Optional[float] = None) -> None:
+        """
+        Guarda o usuário do token. 'token_exp' é o 'exp' do JWT (epoch em
+        segundos); a entrada nunca vive além dele.
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+
+        key = self._key(token)
+        values = {
+            "id": user.id,
+            "email": user.email,
+            "hashed_password": user.hashed_password,
+            "is_active": user.is_active,
+        }
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, values)
+            self._keys_by_email.setdefault(user.email, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, email: str) -> None:
+        """
+        Remove todos os tokens em cache de um usuário.
+        Deve ser chamado quando o usuário é desativado ou troca a senha.
+        """
+        with self._lock:
+            for key in list(self._keys_by_email.get(email, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_email.clear()
+
+    def stats(self) -> dict:
+        """Contadores para acompanhar a eficácia do cache em produção."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: str) -> None:
+        """Remove uma entrada (chamar com o lock adquirido)."""
+        _, values = self._entries.pop(key)
+        keys = self._keys_by_email.get(values["email"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_email[values["email"]]
+
+
+# Instância única usada pelo get_current_user
+user_cache = AuthenticatedUserCache(
+    maxsize=settings.AUTH_CACHE_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+)
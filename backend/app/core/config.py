@@ -1,27 +1,162 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     # Banco de Dados
     DATABASE_URL: str
 
+    # Camada assíncrona do banco (AsyncSession com asyncpg/aiosqlite).
+    # Desligada por padrão; se ASYNC_DATABASE_URL ficar vazia, ela é
+    # derivada da DATABASE_URL trocando o driver.
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Cria tabelas, índices de busca e estatísticas no startup do app.
+    # Desligado por padrão (o import/startup não mexe no schema); em
+    # produção rode 'python -m app.db.init_db' antes do deploy.
+    DB_INIT_ON_STARTUP: bool = False
+
     # Segurança JWT
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Hashing de senha (bcrypt): custo e executor dedicado.
+    # Acima de WORKERS + QUEUE_SIZE operações simultâneas, login e cadastro
+    # respondem 503 na hora em vez de esperar.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+
+    # Cache de usuários autenticados (token -> usuário) no get_current_user.
+    # AUTH_CACHE_SIZE=0 desliga o cache.
+    # Só 'crud.set_active' / 'crud.update_password' invalidam as entradas:
+    # um usuário desativado (ou com a senha trocada) direto no banco, ou por
+    # outro processo ('python -m app.db.manage_user'), segue autenticado com
+    # os tokens em cache por até AUTH_CACHE_TTL_SECONDS.
+    AUTH_CACHE_SIZE: int = 1024
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+
+    # Cache das respostas de detalhe do paciente (GET /pacientes/{id}),
+    # invalidado a cada escrita no paciente. RESPONSE_CACHE_SIZE=0 desliga.
+    RESPONSE_CACHE_SIZE: int = 2048
+    RESPONSE_CACHE_TTL_SECONDS: float = 300.0
+
+    # Métricas Prometheus em GET /metrics (latência por rota, ML/LLM, banco)
+    METRICS_ENABLED: bool = True
+
+    # Perfil das consultas SQL por requisição/job (cabeçalho Server-Timing,
+    # log de consultas lentas e de consultas repetidas, indício de N+1)
+    SQL_PROFILING: bool = False
+    SQL_SLOW_QUERY_MS: float = 100.0
+    SQL_REPEATED_QUERY_THRESHOLD: int = 5
+
+    # Logs estruturados (JSON por linha), escritos fora do event loop
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000 # Fila cheia descarta registros (não bloqueia)
+    # Fração registrada das mensagens de caminhos quentes (ex.: por paciente)
+    LOG_HOT_PATH_SAMPLE_RATE: float = 0.1
+
     # Microserviços
     ML_SERVICE_URL: str
     LLM_SERVICE_URL: str
+    # Endpoint de classificação em lote (recomendado para a importação em
+    # massa e a re-classificação). Sem ele, o lote vira uma chamada ao
+    # ML_SERVICE_URL por paciente, no máximo ML_PER_ITEM_CONCURRENCY por vez.
+    ML_BATCH_SERVICE_URL: Optional[str] = None
+    ML_PER_ITEM_CONCURRENCY: int = 8
+    # Versão do modelo de ML em produção, gravada em cada paciente classificado
+    # (se o serviço não informar 'model_version' na resposta). Ao trocar de
+    # modelo, rode 'python -m app.services.rescoring_service'.
+    ML_MODEL_VERSION: str = "v1"
+
+    # Scorer local (NumPy) sobre os campos clínicos, ajustado na população
+    # atual (app/services/local_scorer.py). Modos:
+    #   off: desligado (ML fora do ar adia a orquestração, sem resultado);
+    #   fallback: com o ML fora do ar, grava um resultado local provisório;
+    #   prescreen: também grava o resultado local no cadastro/edição, antes do ML.
+    LOCAL_SCORER_MODE: str = "fallback"
+    LOCAL_SCORER_OUTLIER_FRACTION: float = 0.1 # Fração da população marcada como outlier
+    LOCAL_SCORER_MIN_POPULATION: int = 50 # Abaixo disso o scorer não é ajustado
+    LOCAL_SCORER_FIT_SAMPLE: int = 50000 # Pacientes mais recentes usados no ajuste
+    LOCAL_SCORER_REFIT_SECONDS: float = 3600.0
+    # Endpoint do LLM que devolve o texto em streaming (chunked ou SSE),
+    # usado por GET /pacientes/{id}/acoes/stream. Sem ele, o texto é
+    # gerado pelo LLM_SERVICE_URL e enviado de uma vez.
+    LLM_STREAM_URL: Optional[str] = None
+
+    # Clientes HTTP dos microserviços: pool, timeouts (segundos) e novas
+    # tentativas por serviço. ML_HEDGE_DELAY_MS > 0 liga as requisições
+    # "hedged" no ML (segunda chamada se a primeira passar desse tempo).
+    ML_MAX_CONNECTIONS: int = 20
+    ML_CONNECT_TIMEOUT: float = 2.0
+    ML_READ_TIMEOUT: float = 10.0
+    ML_RETRIES: int = 2
+    ML_HEDGE_DELAY_MS: float = 0
+    LLM_MAX_CONNECTIONS: int = 10
+    LLM_CONNECT_TIMEOUT: float = 2.0
+    LLM_READ_TIMEOUT: float = 60.0
+    LLM_RETRIES: int = 1
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.2      # Base do backoff exponencial
+    HTTP_RETRY_BACKOFF_MAX_SECONDS: float = 2.0
+
+    # Chamadas idênticas simultâneas ao ML/LLM são agrupadas em uma só;
+    # limite de chaves em andamento (acima disso, não agrupa)
+    SINGLE_FLIGHT_MAX_KEYS: int = 1024
+
+    # Disjuntor: após N falhas seguidas, o serviço é dado como fora por
+    # RESET_SECONDS e a orquestração fica 'deferred' sem esperar timeouts
+    CIRCUIT_BREAKER_FAILURES: int = 5
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Cache das ações geradas pelo LLM (memória + tabela 'llm_action_cache').
+    # Trocar LLM_CACHE_VERSION (novo modelo ou prompt) invalida as entradas antigas.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_VERSION: str = "v1"
+    LLM_CACHE_MEMORY_SIZE: int = 1024         # Entradas no LRU em memória
+    LLM_CACHE_MAX_ENTRIES: int = 100_000      # Entradas na tabela
+    LLM_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+
+    # Fila de orquestração (ML/LLM em segundo plano)
+    ORCHESTRATION_WORKERS: int = 4          # Nº de workers concorrentes
+    ORCHESTRATION_QUEUE_SIZE: int = 1000    # Tamanho máximo da fila em memória
+    ORCHESTRATION_POLL_INTERVAL: float = 5.0  # Segundos entre varreduras de jobs pendentes
+    # Job 'deferred' (ML/LLM fora do ar) volta depois de DEFER_SECONDS, e a
+    # espera dobra a cada tentativa (até DEFER_MAX_SECONDS). Com
+    # MAX_ATTEMPTS tentativas sem sucesso, o job passa a 'failed'.
+    ORCHESTRATION_DEFER_SECONDS: float = 30.0
+    ORCHESTRATION_DEFER_MAX_SECONDS: float = 3600.0
+    ORCHESTRATION_MAX_ATTEMPTS: int = 8
+    # Cada processo renova o heartbeat dos jobs que assumiu; jobs 'running'
+    # sem heartbeat há ORCHESTRATION_STALE_SECONDS (processo morreu) voltam
+    # para a fila. Com vários workers do uvicorn, um não mexe nos jobs do outro.
+    ORCHESTRATION_HEARTBEAT_SECONDS: float = 10.0
+    ORCHESTRATION_STALE_SECONDS: float = 60.0
+
+    # Busca de pacientes: similaridade mínima por trigramas (0.0 a 1.0;
+    # 0.6 é o padrão do pg_trgm.word_similarity_threshold)
+    SEARCH_SIMILARITY_THRESHOLD: float = 0.6
+
+    # Exportação (GET /pacientes/export): linhas lidas do banco por vez
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Respostas de pacientes serializadas direto das linhas do ORM para bytes
+    # (FastJSONResponse; usa o orjson se estiver instalado). Mesmo JSON do
+    # caminho padrão via Pydantic, com menos CPU por requisição.
+    FAST_JSON: bool = False
+
+    # Importação em massa (POST /pacientes/bulk)
+    BULK_IMPORT_CHUNK_SIZE: int = 500       # Linhas por INSERT multi-row
+    BULK_IMPORT_ML_BATCH_SIZE: int = 100    # Pacientes por chamada ao ML
+    BULK_IMPORT_MAX_ERRORS: int = 1000      # Máximo de erros detalhados no relatório
+
+    # Re-classificação da base (app/services/rescoring_service.py)
+    RESCORE_CHUNK_SIZE: int = 2000     # Pacientes lidos do banco por vez
+    RESCORE_ML_BATCH_SIZE: int = 500   # Pacientes por chamada ao ML em lote
+    RESCORE_CONCURRENCY: int = 4       # Chamadas simultâneas ao ML
 
     class Config:
         env_file = ".env"
 
 # Instância única que será importada por outros arquivos
 settings = Settings()
-
-# --- ADICIONE ESTAS LINHAS DE DEBUG ---
-print("--- CONFIGURAÇÃO DO BACKEND CARREGADA ---")
-print(f"URL do ML lida do .env: {settings.ML_SERVICE_URL}")
-print(f"URL do LLM lida do .env: {settings.LLM_SERVICE_URL}")
-print("---------------------------------------")
-# --- FIM DO DEBUG ---
\ No newline at end of file
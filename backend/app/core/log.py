@@ -0,0 +1,256 @@
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+
+from app.core.config import settings
+from app.core.metrics import Gauge, registry
+
+# =================================================================
+# Logs estruturados (uma linha JSON por mensagem), fora do event loop
+#
+# Quem loga só redige os campos e enfileira o registro (put_nowait em uma
+# fila limitada; cheia, o registro é descartado e contado). A formatação e
+# a escrita no stdout acontecem na thread do QueueListener.
+#
+#   log = get_logger(__name__)
+#   log.info("Orquestração concluída", paciente_id=1, sample_rate=0.1)
+#
+# Os campos passam por 'redact' (dados que identificam o paciente nunca vão
+# para o log) e levam o request_id da requisição/job atual.
+# =================================================================
+
+ROOT_LOGGER = "app"
+REQUEST_ID_HEADER = "X-Request-ID"
+REDACTED = "[REDACTED]"
+
+# Campos que identificam o paciente/usuário ou dão acesso (em qualquer nível do payload)
+REDACTED_FIELDS = frozenset({
+    "email", "nome", "endereco", "data_nascimento", "cpf", "telefone",
+    "password", "hashed_password", "access_token", "token", "authorization",
+})
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def redact(value: Any) -> Any:
+    """Cópia do payload com os campos de REDACTED_FIELDS mascarados."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACTED_FIELDS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+# =================================================================
+# IDs de correlação
+# =================================================================
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def correlation(request_id: Optional[str] = None) -> Iterator[str]:
+    """Define o request_id dos logs no contexto atual (ex.: 'job-42')."""
+    request_id = request_id or uuid.uuid4().hex
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+class CorrelationIdMiddleware:
+    """
+    Middleware ASGI que dá um request_id a cada requisição: reaproveita o
+    X-Request-ID recebido (se for válido) ou gera um novo, e o devolve na
+    resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                incoming = value.decode("latin-1")
+                break
+        if incoming is not None and not _VALID_REQUEST_ID.match(incoming):
+            incoming = None
+
+        with correlation(incoming) as request_id:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (REQUEST_ID_HEADER.lower().encode(), request_id.encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+# =================================================================
+# Amostragem por mensagem (caminhos quentes)
+# =================================================================
+class _Sampler:
+    """1 a cada round(1/taxa) ocorrências de cada mensagem (a primeira sempre)."""
+
+    def __init__(self):
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, key: tuple, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        every = max(1, round(1 / rate))
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % every == 0
+
+
+_sampler = _Sampler()
+
+
+class StructuredLogger:
+    """Logger com campos nomeados, redação e amostragem."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level: int, message: str, sample_rate: float, error: Optional[BaseException], fields: dict) -> None:
+        # Mensagens desligadas ou fora da amostra não custam mais que isto
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample_rate < 1.0:
+            if not _sampler.should_log((self.name, message), sample_rate):
+                return
+            fields["sample_rate"] = sample_rate
+        if error is not None:
+            fields["error"] = str(error)
+            fields["error_type"] = type(error).__name__
+        self._logger.log(level, message, extra={
+            "fields": redact(fields), "request_id": _request_id.get(),
+        })
+
+    def debug(self, message: str, *, sample_rate: float = 1.0, error: Optional[BaseException] = None, **fields) -> None:
+        self._log(logging.DEBUG, message, sample_rate, error, fields)
+
+    def info(self, message: str, *, sample_rate: float = 1.0, error: Optional[BaseException] = None, **fields) -> None:
+        self._log(logging.INFO, message, sample_rate, error, fields)
+
+    def warning(self, message: str, *, sample_rate: float = 1.0, error: Optional[BaseException] = None, **fields) -> None:
+        self._log(logging.WARNING, message, sample_rate, error, fields)
+
+    def error(self, message: str, *, sample_rate: float = 1.0, error: Optional[BaseException] = None, **fields) -> None:
+        self._log(logging.ERROR, message, sample_rate, error, fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Logger de um módulo do app (use __name__: 'app.services...')."""
+    return StructuredLogger(name)
+
+
+# =================================================================
+# Saída: JSON por linha, escrito pela thread do QueueListener
+# =================================================================
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Enfileira sem formatar e sem bloquear; fila cheia descarta o registro."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A formatação fica para a thread do listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[_NonBlockingQueueHandler] = None
+
+
+def start_logging() -> None:
+    """
+    Liga a saída dos logs do app (chamado no lifespan). Antes disso, só
+    avisos e erros aparecem (handler padrão do logging, no stderr).
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _handler = _NonBlockingQueueHandler(log_queue)
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Escreve o que ainda estiver na fila e para a thread do listener."""
+    global _listener, _handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.removeHandler(_handler)
+    logger.propagate = True
+    _listener = _handler = None
+
+
+def dropped_count() -> int:
+    """Registros descartados por fila cheia desde o start_logging."""
+    return _handler.dropped if _handler is not None else 0
+
+
+registry.register(Gauge(
+    "log_records_dropped", "Registros de log descartados por fila cheia.",
+    collect=lambda: [((), dropped_count())],
+))
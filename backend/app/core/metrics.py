@@ -0,0 +1,331 @@
+import bisect
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# =================================================================
+# Métricas no formato texto do Prometheus (GET /metrics)
+#
+# Implementação própria e mínima (contadores, gauges e histogramas com
+# labels), sem dependência externa. Cada registro é um incremento sob um
+# lock por métrica, barato o bastante para ficar sempre ligado.
+# =================================================================
+
+# Buckets (segundos) das latências HTTP e dos microserviços
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Buckets de consultas ao banco por requisição
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """
+    Contador que só cresce. Com 'collect', o valor é lido na hora da coleta
+    de um contador mantido em outro lugar (mesmo formato do Gauge).
+    """
+
+    type = "counter"
+
+    def __init__(
+        self, name, documentation, labelnames=(),
+        collect: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        if self._collect is not None:
+            values = sorted(self._collect())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Valor que sobe e desce. Com 'collect', o valor é lido na hora da coleta
+    (função que retorna [(labels, valor), ...]).
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self, name, documentation, labelnames=(),
+        collect: Optional[Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        if self._collect is not None:
+            values = sorted(self._collect())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos (acumulados na exposição)."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagem por bucket (+Inf no fim), soma]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self._header()
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP ---
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "Requisições HTTP atendidas.", ("method", "route", "status")
+))
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP.", ("method", "route")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento.", ("method",)
+))
+HTTP_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Consultas ao banco por requisição HTTP.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+))
+
+# --- Banco ---
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Consultas executadas no banco.", ("context",)
+))
+
+# --- Microserviços (ML/LLM) ---
+SERVICE_LATENCY = registry.register(Histogram(
+    "service_request_duration_seconds",
+    "Latência das chamadas aos microserviços (com novas tentativas).", ("service",)
+))
+SERVICE_CALLS = registry.register(Counter(
+    "service_requests_total",
+    "Chamadas aos microserviços por resultado "
+    "(success/rejected/unavailable/circuit_open).", ("service", "outcome")
+))
+
+# --- Orquestração ---
+ORCHESTRATION_OUTCOMES = registry.register(Counter(
+    "orchestration_outcomes_total",
+    "Orquestrações concluídas por resultado (outlier/stable/failed/deferred).", ("outcome",)
+))
+LOCAL_SCORER_RESULTS = registry.register(Counter(
+    "local_scorer_results_total",
+    "Pacientes classificados pelo scorer local, por motivo (fallback/prescreen) "
+    "e resultado (outlier/stable/unavailable).", ("reason", "outcome")
+))
+
+
+# =================================================================
+# Consultas ao banco por requisição
+#
+# O middleware abre um contador no contexto da requisição; o listener do
+# Engine o incrementa a cada execução. Endpoints síncronos rodam no
+# threadpool com uma cópia do contexto, que aponta para a mesma lista.
+# =================================================================
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _request_queries.get()
+    if counter is None:
+        DB_QUERIES.inc("background")
+    else:
+        DB_QUERIES.inc("request")
+        counter[0] += 1
+
+
+# id da rota casada -> rótulo com o prefixo (as rotas vivem o processo
+# inteiro; 'APIRoute' não é hashable)
+_route_labels: dict[int, str] = {}
+
+
+def _route_label(scope) -> str:
+    """
+    Modelo da rota (ex.: /api/v1/pacientes/{id}), nunca o caminho cru. O
+    roteador grava a rota casada em 'scope["route"]'; sem ela, 'unmatched'
+    (ex.: 404) para não abrir uma série por caminho desconhecido.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if not isinstance(path, str):
+        return "unmatched"
+    label = _route_labels.get(id(route))
+    if label is None:
+        label = _route_labels[id(route)] = _with_prefix(route, path, scope)
+    return label
+
+
+def _with_prefix(route, path: str, scope) -> str:
+    """
+    Nas versões do FastAPI que não copiam as rotas do 'include_router', o
+    'route.path' vem sem o prefixo do roteador (ex.: '/{id}'): completa com o
+    trecho literal do caminho que antecede o que a própria rota casou.
+    """
+    regex = getattr(route, "path_regex", None)
+    own_params = getattr(route, "param_convertors", {})
+    if regex is None or any(name not in own_params for name in scope.get("path_params", {})):
+        # Prefixo com parâmetros traria valores para o rótulo
+        return path
+    request_path = scope["path"]
+    for cut in [0] + [i for i, char in enumerate(request_path) if char == "/" and i]:
+        if regex.match(request_path[cut:]):
+            return request_path[:cut] + path
+    return path
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede latência, requisições em andamento e consultas
+    ao banco por rota. Puro ASGI (sem BaseHTTPMiddleware) para custar pouco.
+    """
+
+    def __init__(self, app, *, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        queries = [0]
+        token = _request_queries.set(queries)
+        # A rota só é conhecida depois do roteamento: o gauge é por método
+        HTTP_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method)
+            _request_queries.reset(token)
+            route = _route_label(scope)
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            HTTP_LATENCY.observe(method, route, value=elapsed)
+            HTTP_DB_QUERIES.observe(method, route, value=queries[0])
+
+
+def render() -> str:
+    """Todas as métricas no formato texto do Prometheus."""
+    return registry.render()
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
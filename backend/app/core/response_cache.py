@@ -0,0 +1,206 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.lru_cache import TTLLRUCache
+from app.models.paciente_models import Paciente
+
+
+class CacheBackend(ABC):
+    """
+    Armazenamento do cache de respostas: bytes por chave (str), com TTL.
+
+    O padrão é o MemoryBackend (LRU por processo). Para um cache
+    compartilhado entre processos/instâncias (ex.: Redis), implemente os
+    métodos abstratos com o mesmo contrato e passe a instância para
+    'response_cache.use_backend' no startup.
+    """
+
+    name = "custom"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def size(self) -> Optional[int]:
+        """Nº de entradas, se o backend souber informar."""
+        return None
+
+
+class MemoryBackend(CacheBackend):
+    """LRU com TTL em memória (um por processo)."""
+
+    name = "memory"
+
+    def __init__(self, *, maxsize: int, ttl: float):
+        self._cache = TTLLRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._cache)
+
+
+class ResponseCache:
+    """
+    Cache "read-through" de respostas já serializadas (corpo JSON + ETag),
+    por rota e ID do paciente.
+
+    A rota consulta o cache antes do banco e grava o que serializou. As
+    entradas do paciente são removidas depois do commit de qualquer sessão
+    que o tenha criado, alterado ou removido (listeners abaixo), então os
+    caminhos de escrita não precisam lembrar de invalidar.
+
+    'generation' evita gravar uma resposta lida do banco antes de uma
+    invalidação que aconteceu durante a leitura: quem lê guarda o valor
+    antes da consulta e o passa para 'set'.
+    """
+
+    def __init__(self, backend: CacheBackend, *, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.generation = 0
+        self._routes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def use_backend(self, backend: CacheBackend) -> None:
+        self.backend = backend
+
+    @staticmethod
+    def _key(route: str, id: Hashable) -> str:
+        return f"{route}:{id}"
+
+    def get(self, route: str, id: Hashable) -> Optional[Tuple[str, bytes]]:
+        """Retorna (etag, corpo) em cache para a rota e o ID, ou None."""
+        if not self.enabled:
+            return None
+        value = self.backend.get(self._key(route, id))
+        with self._lock:
+            counters = self._routes.setdefault(route, {"hits": 0, "misses": 0})
+            counters["hits" if value is not None else "misses"] += 1
+        if value is None:
+            return None
+        etag, _, body = value.partition(b"\n")
+        return etag.decode(), body
+
+    def set(
+        self, route: str, id: Hashable, etag: str, body: bytes, *,
+        generation: Optional[int] = None
+    ) -> None:
+        """Guarda a resposta, a menos que algo tenha sido invalidado desde 'generation'."""
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self.backend.set(self._key(route, id), etag.encode() + b"\n" + body, self.ttl)
+
+    def invalidate(self, ids: Iterable[Hashable]) -> None:
+        """Remove as respostas em cache dos IDs, em todas as rotas."""
+        ids = list(ids)
+        if not ids:
+            return
+        with self._lock:
+            self.generation += 1
+            routes = list(self._routes)
+        for id in ids:
+            for route in routes:
+                self.backend.delete(self._key(route, id))
+        self.invalidations += len(ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Taxa de acerto por rota, para acompanhar a eficácia do cache."""
+        with self._lock:
+            routes = {
+                route: {
+                    **counters,
+                    "hit_ratio": (
+                        counters["hits"] / (counters["hits"] + counters["misses"])
+                        if counters["hits"] + counters["misses"] else 0.0
+                    ),
+                }
+                for route, counters in self._routes.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "size": self.backend.size(),
+            "ttl_seconds": self.ttl,
+            "invalidations": self.invalidations,
+            "routes": routes,
+        }
+
+
+# Instância única (rotas de detalhe do paciente). RESPONSE_CACHE_SIZE=0 desliga.
+response_cache = ResponseCache(
+    MemoryBackend(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS),
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_SIZE > 0,
+)
+
+
+# =================================================================
+# Invalidação após o commit
+#
+# Os IDs de pacientes escritos pela sessão são acumulados a cada flush
+# (ORM) ou por 'mark_changed' (UPDATE/INSERT em lote) e invalidados só
+# depois do commit; um rollback os descarta.
+# =================================================================
+_INFO_KEY = "response_cache_paciente_ids"
+
+
+def mark_changed(session: Session, ids: Iterable[int]) -> None:
+    """Registra pacientes alterados fora do flush do ORM (SQL em lote)."""
+    session.info.setdefault(_INFO_KEY, set()).update(ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed(session, flush_context):
+    changed: Set[int] = {
+        obj.id for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, Paciente) and obj.id is not None
+    }
+    if changed:
+        mark_changed(session, changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed(session):
+    response_cache.invalidate(session.info.pop(_INFO_KEY, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed(session):
+    session.info.pop(_INFO_KEY, None)
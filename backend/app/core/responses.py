@@ -0,0 +1,61 @@
+import json
+from typing import Any, List, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # Dependência opcional (FAST_JSON funciona sem ela, só mais devagar)
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Resposta JSON serializada direto para bytes (orjson, se instalado).
+
+    Recebe dicts já no formato do schema de saída (ex.: montados a partir
+    das linhas do ORM), sem passar pela validação/serialização do Pydantic.
+    O corpo gerado é idêntico ao do JSONResponse padrão do FastAPI:
+    JSON compacto, UTF-8 sem escapes e datas em ISO 8601 (UTC como 'Z').
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_iso_default,
+        ).encode("utf-8")
+
+
+def _iso_default(value: Any) -> str:
+    """Datas no mesmo formato do Pydantic (UTC vira 'Z')."""
+    if hasattr(value, "isoformat"):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def etag_list(header: Optional[str]) -> List[str]:
+    """
+    ETags de um cabeçalho If-None-Match/If-Match ("a", W/"b", ...).
+    O prefixo W/ é mantido: a comparação forte (If-Match) o rejeita.
+    """
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match: '*' ou algum ETag igual (com ou sem W/)."""
+    tags = etag_list(header)
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def not_modified(etag: str) -> Response:
+    """304 sem corpo: o cliente já tem esta versão."""
+    return Response(status_code=304, headers={"ETag": etag})
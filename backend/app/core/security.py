@@ -1,13 +1,24 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 
 from app.core.config import settings
 
 # --- Configuração de Hashing de Senha ---
-# Usamos bcrypt, que é o padrão de mercado
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Usamos bcrypt, que é o padrão de mercado.
+# min_rounds = max_rounds = BCRYPT_ROUNDS faz o 'needs_update' acusar hashes
+# com custo diferente (maior ou menor), que são refeitos no login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha em texto plano corresponde ao hash salvo."""
@@ -18,6 +29,78 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# --- Executor dedicado para o bcrypt (controle de admissão) ---
+
+class PasswordHashingBusy(Exception):
+    """Fila do bcrypt cheia: a requisição deve ser recusada rapidamente (503)."""
+
+
+class PasswordHasher:
+    """
+    Roda o bcrypt em um pool de threads próprio e limitado, fora do event
+    loop e do threadpool das outras rotas. No máximo 'workers + queue_size'
+    operações ficam em andamento/espera; acima disso, PasswordHashingBusy.
+    O pool só é criado no primeiro uso.
+    """
+
+    def __init__(self, *, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # A vaga só é liberada quando o bcrypt termina de fato
+        # (mesmo que quem esperava tenha desistido)
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica a senha no executor do bcrypt.
+    Retorna (senha_correta, novo_hash): 'novo_hash' vem preenchido quando o
+    hash salvo usa um custo diferente do BCRYPT_ROUNDS atual.
+    Lança PasswordHashingBusy se o executor estiver saturado.
+    """
+    return await password_hasher.run(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """Gera o hash bcrypt no executor. Lança PasswordHashingBusy se saturado."""
+    return await password_hasher.run(pwd_context.hash, password)
+
+
 # --- Configuração de Token JWT ---
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -0,0 +1,155 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.log import get_logger
+
+# =================================================================
+# Perfil das consultas SQL (opcional, SQL_PROFILING=true)
+#
+# Os eventos do Engine registram cada consulta no perfil ativo no
+# contexto (uma requisição HTTP ou um job de orquestração):
+#   - total de consultas e tempo no banco (cabeçalho Server-Timing);
+#   - consultas acima de SQL_SLOW_QUERY_MS, com o formato dos parâmetros
+#     (tipos, nunca os valores: são dados de pacientes);
+#   - a mesma consulta repetida SQL_REPEATED_QUERY_THRESHOLD vezes ou mais
+#     no mesmo perfil (suspeita de N+1).
+# =================================================================
+
+# Parâmetros listados um a um até este tamanho; acima, só contagem e tipos
+MAX_LISTED_PARAMS = 10
+# Tamanho máximo do SQL nos logs
+MAX_STATEMENT_LENGTH = 500
+
+log = get_logger(__name__)
+
+_active: ContextVar[Optional["QueryProfile"]] = ContextVar("sql_profile", default=None)
+
+
+def _one_line(statement: str) -> str:
+    statement = re.sub(r"\s+", " ", statement).strip()
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        return statement[:MAX_STATEMENT_LENGTH] + "..."
+    return statement
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Formato dos parâmetros (nomes e tipos), sem os valores."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)}x {parameter_shape(rows[0]) if rows else '()'}"
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        items = [f"{name}: {type(value).__name__}" for name, value in parameters.items()]
+    else:
+        items = [type(value).__name__ for value in parameters]
+    if len(items) > MAX_LISTED_PARAMS:
+        types = sorted({type(value).__name__ for value in (
+            parameters.values() if isinstance(parameters, dict) else parameters
+        )})
+        return f"({len(items)} parâmetros: {', '.join(types)})"
+    return "(" + ", ".join(items) + ")"
+
+
+class QueryProfile:
+    """Consultas de uma requisição/job: contagem, tempo e repetições."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+        self.count += 1
+        self.total_seconds += elapsed
+        self.statements[statement] += 1
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms >= settings.SQL_SLOW_QUERY_MS:
+            log.warning(
+                "Consulta SQL lenta", profile=self.label, elapsed_ms=round(elapsed_ms, 1),
+                statement=_one_line(statement), params=parameter_shape(parameters, executemany),
+            )
+
+    def repeated(self):
+        """Consultas idênticas repetidas acima do limite: [(sql, vezes), ...]."""
+        threshold = settings.SQL_REPEATED_QUERY_THRESHOLD
+        return [
+            (statement, times) for statement, times in self.statements.most_common()
+            if times >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        """Valor do cabeçalho Server-Timing (tempo total e nº de consultas)."""
+        return f'db;dur={self.total_seconds * 1000:.2f};desc="{self.count} queries"'
+
+    def report(self) -> None:
+        """Avisa sobre consultas repetidas (N+1) ao fim da requisição/job."""
+        for statement, times in self.repeated():
+            log.warning(
+                "Consulta SQL repetida (possível N+1)", profile=self.label, times=times,
+                statement=_one_line(statement),
+            )
+
+
+@contextmanager
+def profile(label: str) -> Iterator[QueryProfile]:
+    """Ativa um perfil no contexto atual (ex.: um job de orquestração)."""
+    current = QueryProfile(label)
+    token = _active.set(current)
+    try:
+        yield current
+    finally:
+        _active.reset(token)
+        current.report()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("sql_profiler_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _active.get()
+    starts = conn.info.get("sql_profiler_start")
+    if current is None or not starts:
+        return
+    current.record(statement, parameters, executemany, time.perf_counter() - starts.pop())
+
+
+class SQLProfilingMiddleware:
+    """
+    Middleware ASGI que perfila as consultas de cada requisição: adiciona o
+    Server-Timing à resposta e registra consultas lentas e repetidas.
+    Só é instalado com SQL_PROFILING=true.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile(f"{scope['method']} {scope['path']}") as current:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    # Consultas feitas até a resposta começar (as de um
+                    # StreamingResponse continuam sendo registradas nos logs)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", current.server_timing().encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
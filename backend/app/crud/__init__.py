@@ -1,6 +1,11 @@
-from .crud_user import get_by_email, create_user
+from .crud_user import get_by_email, create_user, update_password, update_password_hash, set_active
 
 # --- ADICIONE ESTAS LINHAS ---
 # Elas expõem as funções do crud_paciente para o resto do app
-from .crud_paciente import create_paciente, get_by_id, get_multi
-# -----------------------------
\ No newline at end of file
+from .crud_paciente import create_paciente, get_by_id, get_multi, get_multi_keyset, create_multi, get_existing_emails, bulk_update, get_version, lock_version, count_for_rescoring, get_for_rescoring
+# -----------------------------
+from .crud_orchestration import (
+    get_job, get_latest_job, create_job, create_jobs, get_pending_job_ids,
+    claim_job, heartbeat_jobs, reset_stale_jobs, mark_job
+)
+from .crud_paciente_stats import get_stats, rebuild as rebuild_stats
\ No newline at end of file
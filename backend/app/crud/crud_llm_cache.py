@@ -0,0 +1,89 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.llm_cache_models import LlmActionCache
+from typing import Optional
+
+def get_entry(
+    db: Session, *, key: str, model_version: str, not_before: datetime
+) -> Optional[LlmActionCache]:
+    """Busca uma entrada válida (mesma versão e criada depois de 'not_before')."""
+    return (
+        db.query(LlmActionCache)
+        .filter(
+            LlmActionCache.key == key,
+            LlmActionCache.model_version == model_version,
+            LlmActionCache.created_at >= not_before,
+        )
+        .first()
+    )
+
+def register_hit(db: Session, *, key: str) -> None:
+    """Incrementa o contador de acertos da entrada."""
+    db.query(LlmActionCache).filter(LlmActionCache.key == key).update(
+        {LlmActionCache.hit_count: LlmActionCache.hit_count + 1},
+        synchronize_session=False,
+    )
+    db.commit()
+
+def save_entry(
+    db: Session, *, key: str, model_version: str, generated_actions: str,
+    latency_ms: float
+) -> None:
+    """
+    Grava (ou substitui) a entrada da chave.
+    Se outro processo gravou a mesma chave ao mesmo tempo, mantém a dele.
+    """
+    db.merge(LlmActionCache(
+        key=key,
+        model_version=model_version,
+        generated_actions=generated_actions,
+        latency_ms=latency_ms,
+        hit_count=0,
+        created_at=datetime.now().astimezone(),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+def count_entries(db: Session) -> int:
+    return db.query(LlmActionCache).count()
+
+def prune(
+    db: Session, *, model_version: str, not_before: datetime, max_entries: int
+) -> int:
+    """
+    Remove entradas de outras versões, expiradas e, se passar de
+    'max_entries', as mais antigas. Retorna quantas foram removidas.
+    """
+    removed = (
+        db.query(LlmActionCache)
+        .filter(
+            (LlmActionCache.model_version != model_version) |
+            (LlmActionCache.created_at < not_before)
+        )
+        .delete(synchronize_session=False)
+    )
+
+    excess = db.query(LlmActionCache).count() - max_entries
+    if excess > 0:
+        oldest = (
+            db.query(LlmActionCache.key)
+            .order_by(LlmActionCache.created_at)
+            .limit(excess)
+            .subquery()
+        )
+        removed += (
+            db.query(LlmActionCache)
+            .filter(LlmActionCache.key.in_(oldest.select()))
+            .delete(synchronize_session=False)
+        )
+
+    db.commit()
+    return removed
+
+def remove_all(db: Session) -> int:
+    removed = db.query(LlmActionCache).delete(synchronize_session=False)
+    db.commit()
+    return removed
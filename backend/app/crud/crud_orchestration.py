@@ -0,0 +1,184 @@
+from datetime import datetime
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.models.orchestration_models import (
+    OrchestrationJob, STATUS_PENDING, STATUS_RUNNING, STATUS_DEFERRED
+)
+from typing import List, Optional
+
+def get_job(db: Session, *, job_id: int) -> Optional[OrchestrationJob]:
+    """Busca um job de orquestração pelo ID."""
+    return db.query(OrchestrationJob).filter(OrchestrationJob.id == job_id).first()
+
+def get_latest_job(db: Session, *, paciente_id: int) -> Optional[OrchestrationJob]:
+    """Busca o job mais recente de um paciente."""
+    return (
+        db.query(OrchestrationJob)
+        .filter(OrchestrationJob.paciente_id == paciente_id)
+        .order_by(OrchestrationJob.id.desc())
+        .first()
+    )
+
+def create_job(db: Session, *, paciente_id: int) -> OrchestrationJob:
+    """
+    Cria um job pendente para o paciente.
+    Se já existir um job pendente ou adiado (ainda não concluído), ele é
+    reaproveitado, já que o worker sempre lê os dados mais recentes do paciente.
+    """
+    job = (
+        db.query(OrchestrationJob)
+        .filter(
+            OrchestrationJob.paciente_id == paciente_id,
+            OrchestrationJob.status.in_([STATUS_PENDING, STATUS_DEFERRED])
+        )
+        .first()
+    )
+    if job:
+        if job.status == STATUS_DEFERRED:
+            # Nova alteração do paciente: recomeça a contagem de tentativas
+            job.status = STATUS_PENDING
+            job.attempts = 0
+            db.commit()
+        return job
+
+    job = OrchestrationJob(paciente_id=paciente_id, status=STATUS_PENDING)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def create_jobs(
+    db: Session, *, paciente_ids: List[int], skip_ml: bool = False
+) -> List[int]:
+    """
+    Cria jobs pendentes para vários pacientes em um único INSERT multi-row.
+    Retorna os IDs dos jobs, na mesma ordem de 'paciente_ids'.
+    """
+    if not paciente_ids:
+        return []
+    rows = [
+        {"paciente_id": paciente_id, "status": STATUS_PENDING, "skip_ml": skip_ml}
+        for paciente_id in paciente_ids
+    ]
+    result = db.scalars(
+        insert(OrchestrationJob).returning(
+            OrchestrationJob.id, sort_by_parameter_order=True
+        ),
+        rows,
+    )
+    job_ids = list(result)
+    db.commit()
+    return job_ids
+
+def get_pending_job_ids(
+    db: Session, *, limit: int, retry_before: Optional[datetime] = None
+) -> List[int]:
+    """
+    Lista os IDs dos jobs pendentes, do mais antigo para o mais novo.
+    Com 'retry_before', inclui os jobs adiados cujo 'retry_at' já passou
+    (sem 'retry_at', vale o 'finished_at').
+    """
+    condition = OrchestrationJob.status == STATUS_PENDING
+    if retry_before is not None:
+        condition = condition | (
+            (OrchestrationJob.status == STATUS_DEFERRED) &
+            (func.coalesce(OrchestrationJob.retry_at, OrchestrationJob.finished_at) <= retry_before)
+        )
+    rows = (
+        db.query(OrchestrationJob.id)
+        .filter(condition)
+        .order_by(OrchestrationJob.id)
+        .limit(limit)
+        .all()
+    )
+    return [row.id for row in rows]
+
+def claim_statement(*, job_id: int, owner: str):
+    """
+    UPDATE condicional que assume o job para 'owner': só muda a linha se o
+    job ainda estiver pendente ou adiado, então, entre vários processos (ou
+    o SSE e a fila), apenas um o assume (rowcount 1).
+    """
+    return (
+        update(OrchestrationJob)
+        .where(
+            OrchestrationJob.id == job_id,
+            OrchestrationJob.status.in_([STATUS_PENDING, STATUS_DEFERRED])
+        )
+        .values(
+            status=STATUS_RUNNING, owner=owner, error=None,
+            attempts=func.coalesce(OrchestrationJob.attempts, 0) + 1,
+            started_at=func.now(), heartbeat_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def claim_job(db: Session, *, job_id: int, owner: str) -> bool:
+    """
+    Assume o job (status 'running'), com commit. Retorna False se ele já
+    não estava pendente/adiado (outro processo chegou antes).
+    """
+    result = db.execute(claim_statement(job_id=job_id, owner=owner))
+    db.commit()
+    return result.rowcount == 1
+
+def heartbeat_jobs(db: Session, *, owner: str, job_ids: List[int]) -> int:
+    """Renova o heartbeat dos jobs 'running' deste processo."""
+    if not job_ids:
+        return 0
+    result = db.execute(
+        update(OrchestrationJob)
+        .where(
+            OrchestrationJob.id.in_(job_ids),
+            OrchestrationJob.owner == owner,
+            OrchestrationJob.status == STATUS_RUNNING,
+        )
+        .values(heartbeat_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def reset_stale_jobs(db: Session, *, stale_before: datetime) -> int:
+    """
+    Volta para 'pending' os jobs 'running' sem heartbeat desde 'stale_before'
+    (o processo que os assumiu morreu). Jobs de outros processos vivos, que
+    renovam o heartbeat, não são tocados.
+    """
+    result = db.execute(
+        update(OrchestrationJob)
+        .where(
+            OrchestrationJob.status == STATUS_RUNNING,
+            (OrchestrationJob.heartbeat_at < stale_before) |
+            OrchestrationJob.heartbeat_at.is_(None)
+        )
+        .values(status=STATUS_PENDING, owner=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def mark_job(
+    db: Session, *, job: OrchestrationJob, status: str, error: Optional[str] = None,
+    retry_at: Optional[datetime] = None
+) -> OrchestrationJob:
+    """
+    Atualiza o estado de um job (sem commit; quem chama decide).
+    'retry_at': quando um job 'deferred' pode voltar para a fila.
+    """
+    job.status = status
+    job.error = error
+    if status == STATUS_RUNNING:
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = func.now()
+    else:
+        job.finished_at = func.now()
+        job.retry_at = retry_at
+    return job
+
+def remove_jobs_for_paciente(db: Session, *, paciente_id: int) -> None:
+    """Remove todos os jobs de um paciente (sem commit)."""
+    db.query(OrchestrationJob).filter(
+        OrchestrationJob.paciente_id == paciente_id
+    ).delete(synchronize_session=False)
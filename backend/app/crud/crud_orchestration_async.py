@@ -0,0 +1,57 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.orchestration_models import (
+    OrchestrationJob, STATUS_PENDING, STATUS_DEFERRED
+)
+from typing import Optional
+from .crud_orchestration import claim_statement
+
+# Variantes assíncronas do crud_orchestration (usadas quando DB_ASYNC=true)
+
+async def get_job(db: AsyncSession, *, job_id: int) -> Optional[OrchestrationJob]:
+    """Busca um job de orquestração pelo ID."""
+    result = await db.execute(
+        select(OrchestrationJob).where(OrchestrationJob.id == job_id)
+    )
+    return result.scalars().first()
+
+async def get_latest_job(db: AsyncSession, *, paciente_id: int) -> Optional[OrchestrationJob]:
+    """Busca o job mais recente de um paciente."""
+    result = await db.execute(
+        select(OrchestrationJob)
+        .where(OrchestrationJob.paciente_id == paciente_id)
+        .order_by(OrchestrationJob.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def create_job(db: AsyncSession, *, paciente_id: int) -> OrchestrationJob:
+    """
+    Cria um job pendente para o paciente (ou reaproveita o pendente/adiado existente).
+    """
+    result = await db.execute(
+        select(OrchestrationJob).where(
+            OrchestrationJob.paciente_id == paciente_id,
+            OrchestrationJob.status.in_([STATUS_PENDING, STATUS_DEFERRED])
+        )
+    )
+    job = result.scalars().first()
+    if job:
+        if job.status == STATUS_DEFERRED:
+            # Nova alteração do paciente: recomeça a contagem de tentativas
+            job.status = STATUS_PENDING
+            job.attempts = 0
+            await db.commit()
+        return job
+
+    job = OrchestrationJob(paciente_id=paciente_id, status=STATUS_PENDING)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+async def claim_job(db: AsyncSession, *, job_id: int, owner: str) -> bool:
+    """Assume o job (status 'running'), com commit; False se outro chegou antes."""
+    result = await db.execute(claim_statement(job_id=job_id, owner=owner))
+    await db.commit()
+    return result.rowcount == 1
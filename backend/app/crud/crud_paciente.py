@@ -1,7 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, insert, update, tuple_, select, func, or_, text, literal_column
+from sqlalchemy.orm import Session, load_only
 from app.models.paciente_models import Paciente
+from app.models.orchestration_models import STATUS_DEFERRED, STATUS_PENDING, STATUS_RUNNING
+from app.crud.crud_orchestration import remove_jobs_for_paciente
+from app.crud import crud_paciente_stats
 from app.schemas.paciente_schema import PacienteCreate
-from typing import List, Optional
+from app.db.search import normalize_search_text, trigrams, SQLITE_FTS_TABLE
+from app.core.config import settings
+from app.core.response_cache import mark_changed
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 def get_by_id(db: Session, *, id: int) -> Optional[Paciente]:
     """Busca um paciente pelo ID."""
@@ -21,26 +30,245 @@ def create_paciente(db: Session, *, paciente_in: PacienteCreate) -> Paciente:
     db.refresh(db_paciente)
     return db_paciente
 
+def create_multi(
+    db: Session, *, pacientes_in: List[PacienteCreate], orchestration_status: str
+) -> List[int]:
+    """
+    Cria vários pacientes em um único INSERT multi-row (sem refresh por linha).
+    Retorna os IDs gerados, na mesma ordem de 'pacientes_in'.
+    """
+    if not pacientes_in:
+        return []
+    rows = [
+        {**paciente_in.model_dump(), "orchestration_status": orchestration_status}
+        for paciente_in in pacientes_in
+    ]
+    result = db.scalars(
+        insert(Paciente).returning(Paciente.id, sort_by_parameter_order=True),
+        rows,
+    )
+    ids = list(result)
+
+    # O INSERT em lote não passa pelo flush do ORM: atualiza as estatísticas aqui
+    deltas = Counter()
+    for row in rows:
+        deltas.update(crud_paciente_stats.deltas_for({"is_outlier": None, **row}, +1))
+    crud_paciente_stats.apply_deltas(db.connection(), deltas)
+    db.commit()
+    return ids
+
+def get_existing_emails(db: Session, *, emails: Iterable[str]) -> Set[str]:
+    """Retorna, dentre os emails informados, os que já estão cadastrados."""
+    emails = list(emails)
+    if not emails:
+        return set()
+    rows = db.query(Paciente.email).filter(Paciente.email.in_(emails)).all()
+    return {row.email for row in rows}
+
+def _guarded_update(fields: Sequence[str]):
+    """UPDATE de um paciente só se a versão ainda for a esperada (bind params)."""
+    return (
+        update(Paciente)
+        .where(Paciente.id == bindparam("row_id"), Paciente.version == bindparam("expected"))
+        .values({
+            **{key: bindparam(f"new_{key}") for key in fields},
+            "version": bindparam("expected") + 1,
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+def bulk_update(
+    db: Session, *, values: List[dict], expected_versions: Optional[Dict[int, int]] = None
+) -> List[int]:
+    """
+    Atualiza vários pacientes de uma vez (UPDATE em lote por chave primária).
+    Cada dict precisa conter o 'id' e os campos a alterar.
+    Com 'expected_versions' ({id: versão lida}), cada paciente é gravado
+    por um UPDATE condicional (WHERE version = versão lida): os alterados
+    desde a leitura (ex.: um PUT no meio-tempo, mesmo entre o SELECT e o
+    UPDATE) ficam de fora, pelo rowcount.
+    Retorna os IDs atualizados.
+    """
+    if not values:
+        return []
+
+    # O UPDATE em lote não passa pelo flush do ORM: atualiza as estatísticas
+    # e a versão (ETag) aqui
+    values_by_id = {value["id"]: value for value in values}
+    columns = ("id", "version") + crud_paciente_stats.STATS_ATTRS
+    previous = [
+        dict(zip(columns, row))
+        for row in db.execute(
+            select(*(getattr(Paciente, column) for column in columns))
+            .where(Paciente.id.in_(values_by_id))
+        ).all()
+    ]
+    if expected_versions is None:
+        versions = {row["id"]: row["version"] for row in previous}
+        db.execute(update(Paciente), [
+            {**value, "version": (versions.get(value["id"]) or 0) + 1} for value in values
+        ])
+        updated = previous
+    else:
+        updated = []
+        statements = {}
+        for row in previous:
+            expected = expected_versions.get(row["id"])
+            if expected is None or row["version"] != expected:
+                continue # Já mudou antes do SELECT
+            value = values_by_id[row["id"]]
+            fields = tuple(sorted(key for key in value if key != "id"))
+            if fields not in statements:
+                statements[fields] = _guarded_update(fields)
+            result = db.execute(statements[fields], {
+                **{f"new_{key}": value[key] for key in fields},
+                "row_id": row["id"], "expected": expected,
+            })
+            # rowcount 0: alterado entre o SELECT e o UPDATE
+            if result.rowcount == 1:
+                updated.append(row)
+
+    # Os deltas partem da versão lida, que é a que foi sobrescrita
+    values_by_id = {row["id"]: values_by_id[row["id"]] for row in updated}
+    crud_paciente_stats.apply_deltas(
+        db.connection(),
+        crud_paciente_stats.changed_values(updated, values_by_id),
+    )
+    mark_changed(db, values_by_id)
+    db.commit()
+    return list(values_by_id)
+
+def get_version(db: Session, *, id: int) -> Optional[int]:
+    """Versão atual do paciente (None se não existir), sem carregar a linha."""
+    return db.execute(select(Paciente.version).where(Paciente.id == id)).scalar()
+
+def lock_version(db: Session, *, id: int, versions: Sequence[int]) -> bool:
+    """
+    Confere se a versão atual do paciente está em 'versions' (If-Match).
+    O UPDATE sem alteração trava a linha até o commit, então um PUT/DELETE
+    concorrente com o mesmo If-Match espera e depois falha na conferência.
+    """
+    result = db.execute(
+        update(Paciente)
+        .where(Paciente.id == id, Paciente.version.in_(versions))
+        # Mantém os valores (e evita o 'onupdate' do updated_at)
+        .values(version=Paciente.version, updated_at=Paciente.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+def _sqlite_fts_candidates(match: str):
+    """IDs (rowid) que casam a expressão MATCH no índice FTS5 trigram."""
+    return (
+        select(literal_column("rowid"))
+        .select_from(text(SQLITE_FTS_TABLE))
+        .where(
+            text(f"{SQLITE_FTS_TABLE} MATCH :fts_match").bindparams(fts_match=match)
+        )
+    )
+
+def _apply_search(db: Session, query, search: Optional[str]):
+    """
+    Filtra por nome/email usando o índice de busca do banco.
+    A busca ignora acentos e maiúsculas, casa prefixos/substrings e tolera
+    pequenos erros de digitação (similaridade por trigramas).
+    Retorna uma tupla (query_filtrada, expressão_de_relevância ou None).
+    """
+    term = normalize_search_text(search)
+    if not term:
+        return query, None
+
+    dialect = db.get_bind().dialect.name
+    threshold = settings.SEARCH_SIMILARITY_THRESHOLD
+
+    if len(term) < 3:
+        # Curto demais para trigramas: apenas prefixo de palavra
+        query = query.filter(
+            Paciente.search_text.startswith(term, autoescape=True) |
+            Paciente.search_text.contains(f" {term}", autoescape=True)
+        )
+        return query, None
+
+    if dialect == "postgresql":
+        # '%>' (word_similarity) e LIKE são servidos pelo índice GIN pg_trgm
+        db.execute(
+            select(func.set_config(
+                "pg_trgm.word_similarity_threshold", str(threshold), True
+            ))
+        )
+        query = query.filter(
+            Paciente.search_text.contains(term, autoescape=True) |
+            Paciente.search_text.op("%>")(term)
+        )
+        return query, func.word_similarity(term, Paciente.search_text)
+
+    if dialect == "sqlite":
+        # 1. Substring exata (sem acentos) servida pelo índice FTS5 trigram
+        exact = _sqlite_fts_candidates(_fts_phrase(term))
+        if db.execute(select(exact.exists())).scalar():
+            return query.filter(Paciente.id.in_(exact)), None
+
+        # 2. Nada exato: tolera erro de digitação. Com um erro, ao menos 2
+        #    de 3 pedaços do termo (ou 1 de 2, em termos curtos) continuam
+        #    intactos; os candidatos vêm do índice e o corte por similaridade
+        #    roda só sobre eles
+        if len(term) >= 9:
+            size = len(term) // 3
+            a, b, c = (
+                _fts_phrase(part)
+                for part in (term[:size], term[size:2 * size], term[2 * size:])
+            )
+            match = f"({a} AND {b}) OR ({a} AND {c}) OR ({b} AND {c})"
+        elif len(term) >= 6:
+            half = (len(term) + 1) // 2
+            match = f"{_fts_phrase(term[:half])} OR {_fts_phrase(term[half:])}"
+        else:
+            match = " OR ".join(_fts_phrase(t) for t in sorted(trigrams(term)))
+        rank = func.trgm_similarity(term, Paciente.search_text)
+        query = query.filter(
+            Paciente.id.in_(_sqlite_fts_candidates(match)), rank >= threshold
+        )
+        return query, rank
+
+    # Outros bancos: substring sem índice
+    query = query.filter(Paciente.search_text.contains(term, autoescape=True))
+    return query, None
+
+def _list_query(db: Session, columns: Optional[Sequence[str]]):
+    """
+    Query de pacientes carregando só as 'columns' pedidas (as demais, como
+    o texto do LLM, ficam adiadas). id e created_at sempre vêm (cursor),
+    assim como a versão (ETag da página).
+    """
+    query = db.query(Paciente)
+    if columns is not None:
+        names = {"id", "created_at", "version", *columns}
+        query = query.options(load_only(*(getattr(Paciente, name) for name in names)))
+    return query
+
 def get_multi(
-    db: Session, *, page: int = 1, page_size: int = 10, search: str = ""
+    db: Session, *, page: int = 1, page_size: int = 10, search: str = "",
+    columns: Optional[Sequence[str]] = None
 ) -> (List[Paciente], int):
     """
     Busca pacientes com paginação e busca.
+    Com busca, os resultados vêm ordenados por relevância.
+    Com 'columns', carrega só essas colunas.
     Retorna uma tupla (lista_de_pacientes, total_de_pacientes).
     """
-    query = db.query(Paciente)
-
-    if search:
-        # Busca por nome ou email (exemplo)
-        query = query.filter(
-            (Paciente.nome.ilike(f"%{search}%")) |
-            (Paciente.email.ilike(f"%{search}%"))
-        )
+    query, rank = _apply_search(db, _list_query(db, columns), search)
 
     total = query.count()
+
+    order_by = [Paciente.created_at.desc(), Paciente.id.desc()]
+    if rank is not None:
+        order_by.insert(0, rank.desc())
     
     pacientes = (
-        query.order_by(Paciente.created_at.desc())
+        query.order_by(*order_by)
         .offset((page - 1) * page_size)
         .limit(page_size)
         .all()
@@ -49,8 +277,101 @@ def get_multi(
     return pacientes, total
 
 
+def get_multi_keyset(
+    db: Session,
+    *,
+    page_size: int = 10,
+    search: str = "",
+    after: Optional[Tuple[datetime, int]] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> (List[Paciente], bool):
+    """
+    Busca pacientes por cursor (keyset) sobre (created_at, id), sem OFFSET
+    e sem COUNT: usa o índice ix_pacientes_created_at_id.
+    'after' traz a página seguinte (mais antigos), 'before' a anterior.
+    Com busca, o filtro é o mesmo do get_multi, mas a ordem continua sendo
+    (created_at, id), pois o cursor depende dela.
+    Retorna uma tupla (lista_de_pacientes, existe_mais_na_direção).
+    """
+    query, _ = _apply_search(db, _list_query(db, columns), search)
+    key = tuple_(Paciente.created_at, Paciente.id)
+
+    if before is not None:
+        query = query.filter(key > before).order_by(
+            Paciente.created_at.asc(), Paciente.id.asc()
+        )
+    else:
+        if after is not None:
+            query = query.filter(key < after)
+        query = query.order_by(Paciente.created_at.desc(), Paciente.id.desc())
+
+    # Busca um a mais para saber se existe outra página
+    pacientes = query.limit(page_size + 1).all()
+    has_more = len(pacientes) > page_size
+    pacientes = pacientes[:page_size]
+
+    if before is not None:
+        pacientes.reverse()
+
+    return pacientes, has_more
+
+
+def iter_rows(
+    db: Session, *, columns: Sequence[str], search: Optional[str] = None,
+    batch_size: int = 1000
+) -> Iterator[tuple]:
+    """
+    Percorre os pacientes (apenas as 'columns' pedidas), em ordem de ID,
+    com cursor no servidor: só 'batch_size' linhas ficam na memória por vez.
+    Aceita o mesmo filtro de busca do get_multi.
+    """
+    query = db.query(*(getattr(Paciente, column) for column in columns))
+    query, _ = _apply_search(db, query, search)
+    query = query.order_by(Paciente.id).yield_per(batch_size)
+    for row in query:
+        yield tuple(row)
+
 def remove(db: Session, *, id: int) -> None:
     """Remove um paciente do banco pelo ID."""
     obj = db.query(Paciente).get(id)
+    # Remove também os jobs de orquestração (SQLite não aplica o CASCADE)
+    remove_jobs_for_paciente(db, paciente_id=id)
     db.delete(obj)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+
+# --- Re-classificação (troca do modelo de ML) ---
+
+# Orquestrações em andamento chamam o ML por conta própria (e gravam a versão)
+_ORCHESTRATION_IN_PROGRESS = (STATUS_PENDING, STATUS_RUNNING, STATUS_DEFERRED)
+
+def _needs_rescoring(model_version: str):
+    return (
+        or_(Paciente.model_version.is_(None), Paciente.model_version != model_version),
+        or_(
+            Paciente.orchestration_status.is_(None),
+            Paciente.orchestration_status.notin_(_ORCHESTRATION_IN_PROGRESS),
+        ),
+    )
+
+def count_for_rescoring(db: Session, *, model_version: str) -> int:
+    """Pacientes classificados por outra versão do modelo (ou sem versão)."""
+    return db.execute(
+        select(func.count()).select_from(Paciente).where(*_needs_rescoring(model_version))
+    ).scalar_one()
+
+def get_for_rescoring(
+    db: Session, *, model_version: str, after_id: int, limit: int, columns: Sequence
+) -> list:
+    """
+    Próximo lote (por ID, depois de 'after_id') de pacientes a re-classificar,
+    como tuplas (id, version, is_outlier, *columns), sem carregar o ORM.
+    """
+    return db.execute(
+        select(Paciente.id, Paciente.version, Paciente.is_outlier, *columns)
+        .where(Paciente.id > after_id, *_needs_rescoring(model_version))
+        .order_by(Paciente.id)
+        .limit(limit)
+    ).all()
+
@@ -0,0 +1,56 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.paciente_models import Paciente
+from app.crud import crud_paciente
+from app.crud.crud_orchestration import remove_jobs_for_paciente
+from app.schemas.paciente_schema import PacienteCreate
+from typing import List, Optional, Sequence
+
+# Variantes assíncronas do crud_paciente (usadas quando DB_ASYNC=true)
+
+async def get_by_id(db: AsyncSession, *, id: int) -> Optional[Paciente]:
+    """Busca um paciente pelo ID."""
+    result = await db.execute(select(Paciente).where(Paciente.id == id))
+    return result.scalars().first()
+
+async def lock_version(db: AsyncSession, *, id: int, versions: Sequence[int]) -> bool:
+    """Confere a versão (If-Match) e trava a linha até o commit."""
+    result = await db.execute(
+        update(Paciente)
+        .where(Paciente.id == id, Paciente.version.in_(versions))
+        .values(version=Paciente.version, updated_at=Paciente.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+async def create_paciente(db: AsyncSession, *, paciente_in: PacienteCreate) -> Paciente:
+    """Cria um novo paciente e salva no banco."""
+    db_paciente = Paciente(**paciente_in.model_dump())
+    
+    db.add(db_paciente)
+    await db.commit()
+    await db.refresh(db_paciente)
+    return db_paciente
+
+async def get_multi(
+    db: AsyncSession, *, page: int = 1, page_size: int = 10, search: str = ""
+) -> (List[Paciente], int):
+    """
+    Busca pacientes com paginação e busca.
+    Reaproveita a consulta síncrona (busca específica de cada banco)
+    rodando-a sobre a conexão assíncrona.
+    """
+    return await db.run_sync(
+        lambda session: crud_paciente.get_multi(
+            session, page=page, page_size=page_size, search=search
+        )
+    )
+
+async def remove(db: AsyncSession, *, id: int) -> None:
+    """Remove um paciente do banco pelo ID."""
+    obj = await db.get(Paciente, id)
+    await db.run_sync(
+        lambda session: remove_jobs_for_paciente(session, paciente_id=id)
+    )
+    await db.delete(obj)
+    await db.commit()
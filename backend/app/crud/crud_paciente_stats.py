@@ -0,0 +1,263 @@
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.orchestration_models import (
+    STATUS_PENDING, STATUS_RUNNING, STATUS_DEFERRED
+)
+from app.models.paciente_models import Paciente
+from app.models.paciente_stats_models import PacienteStat
+
+# =================================================================
+# Estatísticas agregadas de pacientes (tabela 'paciente_stats')
+#
+# Cada escrita em 'pacientes' gera deltas (+1/-1) nos contadores das
+# dimensões afetadas, aplicados na mesma transação:
+#   - pelo ORM: listeners de flush da Session (create, update, delete,
+#     orquestração) - inclusive na AsyncSession;
+#   - por SQL em lote (create_multi/bulk_update): 'apply_deltas' explícito.
+#
+# A idade é guardada pelo ano de nascimento (não muda com o tempo);
+# as faixas etárias são montadas na leitura.
+# =================================================================
+
+# Atributos do paciente que alimentam as estatísticas
+STATS_ATTRS = (
+    "is_outlier", "classification_source", "orchestration_status", "data_nascimento", "sexo"
+)
+
+# Faixas etárias do dashboard: (rótulo, idade mínima, idade máxima)
+FAIXAS_ETARIAS = (
+    ("0-17", 0, 17),
+    ("18-29", 18, 29),
+    ("30-39", 30, 39),
+    ("40-49", 40, 49),
+    ("50-59", 50, 59),
+    ("60-69", 60, 69),
+    ("70+", 70, None),
+)
+
+# Estados em que a orquestração ainda não terminou
+PENDING_STATUSES = (STATUS_PENDING, STATUS_RUNNING, STATUS_DEFERRED)
+
+Bucket = Tuple[str, str]
+
+
+def buckets(values: Dict) -> List[Bucket]:
+    """Contadores (dimensão, valor) em que um paciente entra."""
+    is_outlier = values.get("is_outlier")
+    if is_outlier is None or values.get("classification_source") is None:
+        # Ainda não classificado (nem pelo ML, nem pelo scorer local)
+        risco = "sem_classificacao"
+    else:
+        risco = "outlier" if is_outlier else "estavel"
+
+    born = values.get("data_nascimento")
+    return [
+        ("total", ""),
+        ("risco", risco),
+        ("orchestration_status", values.get("orchestration_status") or "desconhecido"),
+        ("ano_nascimento", str(born.year) if born else "desconhecido"),
+        ("sexo", values.get("sexo") or "nao_informado"),
+    ]
+
+
+def deltas_for(values: Dict, sign: int) -> Counter:
+    return Counter({bucket: sign for bucket in buckets(values)})
+
+
+def apply_deltas(connection: Connection, deltas: Counter) -> None:
+    """
+    Soma os deltas nos contadores (upsert), sem commit.
+    As linhas são atualizadas sempre na mesma ordem, evitando deadlocks
+    entre transações concorrentes.
+    """
+    dialect = connection.dialect.name
+    for (dimension, bucket), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(PacienteStat).values(
+                dimension=dimension, bucket=bucket, count=delta
+            )
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=[PacienteStat.dimension, PacienteStat.bucket],
+                set_={"count": PacienteStat.count + stmt.excluded.count},
+            ))
+            continue
+
+        result = connection.execute(
+            update(PacienteStat)
+            .where(PacienteStat.dimension == dimension, PacienteStat.bucket == bucket)
+            .values(count=PacienteStat.count + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                insert(PacienteStat).values(dimension=dimension, bucket=bucket, count=delta)
+            )
+
+
+def _current_values(obj: Paciente) -> Dict:
+    return {attr: getattr(obj, attr) for attr in STATS_ATTRS}
+
+
+def _previous_values(session: Session, obj: Paciente) -> Optional[Dict]:
+    """
+    Valores antes da alteração pendente, ou None se nenhum atributo das
+    estatísticas mudou. Atributos alterados sem terem sido carregados
+    (ex.: depois de um commit) são lidos do banco.
+    """
+    state = inspect(obj)
+    previous = {}
+    changed = unknown = False
+    for attr in STATS_ATTRS:
+        history = state.attrs[attr].history
+        if history.deleted:
+            previous[attr] = history.deleted[0]
+            changed = True
+        elif history.added:
+            changed = unknown = True
+        else:
+            previous[attr] = getattr(obj, attr)
+
+    if not changed:
+        return None
+    if unknown:
+        row = session.connection().execute(
+            select(*(getattr(Paciente, attr) for attr in STATS_ATTRS))
+            .where(Paciente.id == obj.id)
+        ).one()
+        previous = dict(zip(STATS_ATTRS, row))
+    return previous
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_deltas(session, flush_context, instances):
+    """Deltas de pacientes alterados e removidos (antes do flush)."""
+    deltas = session.info.setdefault("paciente_stats_deltas", Counter())
+    for obj in session.deleted:
+        if isinstance(obj, Paciente):
+            deltas.update(deltas_for(_current_values(obj), -1))
+    for obj in session.dirty:
+        if isinstance(obj, Paciente) and obj not in session.deleted:
+            previous = _previous_values(session, obj)
+            if previous is not None:
+                deltas.update(deltas_for(previous, -1))
+                deltas.update(deltas_for(_current_values(obj), +1))
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_flush_deltas(session, flush_context):
+    """Soma os pacientes novos e grava os deltas na mesma transação."""
+    deltas = session.info.pop("paciente_stats_deltas", Counter())
+    for obj in session.new:
+        if isinstance(obj, Paciente):
+            deltas.update(deltas_for(_current_values(obj), +1))
+    apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_deltas(session, *args):
+    """
+    Flush que falhou (ou rollback): descarta os deltas já coletados, para
+    não serem somados de novo no próximo flush.
+    """
+    session.info.pop("paciente_stats_deltas", None)
+
+
+def get_stats(db: Session) -> Dict:
+    """Lê os contadores e monta a resposta do dashboard."""
+    counts: Dict[str, Dict[str, int]] = {}
+    for row in db.query(PacienteStat).filter(PacienteStat.count != 0):
+        counts.setdefault(row.dimension, {})[row.bucket] = row.count
+
+    current_year = date.today().year
+    faixas = {label: 0 for label, _, _ in FAIXAS_ETARIAS}
+    sem_idade = 0
+    for year, count in counts.get("ano_nascimento", {}).items():
+        if not year.isdigit():
+            sem_idade += count
+            continue
+        idade = current_year - int(year)
+        for label, minimum, maximum in FAIXAS_ETARIAS:
+            if idade >= minimum and (maximum is None or idade <= maximum):
+                faixas[label] += count
+                break
+    if sem_idade:
+        faixas["desconhecida"] = sem_idade
+
+    por_status = counts.get("orchestration_status", {})
+    return {
+        "total": counts.get("total", {}).get("", 0),
+        "por_risco": counts.get("risco", {}),
+        "por_status_orquestracao": por_status,
+        "orquestracoes_pendentes": sum(por_status.get(s, 0) for s in PENDING_STATUSES),
+        "por_faixa_etaria": faixas,
+        "por_sexo": counts.get("sexo", {}),
+    }
+
+
+def rebuild(db: Session) -> int:
+    """
+    Recalcula a tabela inteira a partir de 'pacientes' (um GROUP BY).
+    Retorna o total de pacientes contados.
+    """
+    year = func.extract("year", Paciente.data_nascimento)
+    rows = db.execute(
+        select(
+            Paciente.is_outlier, Paciente.classification_source, Paciente.orchestration_status,
+            year, Paciente.sexo, func.count(),
+        ).group_by(
+            Paciente.is_outlier, Paciente.classification_source, Paciente.orchestration_status,
+            year, Paciente.sexo,
+        )
+    ).all()
+
+    deltas = Counter()
+    total = 0
+    for is_outlier, source, status, born_year, sexo, count in rows:
+        values = {
+            "is_outlier": is_outlier,
+            "classification_source": source,
+            "orchestration_status": status,
+            "data_nascimento": date(int(born_year), 1, 1) if born_year else None,
+            "sexo": sexo,
+        }
+        for bucket in buckets(values):
+            deltas[bucket] += count
+        total += count
+
+    db.query(PacienteStat).delete(synchronize_session=False)
+    apply_deltas(db.connection(), deltas)
+    db.commit()
+    return total
+
+
+def rebuild_if_empty(db: Session) -> bool:
+    """Reconstrói a tabela se ela estiver vazia (ex.: banco que já tinha pacientes)."""
+    if db.query(PacienteStat).first() is not None:
+        return False
+    if db.query(Paciente.id).first() is None:
+        return False
+    rebuild(db)
+    return True
+
+
+def changed_values(rows: Iterable[Dict], values_by_id: Dict[int, Dict]) -> Counter:
+    """
+    Deltas de um UPDATE em lote: 'rows' são os valores atuais (com 'id')
+    e 'values_by_id' os campos que serão gravados em cada paciente.
+    """
+    deltas = Counter()
+    for previous in rows:
+        new = {**previous, **values_by_id[previous["id"]]}
+        deltas.update(deltas_for(previous, -1))
+        deltas.update(deltas_for(new, +1))
+    return deltas
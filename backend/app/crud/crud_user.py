@@ -1,21 +1,30 @@
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.models.user_models import User
 from app.schemas.user_schema import UserCreate
 from app.core.security import get_password_hash
+from app.core.auth_cache import user_cache
 
 def get_by_email(db: Session, *, email: str) -> User | None:
     """Busca um usuário pelo email."""
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, *, user_in: UserCreate) -> User:
-    """Cria um novo usuário e salva no banco."""
+def create_user(
+    db: Session, *, user_in: UserCreate, hashed_password: Optional[str] = None
+) -> User:
+    """
+    Cria um novo usuário e salva no banco.
+    Se 'hashed_password' vier pronto (ex: calculado no executor do bcrypt),
+    ele é usado no lugar de gerar o hash aqui.
+    """
     
     # Converte o schema Pydantic para um dict
     user_data = user_in.model_dump()
     
     # Pega a senha em texto plano e a substitui pelo hash
     plain_password = user_data.pop("password")
-    hashed_password = get_password_hash(plain_password)
+    if hashed_password is None:
+        hashed_password = get_password_hash(plain_password)
     
     # Cria o objeto do modelo SQLAlchemy
     db_user = User(**user_data, hashed_password=hashed_password, is_active=True)
@@ -23,4 +32,36 @@ def create_user(db: Session, *, user_in: UserCreate) -> User:
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    return db_user
+
+def update_password(db: Session, *, user: User, new_password: str) -> User:
+    """
+    Troca a senha do usuário e invalida os tokens dele em cache.
+    Toda troca de senha deve passar por aqui (não altere o hash direto).
+    """
+    user.hashed_password = get_password_hash(new_password)
+    db.commit()
+    db.refresh(user)
+    user_cache.invalidate_user(user.email)
+    return user
+
+def update_password_hash(db: Session, *, user: User, hashed_password: str) -> User:
+    """
+    Substitui o hash da senha (mesma senha, novo custo do bcrypt).
+    Usado no rehash transparente do login.
+    """
+    user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(user)
+    return user
+
+def set_active(db: Session, *, user: User, is_active: bool) -> User:
+    """
+    Ativa/desativa o usuário e invalida os tokens dele em cache.
+    Toda (des)ativação deve passar por aqui (não altere 'is_active' direto).
+    """
+    user.is_active = is_active
+    db.commit()
+    db.refresh(user)
+    user_cache.invalidate_user(user.email)
+    return user
\ No newline at end of file
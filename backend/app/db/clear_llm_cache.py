@@ -0,0 +1,25 @@
+"""
+Esvazia a tabela 'llm_action_cache' (ações geradas pelo LLM).
+
+Uso (a partir de backend/):
+    python -m app.db.clear_llm_cache
+
+Para trocar de modelo ou de prompt, prefira mudar o LLM_CACHE_VERSION: as
+entradas antigas deixam de valer em todos os processos. Este comando não
+alcança o cache em memória dos processos em execução, que expira pelo
+LLM_CACHE_TTL_SECONDS (ou no próximo reinício).
+"""
+from app.db.base import Base
+from app.db.session import engine
+from app.models.llm_cache_models import LlmActionCache
+from app.services.llm_cache import llm_action_cache
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[LlmActionCache.__table__])
+    removed = llm_action_cache.invalidate()
+    print(f"Cache do LLM esvaziado: {removed} entradas removidas.")
+
+
+if __name__ == "__main__":
+    main()
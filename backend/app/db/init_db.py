@@ -0,0 +1,44 @@
+"""
+Prepara o banco: cria as tabelas que faltam, adiciona as colunas novas
+em bancos antigos (app/db/upgrade.py), os índices de busca e as
+estatísticas agregadas de um banco já populado. Idempotente.
+
+Uso (a partir de backend/), antes de subir o app:
+    python -m app.db.init_db
+
+Com DB_INIT_ON_STARTUP=true o app faz o mesmo no startup (lifespan);
+importar o app não acessa o banco.
+"""
+from sqlalchemy.engine import Engine
+
+# Registra todos os modelos no Base.metadata antes do create_all
+from app.models import (  # noqa: F401
+    llm_cache_models, orchestration_models, paciente_models,
+    paciente_stats_models, user_models,
+)
+from app.crud import crud_paciente_stats
+from app.db.base import Base
+from app.db.search import setup_search
+from app.db.session import SessionLocal, engine
+from app.db.upgrade import upgrade_schema
+
+
+def init_db(bind: Engine = engine) -> None:
+    Base.metadata.create_all(bind=bind)
+    upgraded = upgrade_schema(bind) # Colunas novas e preenchimento das linhas antigas
+    setup_search(bind) # Índices de busca (pg_trgm / FTS5)
+    with SessionLocal(bind=bind) as db:
+        if upgraded:
+            # O preenchimento não passa pelos deltas (ex.: classification_source)
+            crud_paciente_stats.rebuild(db)
+        else:
+            crud_paciente_stats.rebuild_if_empty(db) # Estatísticas de um banco já populado
+
+
+def main():
+    init_db()
+    print("Banco inicializado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Ativa/desativa usuários e troca senhas pelas funções do CRUD
+('crud.set_active' / 'crud.update_password'), que invalidam o cache de
+autenticação. Não altere 'users.is_active' ou 'users.hashed_password'
+direto no banco.
+
+Uso (a partir de backend/):
+    python -m app.db.manage_user deactivate medico@exemplo.com
+    python -m app.db.manage_user activate medico@exemplo.com
+    python -m app.db.manage_user set-password medico@exemplo.com
+
+Este comando roda em outro processo: nos servidores em execução, os tokens
+já em cache continuam valendo até o AUTH_CACHE_TTL_SECONDS (ou o próximo
+reinício). Só as alterações feitas dentro do app invalidam na hora.
+"""
+import argparse
+import getpass
+import sys
+
+from app import crud
+from app.db.session import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.db.manage_user")
+    parser.add_argument("action", choices=["activate", "deactivate", "set-password"])
+    parser.add_argument("email")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user = crud.get_by_email(db, email=args.email)
+        if user is None:
+            sys.exit(f"Usuário não encontrado: {args.email}")
+        if args.action == "set-password":
+            password = getpass.getpass("Nova senha: ")
+            if password != getpass.getpass("Confirme a senha: "):
+                sys.exit("As senhas não conferem.")
+            crud.update_password(db, user=user, new_password=password)
+            print(f"Senha de {args.email} alterada.")
+        else:
+            crud.set_active(db, user=user, is_active=args.action == "activate")
+            print(f"Usuário {args.email} {'ativado' if user.is_active else 'desativado'}.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Recalcula a tabela agregada 'paciente_stats' a partir de 'pacientes'.
+
+Uso (a partir de backend/):
+    python -m app.db.rebuild_stats
+
+Necessário só se a tabela sair de sincronia (ex.: pacientes alterados
+direto no banco); o app a mantém atualizada a cada escrita.
+"""
+from app.crud import crud_paciente_stats
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[crud_paciente_stats.PacienteStat.__table__])
+    db = SessionLocal()
+    try:
+        total = crud_paciente_stats.rebuild(db)
+    finally:
+        db.close()
+    print(f"Estatísticas recalculadas: {total} pacientes.")
+
+
+if __name__ == "__main__":
+    main()
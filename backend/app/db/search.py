@@ -0,0 +1,116 @@
+import unicodedata
+from functools import lru_cache
+from typing import FrozenSet, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+# =================================================================
+# Busca de pacientes por nome/email
+#
+# O texto pesquisável ('pacientes.search_text') é normalizado em Python:
+# sem acentos, em minúsculas e com espaços simples. Assim a busca é
+# insensível a acentos em qualquer banco, sem depender da extensão
+# 'unaccent' (que não pode ser usada em índices no Postgres).
+#
+# Índices:
+#   - Postgres: GIN com pg_trgm sobre search_text (LIKE e word_similarity)
+#   - SQLite:   tabela virtual FTS5 com tokenizer 'trigram' (testes locais)
+# =================================================================
+
+# Tabela FTS5 (apenas SQLite), mantida por triggers
+SQLITE_FTS_TABLE = "pacientes_fts"
+
+
+def normalize_search_text(*parts: Optional[str]) -> str:
+    """Remove acentos, converte para minúsculas e junta as partes."""
+    raw = " ".join(part for part in parts if part)
+    decomposed = unicodedata.normalize("NFKD", raw)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.casefold().split())
+
+
+@lru_cache(maxsize=256)
+def trigrams(value: str) -> FrozenSet[str]:
+    """Trigramas (substrings de 3 caracteres) do texto já normalizado."""
+    return frozenset(value[i:i + 3] for i in range(len(value) - 2))
+
+
+def trigram_similarity(query: str, value: Optional[str]) -> float:
+    """
+    Fração dos trigramas da busca presentes no texto (0.0 a 1.0).
+    Equivalente simplificado do 'word_similarity' do pg_trgm: um prefixo
+    ou substring exato vale 1.0 e um erro de digitação perde poucos trigramas.
+    """
+    query_trigrams = trigrams(query)
+    if not query_trigrams or not value:
+        return 0.0
+    # Um trigrama está no texto se for substring dele (evita montar o conjunto
+    # de trigramas de cada linha; esta função roda uma vez por candidato)
+    found = sum(1 for trigram in query_trigrams if trigram in value)
+    return found / len(query_trigrams)
+
+
+def install_sqlite_functions(engine: Engine) -> None:
+    """Registra a função 'trgm_similarity' em cada conexão SQLite."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function(
+            "trgm_similarity", 2, trigram_similarity, deterministic=True
+        )
+
+
+def setup_search(engine: Engine) -> None:
+    """
+    Cria os índices de busca específicos de cada banco.
+    Deve rodar depois do 'Base.metadata.create_all' (é idempotente).
+    """
+    dialect = engine.dialect.name
+
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_pacientes_search_text_trgm "
+                "ON pacientes USING gin (search_text gin_trgm_ops)"
+            ))
+
+    elif dialect == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {"name": SQLITE_FTS_TABLE},
+            ).first()
+            if exists:
+                return
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5("
+                "search_text, content='pacientes', content_rowid='id', "
+                "tokenize='trigram')"
+            ))
+            # Triggers mantêm o índice FTS em sincronia com 'pacientes'
+            conn.execute(text(
+                f"CREATE TRIGGER pacientes_fts_ai AFTER INSERT ON pacientes BEGIN "
+                f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_text) "
+                f"VALUES (new.id, new.search_text); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER pacientes_fts_ad AFTER DELETE ON pacientes BEGIN "
+                f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_text) "
+                f"VALUES ('delete', old.id, old.search_text); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER pacientes_fts_au AFTER UPDATE OF search_text ON pacientes BEGIN "
+                f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_text) "
+                f"VALUES ('delete', old.id, old.search_text); "
+                f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_text) "
+                f"VALUES (new.id, new.search_text); END"
+            ))
+            # Indexa as linhas que já existiam antes da tabela FTS
+            conn.execute(text(
+                f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"
+            ))
@@ -0,0 +1,99 @@
+from typing import Iterable
+
+from sqlalchemy import Table, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.db.search import normalize_search_text
+from app.models.orchestration_models import OrchestrationJob
+from app.models.paciente_models import SOURCE_ML, Paciente
+
+# =================================================================
+# Atualização de bancos já existentes
+#
+# O 'create_all' só cria tabelas que não existem: colunas e índices
+# novos de uma tabela antiga (ex.: 'pacientes.search_text', 'version')
+# ficam de fora. 'upgrade_schema' adiciona o que falta e preenche as
+# linhas antigas. Idempotente: roda a cada 'init_db'.
+# =================================================================
+
+# Linhas por UPDATE no preenchimento do 'search_text'
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def _add_missing_columns(conn: Connection, table: Table) -> None:
+    """ALTER TABLE ... ADD COLUMN para as colunas do modelo que faltam na tabela."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    preparer = conn.dialect.identifier_preparer
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN " \
+              f"{preparer.format_column(column)} {column.type.compile(conn.dialect)}"
+        if column.server_default is not None:
+            # Com o DEFAULT as linhas antigas já recebem o valor (ex.: version=1)
+            default = column.server_default.arg
+            if not isinstance(default, str):
+                default = default.compile(dialect=conn.dialect)
+            ddl += f" DEFAULT {default}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+        conn.execute(text(ddl))
+
+
+def _create_missing_indexes(conn: Connection, tables: Iterable[Table]) -> None:
+    for table in tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _backfill_search_text(conn: Connection) -> int:
+    """Preenche o 'search_text' das linhas criadas antes da busca indexada."""
+    statement = (
+        update(Paciente.__table__)
+        .where(Paciente.id == bindparam("row_id"))
+        # Não é uma alteração do paciente: mantém o 'updated_at'
+        .values(search_text=bindparam("new_search_text"), updated_at=Paciente.updated_at)
+    )
+    total = 0
+    while True:
+        rows = conn.execute(
+            select(Paciente.id, Paciente.nome, Paciente.email)
+            .where(Paciente.search_text.is_(None))
+            .order_by(Paciente.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return total
+        conn.execute(statement, [
+            {"row_id": id, "new_search_text": normalize_search_text(nome, email)}
+            for id, nome, email in rows
+        ])
+        total += len(rows)
+
+
+def upgrade_schema(engine: Engine) -> int:
+    """
+    Adiciona colunas/índices que faltam em 'pacientes' e 'orchestration_jobs'
+    e preenche as linhas antigas. Deve rodar depois do 'create_all' e antes do 'setup_search'
+    (o índice FTS do SQLite é montado a partir do 'search_text').
+    Retorna quantos pacientes foram alterados.
+    """
+    table = Paciente.__table__
+    with engine.begin() as conn:
+        for upgraded in (table, OrchestrationJob.__table__):
+            _add_missing_columns(conn, upgraded)
+        _create_missing_indexes(conn, [table])
+        changed = _backfill_search_text(conn)
+        # Banco em que a coluna já existia sem o DEFAULT
+        changed += conn.execute(
+            update(table).where(table.c.version.is_(None))
+            .values(version=1, updated_at=table.c.updated_at)
+        ).rowcount
+        # Classificados antes do 'classification_source' existir: só o ML
+        # gravava o 'is_outlier' (sem a origem, contariam como não classificados)
+        changed += conn.execute(
+            update(table)
+            .where(table.c.is_outlier.is_not(None), table.c.classification_source.is_(None))
+            .values(classification_source=SOURCE_ML, updated_at=table.c.updated_at)
+        ).rowcount
+    return changed
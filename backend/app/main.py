@@ -1,18 +1,41 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, Response
 # 1. Importe o 'api_router' principal (de app/api/api_v1/api.py)
 from app.api.api_v1.api import api_router 
-from app.db.base import Base
-from app.db.session import engine
+from app.core import log, metrics, sql_profiler
+from app.core.config import settings
+from app.core.security import PasswordHashingBusy, password_hasher
+from app.db.init_db import init_db
 from fastapi.middleware.cors import CORSMiddleware
+from app.services.orchestration_queue import orchestration_queue
+from app.services.http_client import close_clients
+from app.services.paciente_service import run_orchestration_job
 
-# --- Criação das Tabelas ---
-Base.metadata.create_all(bind=engine)
-# ---------------------------
+# Importar este módulo não acessa o banco nem a rede: a criação das
+# tabelas/índices é opcional (DB_INIT_ON_STARTUP) ou feita antes do
+# deploy com 'python -m app.db.init_db'.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log.start_logging() # Logs estruturados, escritos em uma thread à parte
+    if settings.DB_INIT_ON_STARTUP:
+        await asyncio.to_thread(init_db) # Tabelas, índices de busca e estatísticas
+
+    # Inicia os workers da fila de orquestração (e recupera jobs pendentes)
+    await orchestration_queue.start(run_orchestration_job)
+    yield
+    await orchestration_queue.stop()
+    await close_clients() # Fecha os pools de conexão do ML/LLM
+    password_hasher.shutdown()
+    log.stop_logging() # Escreve o que ainda estiver na fila
 
 app = FastAPI(
     title="Conecta+Saúde - Backend Principal",
     description="API para gerenciamento de pacientes e orquestração de serviços de ML/LLM.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 2. Defina as origens permitidas (CONFIRME A PORTA DO SEU FRONTEND)
@@ -30,10 +53,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latência, requisições em andamento e consultas ao banco por rota (GET /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Server-Timing com consultas/tempo de banco e log de consultas lentas/repetidas
+if settings.SQL_PROFILING:
+    app.add_middleware(sql_profiler.SQLProfilingMiddleware)
+
+# request_id por requisição (X-Request-ID), incluído nos logs. Adicionado
+# por último para envolver os demais (os logs deles também levam o ID)
+app.add_middleware(log.CorrelationIdMiddleware)
+
+# Executor do bcrypt saturado (rajada de logins): recusa rápido em vez de enfileirar
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Muitas autenticações simultâneas. Tente novamente em instantes."},
+        headers={"Retry-After": "1"},
+    )
+
 # 4. Inclua o 'api_router' principal com o prefixo /api/v1
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/", tags=["Health Check"])
 def health_check():
     """Verifica se a API está online."""
-    return {"status": "ok", "service": "Backend Principal"}
\ No newline at end of file
+    return {"status": "ok", "service": "Backend Principal"}
+
+
+@app.get("/metrics", tags=["Health Check"], include_in_schema=False)
+def metrics_endpoint():
+    """
+    Métricas no formato texto do Prometheus. Sem autenticação, como o
+    health check: restrinja o acesso na rede/proxy.
+    """
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return Response(metrics.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class LlmActionCache(Base):
+    """
+    Cache persistente das ações geradas pelo LLM.
+    A chave é o SHA-256 do payload canônico enviado ao LLM, então pacientes
+    com as mesmas features reaproveitam o mesmo texto.
+    """
+    __tablename__ = "llm_action_cache"
+
+    key = Column(String(64), primary_key=True)
+
+    # Versão do modelo/prompt que gerou o texto (LLM_CACHE_VERSION).
+    # Trocar a versão invalida as entradas antigas.
+    model_version = Column(String, index=True, nullable=False)
+
+    generated_actions = Column(Text, nullable=False)
+    latency_ms = Column(Float, nullable=True) # Quanto a chamada original levou
+    hit_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
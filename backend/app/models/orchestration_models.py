@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+# Estados possíveis de um job de orquestração (ML -> LLM)
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# ML/LLM indisponível: o job é retomado em 'retry_at' (backoff exponencial a
+# partir de ORCHESTRATION_DEFER_SECONDS), até ORCHESTRATION_MAX_ATTEMPTS tentativas
+STATUS_DEFERRED = "deferred"
+
+
+class OrchestrationJob(Base):
+    """
+    Job persistido da fila de orquestração.
+    Cada linha representa uma execução do fluxo ML/LLM para um paciente.
+    """
+    __tablename__ = "orchestration_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    paciente_id = Column(
+        Integer, ForeignKey("pacientes.id", ondelete="CASCADE"),
+        index=True, nullable=False
+    )
+
+    status = Column(String, index=True, nullable=False, default=STATUS_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True) # Última mensagem de erro (se falhou)
+
+    # True quando o ML já classificou o paciente (ex: importação em massa)
+    # e o job só precisa gerar as ações do LLM
+    skip_ml = Column(Boolean, nullable=False, default=False)
+
+    # Processo que assumiu o job ('running') e seu último sinal de vida.
+    # Jobs sem heartbeat há ORCHESTRATION_STALE_SECONDS voltam para a fila.
+    owner = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Quando um job 'deferred' pode voltar para a fila
+    retry_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,13 +1,25 @@
+from datetime import datetime, timezone
 from sqlalchemy import (
     Column, Integer, String, Boolean, Date, Float, 
-    ForeignKey, DateTime, Text
+    ForeignKey, DateTime, Text, Index
 )
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
 from sqlalchemy.sql import func
 from app.db.base import Base
+from app.db.search import normalize_search_text
 # from sqlalchemy.orm import relationship # Se precisar vincular Paciente ao User
 
+# Origem da classificação (classification_source)
+SOURCE_ML = "ml"
+SOURCE_LOCAL = "local"
+
 class Paciente(Base):
     __tablename__ = "pacientes"
+    __table_args__ = (
+        # Serve a ordenação da listagem e a paginação por cursor (keyset)
+        Index("ix_pacientes_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -18,6 +30,16 @@ class Paciente(Base):
     email = Column(String, index=True, unique=True, nullable=False)
     nome = Column(String, nullable=False)
     data_nascimento = Column(Date, nullable=False)
+
+    # Nome + email normalizados (sem acentos, minúsculas) para a busca indexada.
+    # Preenchido automaticamente; veja app/db/search.py
+    search_text = Column(
+        String, nullable=True,
+        default=lambda context: normalize_search_text(
+            context.get_current_parameters().get("nome"),
+            context.get_current_parameters().get("email"),
+        )
+    )
     
     # Demográficos
     sexo = Column(String, nullable=True)
@@ -54,14 +76,61 @@ class Paciente(Base):
     # --- Campos de Resultado (pós-processamento) ---
     
     # Metadados
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # O default em Python grava com microssegundos e no mesmo formato usado
+    # nas comparações do cursor (no SQLite o func.now() perde essa precisão)
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        default=lambda: datetime.now(timezone.utc)
+    )
     
-    # Resultados do ML (Classificação)
-    is_outlier = Column(Boolean, default=False)
+    # Resultados do ML (Classificação). None até o paciente ser classificado
+    # (ML fora do ar, orquestração pendente/adiada): não é "estável".
+    is_outlier = Column(Boolean, nullable=True)
+    # Versão do modelo de ML que gerou o 'is_outlier' (ML_MODEL_VERSION ou a
+    # informada pelo serviço). Pacientes de versões antigas são re-classificados
+    # por 'python -m app.services.rescoring_service'.
+    model_version = Column(String, nullable=True)
+    # Origem do 'is_outlier': SOURCE_ML (serviço de ML) ou SOURCE_LOCAL
+    # (scorer local provisório, app/services/local_scorer.py)
+    classification_source = Column(String, nullable=True)
+
+    # Estado da orquestração em segundo plano (pending/running/done/failed/deferred)
+    orchestration_status = Column(String, nullable=True, default="pending")
     
     # Resultados do LLM (Ações)
     acoes_geradas_llm = Column(Text, nullable=True) # Campo para guardar o texto do LLM
+
+    # Controle de alterações: 'version' sobe a cada UPDATE e forma o ETag
+    # do paciente (GET condicional e If-Match no PUT/DELETE)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    # Hash das features enviadas ao ML na última orquestração concluída.
+    # Um PUT que não muda as features (ex.: só nome/email/endereço) não re-orquestra.
+    features_fingerprint = Column(String(64), nullable=True)
     
     # (Opcional) Chave estrangeira para o profissional que cadastrou
     # owner_id = Column(Integer, ForeignKey("users.id"))
-    # owner = relationship("User", back_populates="pacientes")
\ No newline at end of file
+    # owner = relationship("User", back_populates="pacientes")
+
+
+@event.listens_for(Paciente, "before_update")
+def _update_search_text(mapper, connection, target):
+    """Mantém o 'search_text' em dia quando nome/email mudam pelo ORM."""
+    target.search_text = normalize_search_text(target.nome, target.email)
+
+
+@event.listens_for(Paciente, "before_update")
+def _bump_version(mapper, connection, target):
+    """
+    Nova versão quando alguma coluna muda pelo ORM. O incremento é feito no
+    próprio UPDATE (version = version + 1), sem ler o valor atual.
+    UPDATEs em lote (crud_paciente.bulk_update) incrementam por conta própria.
+    """
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = Paciente.version + 1
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String
+from app.db.base import Base
+
+
+class PacienteStat(Base):
+    """
+    Contadores agregados de pacientes para o dashboard (GET /pacientes/stats).
+    Uma linha por (dimensão, valor), ex.: ("risco", "outlier") -> 42.
+    Mantida na mesma transação das escritas em 'pacientes'; veja
+    app/crud/crud_paciente_stats.py.
+    """
+    __tablename__ = "paciente_stats"
+
+    dimension = Column(String, primary_key=True)
+    bucket = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, computed_field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import date, datetime
 
 # =================================================================
@@ -41,6 +41,15 @@ class PacienteCreate(PacienteBase):
 # =================================================================
 # Schema de SAÍDA (Baseado no PacienteOut do api.ts)
 # =================================================================
+SEM_RECOMENDACAO = "Nenhuma recomendação gerada."
+
+def risco_label(is_outlier: Optional[bool], classification_source: Optional[str]) -> str:
+    """TRADUZ 'is_outlier: bool' para o texto de risco que o frontend espera."""
+    if is_outlier is None or classification_source is None:
+        # Ainda não classificado (ML falhou/pendente): o 'N/A' do frontend
+        return "Não Calculado"
+    return "Crítico" if is_outlier else "Estável"
+
 class Paciente(PacienteBase): # (Herda os 22 campos)
     id: int
     created_at: datetime
@@ -49,9 +58,12 @@ class Paciente(PacienteBase): # (Herda os 22 campos)
     # Estes são os campos que o service.py salvou no banco
     is_outlier: Optional[bool] = None # (Ex: False)
     acoes_geradas_llm: Optional[str] = None # (Ex: "Paciente estável...")
+    orchestration_status: Optional[str] = None # pending/running/done/failed/deferred
+    model_version: Optional[str] = None # Versão do modelo de ML que classificou
+    classification_source: Optional[str] = None # ml (serviço de ML) ou local (provisório)
 
     # --- Campos Calculados para o Frontend ---
-    # (Valores padrão, se o ML falhar e 'is_outlier' for None)
+    # (Valores padrão, se o paciente ainda não foi classificado)
     probabilidade_diabetes: float = 0.0
     probabilidade_hipertensao: float = 0.0
 
@@ -62,10 +74,7 @@ class Paciente(PacienteBase): # (Herda os 22 campos)
         TRADUZ 'is_outlier: bool' para 'risco_diabetes: str'
         que o frontend espera.
         """
-        if self.is_outlier is None:
-            # Se o ML falhou, o 'N/A' do seu frontend deve ser isso
-            return "Não Calculado" 
-        return "Crítico" if self.is_outlier else "Estável"
+        return risco_label(self.is_outlier, self.classification_source)
 
     @computed_field
     @property
@@ -74,9 +83,7 @@ class Paciente(PacienteBase): # (Herda os 22 campos)
         TRADUZ 'is_outlier: bool' para 'risco_hipertensao: str'
         que o frontend espera.
         """
-        if self.is_outlier is None:
-            return "Não Calculado"
-        return "Crítico" if self.is_outlier else "Estável"
+        return risco_label(self.is_outlier, self.classification_source)
         
     @computed_field
     @property
@@ -85,22 +92,125 @@ class Paciente(PacienteBase): # (Herda os 22 campos)
         Passa o campo 'acoes_geradas_llm' do banco para o campo 
         'recomendacao_geral' que o frontend espera.
         """
-        return self.acoes_geradas_llm or "Nenhuma recomendação gerada."
+        return self.acoes_geradas_llm or SEM_RECOMENDACAO
 
     class Config:
         from_attributes = True
 
 
+# =================================================================
+# Schema de SAÍDA para o estado da ORQUESTRAÇÃO (polling)
+# =================================================================
+class OrchestrationStatus(BaseModel):
+    """ Estado do fluxo ML/LLM em segundo plano de um paciente """
+    paciente_id: int
+    orchestration_status: Optional[str] = None # pending/running/done/failed/deferred
+    job_id: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    # Resultados (preenchidos quando o status for 'done')
+    is_outlier: Optional[bool] = None
+    acoes_geradas_llm: Optional[str] = None
+
+
+# =================================================================
+# Schema de SAÍDA para o DASHBOARD (GET /pacientes/stats)
+# =================================================================
+class PacienteStats(BaseModel):
+    """ Contadores agregados de pacientes (sem varrer a tabela) """
+    total: int
+    por_risco: Dict[str, int]                # outlier/estavel/sem_classificacao
+    por_status_orquestracao: Dict[str, int]
+    orquestracoes_pendentes: int             # pending + running + deferred
+    por_faixa_etaria: Dict[str, int]         # pelo ano de nascimento
+    por_sexo: Dict[str, int]
+
+
 # =================================================================
 # Schema de SAÍDA para LISTAGEM (Baseado no PacienteListResponse)
 # =================================================================
 class PacienteListMeta(BaseModel):
-    total: int
-    page: int
+    # No modo cursor não há COUNT nem número de página: total/page/total_pages vêm nulos
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+
+    # Cursores opacos para a página seguinte/anterior (paginação keyset)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class PacienteListResponse(BaseModel):
     """ Schema para a resposta paginada de pacientes """
     items: List[Paciente]
-    meta: PacienteListMeta
\ No newline at end of file
+    meta: PacienteListMeta
+
+
+class PacienteSummary(BaseModel):
+    """
+    Item da listagem: o paciente completo (padrão) ou uma projeção leve.
+    Só os campos pedidos aparecem ('fields=', ou LIST_SUMMARY_FIELDS de
+    paciente_service com 'view=summary'); os nomes e valores são os mesmos
+    do schema Paciente.
+    """
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    email: Optional[str] = None
+    nome: Optional[str] = None
+    endereco: Optional[str] = None
+    data_nascimento: Optional[date] = None
+    sexo: Optional[str] = None
+    escolaridade: Optional[str] = None
+    renda_familiar_sm: Optional[str] = None
+    atividade_fisica: Optional[str] = None
+    consumo_alcool: Optional[str] = None
+    tabagismo_atual: Optional[bool] = None
+    qualidade_dieta: Optional[str] = None
+    qualidade_sono: Optional[str] = None
+    nivel_estresse: Optional[str] = None
+    suporte_social: Optional[str] = None
+    historico_familiar_dc: Optional[bool] = None
+    acesso_servico_saude: Optional[str] = None
+    aderencia_medicamento: Optional[str] = None
+    consultas_ultimo_ano: Optional[int] = None
+    imc: Optional[float] = None
+    pressao_sistolica_mmHg: Optional[int] = None
+    pressao_diastolica_mmHg: Optional[int] = None
+    glicemia_jejum_mg_dl: Optional[int] = None
+    colesterol_total_mg_dl: Optional[int] = None
+    hdl_mg_dl: Optional[int] = None
+    triglicerides_mg_dl: Optional[int] = None
+    is_outlier: Optional[bool] = None
+    acoes_geradas_llm: Optional[str] = None
+    orchestration_status: Optional[str] = None
+    model_version: Optional[str] = None
+    classification_source: Optional[str] = None
+    probabilidade_diabetes: Optional[float] = None
+    probabilidade_hipertensao: Optional[float] = None
+    risco_diabetes: Optional[str] = None
+    risco_hipertensao: Optional[str] = None
+    recomendacao_geral: Optional[str] = None
+
+class PacienteSummaryListResponse(BaseModel):
+    """ Resposta paginada da listagem (pacientes completos ou projeção leve) """
+    items: List[PacienteSummary]
+    meta: PacienteListMeta
+
+
+# =================================================================
+# Schema de SAÍDA para IMPORTAÇÃO EM MASSA (POST /pacientes/bulk)
+# =================================================================
+class BulkImportError(BaseModel):
+    row: int # Número da linha/elemento no corpo enviado (começa em 1)
+    error: str
+
+class BulkImportResponse(BaseModel):
+    """ Relatório da importação: linhas inválidas não interrompem o restante """
+    total: int
+    created: int
+    failed: int
+    errors: List[BulkImportError] # Limitado por BULK_IMPORT_MAX_ERRORS
\ No newline at end of file
@@ -0,0 +1,74 @@
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+
+@dataclass
+class _Channel:
+    running: bool = False
+    parts: List[str] = field(default_factory=list) # Trechos já gerados na execução atual
+    subscribers: Set[asyncio.Queue] = field(default_factory=set)
+
+
+class ActionBroadcast:
+    """
+    Repasse em processo dos trechos do LLM, por paciente.
+
+    Quem executa a orquestração do paciente (worker da fila ou a tarefa
+    disparada pelo SSE) publica cada trecho; quem acompanha pelo SSE recebe
+    os trechos já gerados e os seguintes, e None quando a execução termina
+    (o resultado final é lido do banco).
+
+    Só funciona dentro do mesmo processo: se outro processo estiver
+    executando o job, o SSE acompanha o estado pelo banco.
+    """
+
+    def __init__(self):
+        self._channels: Dict[int, _Channel] = {}
+
+    def publish(self, paciente_id: int, chunk: str) -> None:
+        channel = self._channels.get(paciente_id)
+        if channel is None or not chunk:
+            return
+        channel.parts.append(chunk)
+        for queue in channel.subscribers:
+            queue.put_nowait(chunk)
+
+    @contextmanager
+    def running(self, paciente_id: int) -> Iterator[None]:
+        """Marca a execução da orquestração do paciente; ao sair, avisa quem acompanha."""
+        channel = self._channels.setdefault(paciente_id, _Channel())
+        channel.running = True
+        channel.parts = []
+        try:
+            yield
+        finally:
+            channel.running = False
+            channel.parts = []
+            for queue in channel.subscribers:
+                queue.put_nowait(None)
+            self._discard_if_idle(paciente_id)
+
+    @contextmanager
+    def subscribe(self, paciente_id: int) -> Iterator["asyncio.Queue[Optional[str]]"]:
+        """Fila com os trechos (já gerados e novos) e None no fim da execução."""
+        channel = self._channels.setdefault(paciente_id, _Channel())
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in channel.parts:
+            queue.put_nowait(chunk)
+        channel.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            channel.subscribers.discard(queue)
+            self._discard_if_idle(paciente_id)
+
+    def _discard_if_idle(self, paciente_id: int) -> None:
+        channel = self._channels.get(paciente_id)
+        if channel is not None and not channel.running and not channel.subscribers:
+            del self._channels[paciente_id]
+
+
+# Instância única (worker da fila e SSE rodam no mesmo event loop)
+acoes_broadcast = ActionBroadcast()
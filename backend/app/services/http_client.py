@@ -1,53 +1,434 @@
+import asyncio
+import random
+import time
+from typing import AsyncIterator, List, Optional
 import httpx
 from fastapi import HTTPException, status
 from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import SERVICE_CALLS, SERVICE_LATENCY, Counter, Gauge, registry
+from .single_flight import SingleFlight, payload_key
 
-# Usamos um AsyncClient para chamadas de API assíncronas
-# Isso evita que nosso servidor trave enquanto espera a resposta do ML/LLM
-client = httpx.AsyncClient(
-    timeout=30.0  # timeout de 30 segundos
+log = get_logger(__name__)
+
+# Respostas que valem uma nova tentativa (o serviço pode se recuperar)
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+class ServiceUnavailable(HTTPException):
+    """
+    Microserviço indisponível (offline, timeout, 5xx ou circuito aberto),
+    mesmo após as novas tentativas. A orquestração fica 'deferred' e é
+    retomada depois, em vez de falhar.
+    """
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
+
+
+class CircuitOpenError(ServiceUnavailable):
+    """O circuito do serviço está aberto: a chamada nem é feita."""
+
+
+class CircuitBreaker:
+    """
+    Disjuntor simples por serviço.
+
+    Após 'failure_threshold' falhas seguidas o circuito abre e as chamadas
+    falham na hora por 'reset_timeout' segundos. Depois disso uma única
+    chamada de teste passa (meio-aberto): sucesso fecha o circuito, falha
+    o abre de novo.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, *, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self) -> bool:
+        """Retorna False se a chamada deve falhar imediatamente."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """
+        Libera a chamada de teste que terminou sem registrar sucesso ou falha
+        (cancelada, ou com um erro que não é de transporte). Sem isso o
+        circuito ficaria meio-aberto rejeitando todas as chamadas.
+        """
+        self._trial_in_flight = False
+
+
+class ServiceClient:
+    """
+    Cliente HTTP de um microserviço, com:
+      - pool de conexões próprio (limites e timeouts de conexão/leitura);
+      - novas tentativas com backoff exponencial e jitter;
+      - disjuntor (circuit breaker);
+      - requisições "hedged" opcionais: se a resposta demorar mais que
+        'hedge_delay' segundos, uma segunda requisição igual é disparada
+        e vale a que responder primeiro.
+
+    O httpx.AsyncClient é criado na primeira chamada e fechado por 'aclose'
+    (no shutdown do app).
+    """
+
+    def __init__(
+        self, name: str, *, max_connections: int, connect_timeout: float,
+        read_timeout: float, retries: int, hedge_delay: float = 0.0
+    ):
+        self.name = name
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.hedge_delay = hedge_delay
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURES,
+            reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout,
+                    read=self.read_timeout,
+                    write=self.read_timeout,
+                    pool=self.read_timeout,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post_json(self, url: str, data) -> dict:
+        """
+        POST com JSON e retorno do corpo JSON.
+        Lança CircuitOpenError/ServiceUnavailable se o serviço estiver fora
+        e HTTPException (503) se ele recusar a requisição (4xx).
+        """
+        trial = self._admit()
+        try:
+            return await self._post_json(url, data)
+        finally:
+            if trial:
+                self.breaker.release_trial()
+
+    async def _post_json(self, url: str, data) -> dict:
+        start = time.perf_counter()
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt))
+            try:
+                response = await self._send(url, data)
+            except httpx.TransportError as e:
+                last_error = f"{type(e).__name__}: {e}"
+                continue
+
+            if response.status_code in RETRYABLE_STATUS:
+                last_error = f"HTTP {response.status_code}"
+                continue
+
+            # Uma resposta (mesmo 4xx) mostra que o serviço está no ar
+            self.breaker.record_success()
+            if response.is_error:
+                self._record("rejected", start)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Erro do serviço {self.name}: {response.text}"
+                )
+            self._record("success", start)
+            return response.json()
+
+        self.breaker.record_failure()
+        self._record("unavailable", start)
+        raise ServiceUnavailable(f"Serviço {self.name} está offline: {last_error}")
+
+    async def stream_text(self, url: str, data) -> AsyncIterator[str]:
+        """
+        POST com JSON e repasse do corpo à medida que chega.
+        Respostas 'text/event-stream' têm as linhas 'data:' extraídas; as
+        demais são repassadas como texto. Sem novas tentativas: parte do
+        texto pode já ter sido entregue a quem chamou.
+        """
+        trial = self._admit()
+        start = time.perf_counter()
+        try:
+            async with self.client.stream("POST", url, json=data) as response:
+                if response.status_code in RETRYABLE_STATUS:
+                    self.breaker.record_failure()
+                    self._record("unavailable", start)
+                    raise ServiceUnavailable(
+                        f"Serviço {self.name} está offline: HTTP {response.status_code}"
+                    )
+                self.breaker.record_success()
+                if response.is_error:
+                    await response.aread()
+                    self._record("rejected", start)
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail=f"Erro do serviço {self.name}: {response.text}"
+                    )
+
+                if response.headers.get("content-type", "").startswith("text/event-stream"):
+                    # Cada evento termina numa linha em branco; várias linhas
+                    # 'data:' do mesmo evento são unidas com '\n'
+                    data_lines = []
+                    async for line in response.aiter_lines():
+                        if line.startswith("data:"):
+                            data_lines.append(line[5:].removeprefix(" "))
+                            continue
+                        if line or not data_lines:
+                            continue
+                        chunk = "\n".join(data_lines)
+                        data_lines = []
+                        if chunk == "[DONE]":
+                            break
+                        yield chunk
+                else:
+                    async for chunk in response.aiter_text():
+                        if chunk:
+                            yield chunk
+            # Latência até o fim do stream
+            self._record("success", start)
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            self._record("unavailable", start)
+            raise ServiceUnavailable(
+                f"Serviço {self.name} está offline: {type(e).__name__}: {e}"
+            )
+        finally:
+            if trial:
+                self.breaker.release_trial()
+
+    def _admit(self) -> bool:
+        """
+        Passa pelo disjuntor (CircuitOpenError se estiver aberto).
+        Retorna True se esta for a chamada de teste do circuito meio-aberto:
+        quem chama a libera ('release_trial') ao terminar, de qualquer jeito.
+        """
+        trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+        if not self.breaker.before_call():
+            SERVICE_CALLS.inc(self.name, "circuit_open")
+            raise CircuitOpenError(
+                f"Serviço {self.name} indisponível (circuito aberto); tente mais tarde"
+            )
+        return trial
+
+    def _record(self, outcome: str, start: float) -> None:
+        """Registra o resultado e a latência da chamada (métricas /metrics)."""
+        SERVICE_CALLS.inc(self.name, outcome)
+        SERVICE_LATENCY.observe(self.name, value=time.perf_counter() - start)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Backoff exponencial com "full jitter"."""
+        ceiling = min(
+            settings.HTTP_RETRY_BACKOFF_MAX_SECONDS,
+            settings.HTTP_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1),
+        )
+        return random.uniform(0, ceiling)
+
+    async def _send(self, url: str, data) -> httpx.Response:
+        if self.hedge_delay <= 0:
+            return await self.client.post(url, json=data)
+
+        first = asyncio.create_task(self.client.post(url, json=data))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done:
+            return first.result()
+
+        # A primeira está lenta: dispara a segunda e fica com a mais rápida
+        second = asyncio.create_task(self.client.post(url, json=data))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "service": self.name,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+ml_client = ServiceClient(
+    "ML",
+    max_connections=settings.ML_MAX_CONNECTIONS,
+    connect_timeout=settings.ML_CONNECT_TIMEOUT,
+    read_timeout=settings.ML_READ_TIMEOUT,
+    retries=settings.ML_RETRIES,
+    hedge_delay=settings.ML_HEDGE_DELAY_MS / 1000,
+)
+llm_client = ServiceClient(
+    "LLM",
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+    read_timeout=settings.LLM_READ_TIMEOUT,
+    retries=settings.LLM_RETRIES,
 )
 
+
+registry.register(Gauge(
+    "service_circuit_open", "1 se o circuito do serviço está aberto (ou meio-aberto).",
+    ("service",),
+    collect=lambda: [
+        ((client.name,), 0.0 if client.breaker.state == CircuitBreaker.CLOSED else 1.0)
+        for client in (ml_client, llm_client)
+    ],
+))
+
+
+# Agrupa chamadas idênticas em andamento (mesma URL e mesmo payload)
+single_flight = SingleFlight(max_keys=settings.SINGLE_FLIGHT_MAX_KEYS)
+
+def _single_flight_calls():
+    stats = single_flight.stats()
+    return [
+        (("executed",), float(stats["calls"])),
+        (("coalesced",), float(stats["coalesced"])),
+        (("bypassed",), float(stats["bypassed"])),
+    ]
+
+registry.register(Counter(
+    "single_flight_calls_total",
+    "Chamadas ao ML/LLM pelo agrupamento: executed (fez a chamada), "
+    "coalesced (aproveitou uma em andamento) ou bypassed (limite de chaves).",
+    ("result",), collect=_single_flight_calls,
+))
+registry.register(Gauge(
+    "single_flight_in_flight", "Chamadas compartilhadas ao ML/LLM em andamento.",
+    collect=lambda: [((), float(single_flight.stats()["inflight"]))],
+))
+
+
+async def _post_coalesced(client: ServiceClient, url: str, data) -> dict:
+    key = payload_key({"url": url, "data": data})
+    return await single_flight.do(key, lambda: client.post_json(url, data))
+
+
+async def close_clients() -> None:
+    """Fecha os pools de conexão (chamado no shutdown do app)."""
+    await ml_client.aclose()
+    await llm_client.aclose()
+
+
 async def call_ml_service(data: dict) -> dict:
     """
     Chama o microserviço de classificação de ML.
     (Esta é a função que estava faltando)
     """
     url = settings.ML_SERVICE_URL # "http://localhost:8001/classify"
-    
-    try:
-        response = await client.post(url, json=data)
-        response.raise_for_status() # Lança exceção se for 4xx ou 5xx
-        return response.json()
-    
-    except httpx.HTTPStatusError as e:
-        # O serviço de ML retornou um erro (ex: 422 Unprocessable Entity)
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Erro ao classificar paciente (ML): {e.response.json()}"
-        )
-    except httpx.RequestError as e:
-        # Erro de conexão (serviço ML está offline)
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Serviço de classificação (ML) está offline: {e}"
-        )
+    return await _post_coalesced(ml_client, url, data)
 
 async def call_llm_service(data: dict) -> dict:
     url = settings.LLM_SERVICE_URL
-    print(f"🔗 Chamando LLM em: {url}")
-    print(f"📦 Payload enviado: {data}")
-
-    try:
-        response = await client.post(url, json=data)
-        print(f"📬 Resposta do LLM: {response.status_code}")
-        print(await response.aread())  # mostra o corpo bruto
-        response.raise_for_status()
-        return response.json()
-
-    except httpx.RequestError as e:
-        print(f"❌ Erro de conexão: {e}")
+    # Caminho quente: DEBUG e amostrado; os dados do paciente saem redigidos
+    log.debug("Chamando LLM", url=url, payload=data, sample_rate=settings.LOG_HOT_PATH_SAMPLE_RATE)
+
+    result = await _post_coalesced(llm_client, url, data)
+    log.debug(
+        "Resposta do LLM", url=url, chars=len(result.get("generated_actions") or ""),
+        sample_rate=settings.LOG_HOT_PATH_SAMPLE_RATE,
+    )
+    return result
+
+async def stream_llm_service(data: dict) -> AsyncIterator[str]:
+    """
+    Gera o texto do LLM em trechos, à medida que o serviço responde.
+    Sem LLM_STREAM_URL, chama o LLM_SERVICE_URL e entrega o texto inteiro.
+    """
+    url = settings.LLM_STREAM_URL
+    if not url:
+        result = await call_llm_service(data)
+        if result.get("generated_actions"):
+            yield result["generated_actions"]
+        return
+
+    log.debug("Chamando LLM (streaming)", url=url, sample_rate=settings.LOG_HOT_PATH_SAMPLE_RATE)
+    async for chunk in llm_client.stream_text(url, data):
+        yield chunk
+
+async def call_ml_service_batch(items: List[dict]) -> List[dict]:
+    """
+    Classifica um lote de pacientes no serviço de ML.
+    Usa o ML_BATCH_SERVICE_URL ({"items": [...]} -> {"results": [...]})
+    quando configurado; caso contrário, faz uma chamada por paciente, com
+    até ML_PER_ITEM_CONCURRENCY simultâneas (a primeira falha derruba o lote).
+    """
+    url = settings.ML_BATCH_SERVICE_URL
+    if not url:
+        semaphore = asyncio.Semaphore(max(1, settings.ML_PER_ITEM_CONCURRENCY))
+
+        async def classify(item: dict) -> dict:
+            async with semaphore:
+                return await call_ml_service(item)
+
+        results = await asyncio.gather(*(classify(item) for item in items), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    response = await _post_coalesced(ml_client, url, {"items": items})
+    results = response.get("results") or []
+
+    if len(results) != len(items):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Serviço de geração de ações (LLM) está offline: {e}"
-        )
\ No newline at end of file
+            detail="Resposta do ML em lote com número de resultados diferente do enviado"
+        )
+    return results
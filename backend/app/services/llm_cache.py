@@ -0,0 +1,230 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.lru_cache import TTLLRUCache
+from app.core.metrics import Counter, Gauge, registry
+from app.crud import crud_llm_cache
+from app.db import session as db_session
+from .http_client import stream_llm_service
+from .single_flight import payload_key
+
+log = get_logger(__name__)
+
+# A cada quantas gravações o cache persistente é podado (TTL, versão e tamanho)
+PRUNE_EVERY_WRITES = 500
+
+
+class LlmActionCache:
+    """
+    Cache das ações geradas pelo LLM, em dois níveis:
+      1. memória (LRU com TTL), por processo;
+      2. tabela 'llm_action_cache', compartilhada entre processos e reinícios.
+
+    As entradas guardam a versão do modelo/prompt (LLM_CACHE_VERSION) e só
+    são reaproveitadas pela mesma versão. Também guardam quanto a chamada
+    original levou, para medir a latência economizada a cada acerto.
+    """
+
+    def __init__(
+        self, *, enabled: bool, version: str, memory_size: int,
+        ttl: float, max_entries: int
+    ):
+        self.enabled = enabled
+        self.version = version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = TTLLRUCache(maxsize=memory_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        # Contadores
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.saved_latency_ms = 0.0
+        self.llm_latency_ms = 0.0
+
+    async def stream_actions(self, payload: dict) -> AsyncIterator[str]:
+        """
+        Entrega as ações geradas para o payload em trechos: do cache (de uma
+        vez) ou do LLM em streaming, guardando o texto completo no fim.
+        """
+        if not self.enabled:
+            async for chunk in stream_llm_service(payload):
+                yield chunk
+            return
+
+        key = payload_key(payload)
+
+        cached = self._memory.get(key)
+        if cached is not None:
+            self._count_hit(cached[1], memory=True)
+            yield cached[0]
+            return
+
+        cached = await asyncio.to_thread(self._load, key)
+        if cached is not None:
+            self._memory.set(key, cached)
+            self._count_hit(cached[1], memory=False)
+            yield cached[0]
+            return
+
+        start = time.perf_counter()
+        parts = []
+        async for chunk in stream_llm_service(payload):
+            parts.append(chunk)
+            yield chunk
+        latency_ms = (time.perf_counter() - start) * 1000
+        text = "".join(parts)
+
+        with self._lock:
+            self.misses += 1
+            self.llm_latency_ms += latency_ms
+
+        if text:
+            self._memory.set(key, (text, latency_ms))
+            await asyncio.to_thread(self._store, key, text, latency_ms)
+
+    def _not_before(self) -> datetime:
+        return datetime.now().astimezone() - timedelta(seconds=self.ttl)
+
+    def _load(self, key: str) -> Optional[tuple]:
+        db = db_session.SessionLocal()
+        try:
+            entry = crud_llm_cache.get_entry(
+                db, key=key, model_version=self.version, not_before=self._not_before()
+            )
+            if entry is None:
+                return None
+            value = (entry.generated_actions, entry.latency_ms or 0.0)
+            crud_llm_cache.register_hit(db, key=key)
+            return value
+        except Exception as e:
+            # Falha ao ler o cache não derruba a orquestração: chama o LLM
+            db.rollback()
+            log.warning("Falha ao ler o cache do LLM", error=e)
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, text: str, latency_ms: float) -> None:
+        db = db_session.SessionLocal()
+        try:
+            crud_llm_cache.save_entry(
+                db, key=key, model_version=self.version,
+                generated_actions=text, latency_ms=latency_ms,
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % PRUNE_EVERY_WRITES == 0
+            if prune:
+                crud_llm_cache.prune(
+                    db, model_version=self.version,
+                    not_before=self._not_before(), max_entries=self.max_entries,
+                )
+        except Exception as e:
+            # Falha ao gravar o cache não derruba a orquestração
+            db.rollback()
+            log.warning("Falha ao gravar o cache do LLM", error=e)
+        finally:
+            db.close()
+
+    def _count_hit(self, latency_ms: float, *, memory: bool) -> None:
+        with self._lock:
+            if memory:
+                self.memory_hits += 1
+            else:
+                self.db_hits += 1
+            self.saved_latency_ms += latency_ms
+
+    def prune(self) -> int:
+        """Remove do banco entradas expiradas, de outras versões e o excesso."""
+        db = db_session.SessionLocal()
+        try:
+            return crud_llm_cache.prune(
+                db, model_version=self.version,
+                not_before=self._not_before(), max_entries=self.max_entries,
+            )
+        finally:
+            db.close()
+
+    def invalidate(self) -> int:
+        """
+        Esvazia os dois níveis deste processo. Retorna quantas entradas saíram
+        do banco. Uso administrativo: 'python -m app.db.clear_llm_cache'.
+        """
+        self._memory.clear()
+        db = db_session.SessionLocal()
+        try:
+            return crud_llm_cache.remove_all(db)
+        finally:
+            db.close()
+
+    def stats(self, *, include_db: bool = True) -> dict:
+        """
+        Taxa de acerto e latência economizada, para acompanhar em produção.
+        Com include_db=False não consulta o banco (coleta do /metrics).
+        """
+        db_size = None
+        if include_db:
+            db = db_session.SessionLocal()
+            try:
+                db_size = crud_llm_cache.count_entries(db)
+            finally:
+                db.close()
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "model_version": self.version,
+                "memory_size": len(self._memory),
+                "db_size": db_size,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "saved_latency_ms": round(self.saved_latency_ms, 1),
+                "avg_llm_latency_ms": (
+                    round(self.llm_latency_ms / self.misses, 1) if self.misses else None
+                ),
+            }
+
+
+# Instância única usada pela orquestração
+llm_action_cache = LlmActionCache(
+    enabled=settings.LLM_CACHE_ENABLED,
+    version=settings.LLM_CACHE_VERSION,
+    memory_size=settings.LLM_CACHE_MEMORY_SIZE,
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+)
+
+
+def _lookups():
+    with llm_action_cache._lock:
+        return [
+            (("memory_hit",), float(llm_action_cache.memory_hits)),
+            (("db_hit",), float(llm_action_cache.db_hits)),
+            (("miss",), float(llm_action_cache.misses)),
+        ]
+
+registry.register(Counter(
+    "llm_cache_lookups_total",
+    "Consultas ao cache de ações do LLM: memory_hit, db_hit ou miss (chamou o LLM).",
+    ("result",), collect=_lookups,
+))
+registry.register(Counter(
+    "llm_cache_saved_latency_seconds_total",
+    "Tempo de LLM economizado pelos acertos do cache (latência da chamada original).",
+    collect=lambda: [((), llm_action_cache.saved_latency_ms / 1000)],
+))
+registry.register(Gauge(
+    "llm_cache_hit_ratio", "Fração das consultas ao cache de ações do LLM que acertaram.",
+    collect=lambda: [((), llm_action_cache.stats(include_db=False)["hit_ratio"])],
+))
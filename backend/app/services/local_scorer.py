@@ -0,0 +1,185 @@
+"""
+Scorer local de risco (NumPy), sem depender do serviço de ML.
+
+Ajustado na população atual de pacientes sobre os campos clínicos (IMC,
+pressão, glicemia, colesterol, HDL, triglicérides e idade):
+  - cada campo é padronizado de forma robusta (mediana e MAD);
+  - o escore é a distância de Mahalanobis na população padronizada;
+  - é outlier quem passa do quantil (1 - LOCAL_SCORER_OUTLIER_FRACTION)
+    das distâncias da própria população.
+
+Classifica uma lista de pacientes (ex.: uma página ou um lote da importação)
+em uma única chamada vetorizada. Os resultados são gravados com
+classification_source='local' e model_version='local-<hash do ajuste>', para
+não se confundirem com os do modelo remoto (a re-classificação e os jobs
+adiados os substituem quando o ML volta).
+
+Importa o NumPy: carregue este módulo só quando LOCAL_SCORER_MODE o usar.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.log import get_logger
+from app.db import session as db_session
+from app.models.paciente_models import Paciente
+from . import ml_features
+
+log = get_logger(__name__)
+
+# Campos clínicos usados pelo scorer (nomes do payload do ML)
+CLINICAL_FEATURES = (
+    "imc", "pressao_sistolica_mmHg", "pressao_diastolica_mmHg",
+    "glicemia_jejum_mg_dl", "colesterol_total_mg_dl", "hdl_mg_dl",
+    "triglicerides_mg_dl", "idade",
+)
+# MAD -> desvio padrão (distribuição normal)
+MAD_TO_STD = 1.4826
+
+
+@dataclass(frozen=True)
+class _FittedModel:
+    center: np.ndarray
+    scale: np.ndarray
+    inv_cov: np.ndarray
+    threshold: float
+    version: str
+    population: int
+    fitted_at: float
+
+
+def _distances(z: np.ndarray, inv_cov: np.ndarray) -> np.ndarray:
+    """Distância de Mahalanobis de cada linha (já padronizada) até o centro."""
+    return np.sqrt(np.maximum(np.einsum("ij,jk,ik->i", z, inv_cov, z), 0.0))
+
+
+def feature_matrix(features: Sequence[dict]) -> np.ndarray:
+    """Payloads do ML -> matriz (pacientes x CLINICAL_FEATURES); ausentes viram NaN."""
+    return np.array(
+        [[feature.get(name) for name in CLINICAL_FEATURES] for feature in features],
+        dtype=float,
+    ).reshape(len(features), len(CLINICAL_FEATURES))
+
+
+class LocalRiskScorer:
+    def __init__(
+        self, *, outlier_fraction: float, min_population: int,
+        fit_sample: int, refit_seconds: float
+    ):
+        self.outlier_fraction = outlier_fraction
+        self.min_population = min_population
+        self.fit_sample = fit_sample
+        self.refit_seconds = refit_seconds
+        self._model: Optional[_FittedModel] = None
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        model = self._model
+        return model.version if model else None
+
+    def fit(self, matrix: np.ndarray) -> bool:
+        """Ajusta o scorer em uma matriz da população. False se ela for pequena demais."""
+        rows = matrix[~np.isnan(matrix).any(axis=1)]
+        if len(rows) < self.min_population:
+            return False
+
+        center = np.median(rows, axis=0)
+        scale = MAD_TO_STD * np.median(np.abs(rows - center), axis=0)
+        # Campo quase constante: cai para o desvio padrão (ou 1)
+        scale = np.where(scale > 0, scale, rows.std(axis=0))
+        scale = np.where(scale > 0, scale, 1.0)
+        z = (rows - center) / scale
+        inv_cov = np.linalg.pinv(np.cov(z, rowvar=False))
+        threshold = float(np.quantile(_distances(z, inv_cov), 1 - self.outlier_fraction))
+
+        digest = hashlib.sha256(
+            np.concatenate([center, scale, inv_cov.ravel(), [threshold]]).tobytes()
+        ).hexdigest()
+        self._model = _FittedModel(
+            center=center, scale=scale, inv_cov=inv_cov, threshold=threshold,
+            version=f"local-{digest[:12]}", population=len(rows), fitted_at=time.monotonic(),
+        )
+        return True
+
+    def fit_from_db(self) -> bool:
+        """Ajusta nos pacientes mais recentes (até LOCAL_SCORER_FIT_SAMPLE)."""
+        columns = [getattr(Paciente, name) for name in CLINICAL_FEATURES if name != "idade"]
+        with db_session.SessionLocal() as db:
+            rows = db.execute(
+                select(*columns, Paciente.data_nascimento)
+                .order_by(Paciente.id.desc())
+                .limit(self.fit_sample)
+            ).all()
+        if not rows:
+            return False
+        columns = list(zip(*rows))
+        matrix = np.column_stack([
+            np.array(column, dtype=float) for column in columns[:-1]
+        ] + [ml_features.ages(columns[-1]).astype(float)])
+        fitted = self.fit(matrix)
+        if fitted:
+            log.info(
+                "Scorer local ajustado", version=self._model.version,
+                population=self._model.population, threshold=round(self._model.threshold, 3),
+            )
+        return fitted
+
+    def _needs_fit(self) -> bool:
+        model = self._model
+        now = time.monotonic()
+        if model is not None and now - model.fitted_at < self.refit_seconds:
+            return False
+        # Sem população suficiente, tenta de novo só depois de um tempo
+        return model is not None or now - self._last_attempt >= min(self.refit_seconds, 60.0)
+
+    def ensure_fitted(self) -> bool:
+        """Ajusta (ou re-ajusta, após LOCAL_SCORER_REFIT_SECONDS) se preciso."""
+        # Sem modelo, espera um ajuste que já esteja em andamento
+        if self._model is None or self._needs_fit():
+            with self._lock:
+                if self._needs_fit():
+                    self._last_attempt = time.monotonic()
+                    try:
+                        self.fit_from_db()
+                    except Exception as e:
+                        log.error("Falha ao ajustar o scorer local", error=e)
+        return self._model is not None
+
+    def score(self, features: Sequence[dict]) -> Optional[Tuple[List[bool], List[float], str]]:
+        """
+        Classifica os pacientes (payloads do ML) de uma vez:
+        (is_outlier, distâncias, versão), ou None se o scorer não estiver ajustado.
+        Campos ausentes contam como típicos (valor da mediana).
+        """
+        model = self._model
+        if model is None:
+            return None
+        if not features:
+            return [], [], model.version
+        z = np.nan_to_num((feature_matrix(features) - model.center) / model.scale, nan=0.0)
+        distances = _distances(z, model.inv_cov)
+        return (distances > model.threshold).tolist(), distances.round(4).tolist(), model.version
+
+    async def score_async(self, features: Sequence[dict]) -> Optional[Tuple[List[bool], List[float], str]]:
+        """Igual a 'score', ajustando antes (fora do event loop) se preciso."""
+        if self._model is None or self._needs_fit():
+            await asyncio.to_thread(self.ensure_fitted)
+        return self.score(features)
+
+
+# Instância única (ajustada sob demanda, na primeira vez que for usada)
+local_scorer = LocalRiskScorer(
+    outlier_fraction=settings.LOCAL_SCORER_OUTLIER_FRACTION,
+    min_population=settings.LOCAL_SCORER_MIN_POPULATION,
+    fit_sample=settings.LOCAL_SCORER_FIT_SAMPLE,
+    refit_seconds=settings.LOCAL_SCORER_REFIT_SECONDS,
+)
@@ -0,0 +1,68 @@
+"""
+Features do ML calculadas por coluna (NumPy), para lotes grandes de pacientes.
+
+Equivale a '_build_ml_input' aplicado linha a linha (paciente_service), sem
+montar um PacienteCreate nem chamar '_calculate_age' por paciente: as
+colunas vêm direto do banco e a idade é calculada de uma vez para o lote.
+Os dicts gerados são idênticos aos do caminho por paciente (mesmas chaves,
+tipos e valores), então o fingerprint das features também é o mesmo.
+
+Importa o NumPy: carregue este módulo só nos caminhos que processam lotes
+(re-classificação, scorer local), não no import do app.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.models.paciente_models import Paciente
+from app.schemas.paciente_schema import PacienteCreate
+
+# Campos do PacienteCreate que não são features (removidos do payload do ML)
+NON_FEATURE_FIELDS = ("nome", "email", "endereco", "data_nascimento")
+
+# Colunas enviadas ao ML, na ordem do payload (a 'idade' entra por último)
+FEATURE_FIELDS = tuple(
+    name for name in PacienteCreate.model_fields if name not in NON_FEATURE_FIELDS
+)
+
+# Colunas a ler do banco para montar as features
+SOURCE_COLUMNS = FEATURE_FIELDS + ("data_nascimento",)
+
+
+def ages(born: Sequence[date], today: Optional[date] = None) -> np.ndarray:
+    """Idade em anos completos de cada data de nascimento (vetorizado)."""
+    today = today or date.today()
+    born = np.asarray(born, dtype="datetime64[D]")
+    years = born.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = born.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    days = (born - born.astype("datetime64[M]")).astype(np.int64) + 1
+    # Ainda não fez aniversário este ano: um ano a menos
+    before_birthday = (months * 100 + days) > (today.month * 100 + today.day)
+    return today.year - years - before_birthday
+
+
+def feature_columns(rows: Sequence[tuple]) -> Dict[str, list]:
+    """Linhas (na ordem de SOURCE_COLUMNS) -> colunas por nome."""
+    if not rows:
+        return {name: [] for name in SOURCE_COLUMNS}
+    return dict(zip(SOURCE_COLUMNS, (list(column) for column in zip(*rows))))
+
+
+def build_ml_inputs(rows: Sequence[tuple], today: Optional[date] = None) -> List[dict]:
+    """
+    Payloads do ML para um lote de linhas lidas com SOURCE_COLUMNS
+    (mesmo resultado de '_build_ml_input' em cada paciente).
+    """
+    if not rows:
+        return []
+    columns = feature_columns(rows)
+    idade = ages(columns["data_nascimento"], today).tolist()
+    values = [columns[name] for name in FEATURE_FIELDS] + [idade]
+    names = FEATURE_FIELDS + ("idade",)
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def source_columns():
+    """Colunas do modelo Paciente para um select(...) de SOURCE_COLUMNS."""
+    return [getattr(Paciente, name) for name in SOURCE_COLUMNS]
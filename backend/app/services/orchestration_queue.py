@@ -0,0 +1,229 @@
+import asyncio
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Iterator, List, Optional, Set
+
+from app import crud
+from app.core.config import settings
+from app.core.log import correlation, get_logger
+from app.core.metrics import Gauge, registry
+from app.core.sql_profiler import profile
+from app.db.session import SessionLocal
+
+log = get_logger(__name__)
+
+# Assinatura do handler que processa um job (recebe o ID do job)
+JobHandler = Callable[[int], Awaitable[None]]
+
+# No 'stop', intervalo entre os cancelamentos dos workers que ainda não saíram
+STOP_RETRY_SECONDS = 0.5
+
+
+class OrchestrationQueue:
+    """
+    Fila de orquestração em processo.
+
+    Os jobs ficam persistidos na tabela 'orchestration_jobs'; a fila em
+    memória guarda apenas os IDs. Um conjunto limitado de workers consome
+    a fila e executa o fluxo ML -> LLM fora do ciclo da requisição HTTP.
+
+    Se a fila estiver cheia (ou o app reiniciar), o job continua 'pending'
+    no banco e é recolocado na fila pela varredura periódica dos workers.
+    Jobs 'deferred' (ML/LLM fora do ar) voltam pela mesma varredura quando
+    chega o 'retry_at' (backoff exponencial, ver paciente_service).
+
+    As consultas da fila ao banco (varredura, heartbeat) rodam em threads,
+    fora do event loop.
+
+    Cada processo (ex.: vários workers do uvicorn) assume os jobs com um
+    UPDATE condicional ('claim_job') em nome de 'owner' e renova o heartbeat
+    dos que está executando. Só jobs 'running' sem heartbeat há
+    'stale_seconds' (processo morto) voltam a ser 'pending'.
+    """
+
+    def __init__(
+        self, *, workers: int, maxsize: int, poll_interval: float,
+        heartbeat_seconds: float, stale_seconds: float
+    ):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.poll_interval = poll_interval
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        # Identifica este processo nos jobs que ele assume
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._enqueued: Set[int] = set()
+        self._active: Set[int] = set()
+        self._handler: Optional[JobHandler] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def size(self) -> int:
+        """Jobs aguardando na fila em memória."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, handler: JobHandler) -> None:
+        """Inicia os workers e recoloca na fila os jobs pendentes do banco."""
+        if self.running:
+            return
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+
+        # Jobs 'running' de processos que morreram voltam a ser 'pending'
+        await asyncio.to_thread(self._reset_stale)
+        await self._requeue_pending()
+
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"orchestration-worker-{n}")
+            for n in range(self.workers)
+        ]
+        self._tasks.append(
+            asyncio.create_task(self._heartbeat(), name="orchestration-heartbeat")
+        )
+
+    async def stop(self) -> None:
+        """Cancela os workers. Jobs não concluídos continuam no banco."""
+        self._stopping = True
+        pending = set(self._tasks)
+        while pending:
+            # O asyncio.wait_for (Python < 3.12) pode perder um cancelamento e
+            # deixar o worker esperando a fila: cancela de novo até terminarem
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=STOP_RETRY_SECONDS)
+        self._tasks = []
+        self._enqueued.clear()
+        self._queue = None
+        self._stopping = False
+
+    def enqueue(self, job_id: int) -> bool:
+        """
+        Coloca um job na fila sem bloquear.
+        Retorna False se a fila não estiver ativa ou estiver cheia
+        (o job será recuperado depois pela varredura).
+        """
+        if self._queue is None or job_id in self._enqueued:
+            return False
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        self._enqueued.add(job_id)
+        return True
+
+    @contextmanager
+    def track(self, job_id: int) -> Iterator[None]:
+        """Mantém o heartbeat do job enquanto este processo o executa."""
+        self._active.add(job_id)
+        try:
+            yield
+        finally:
+            self._active.discard(job_id)
+
+    def _reset_stale(self) -> None:
+        db = SessionLocal()
+        try:
+            stale_before = datetime.now(timezone.utc) - timedelta(seconds=self.stale_seconds)
+            count = crud.reset_stale_jobs(db, stale_before=stale_before)
+        finally:
+            db.close()
+        if count:
+            log.warning("Jobs sem heartbeat voltaram para a fila", jobs=count)
+
+    def _renew_heartbeat(self, job_ids: List[int]) -> None:
+        db = SessionLocal()
+        try:
+            crud.heartbeat_jobs(db, owner=self.owner, job_ids=job_ids)
+        finally:
+            db.close()
+
+    async def _heartbeat(self) -> None:
+        """Renova o heartbeat dos jobs em execução e recupera os abandonados."""
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await asyncio.to_thread(self._renew_heartbeat, list(self._active))
+                await asyncio.to_thread(self._reset_stale)
+            except Exception as e:
+                log.error("Falha no heartbeat da orquestração", error=e)
+
+    @staticmethod
+    def _pending_job_ids(limit: int) -> List[int]:
+        db = SessionLocal()
+        try:
+            return crud.get_pending_job_ids(
+                db, limit=limit, retry_before=datetime.now(timezone.utc)
+            )
+        finally:
+            db.close()
+
+    async def _requeue_pending(self) -> None:
+        """Busca jobs 'pending' no banco e preenche o espaço livre da fila."""
+        free = self.maxsize - self._queue.qsize()
+        if free <= 0:
+            return
+        job_ids = await asyncio.to_thread(self._pending_job_ids, free + len(self._enqueued))
+        for job_id in job_ids:
+            self.enqueue(job_id)
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                job_id = await asyncio.wait_for(
+                    self._queue.get(), timeout=self.poll_interval
+                )
+            except asyncio.TimeoutError:
+                # Fila ociosa: aproveita para recuperar jobs que ficaram de fora
+                try:
+                    await self._requeue_pending()
+                except Exception as e:
+                    log.error("Falha ao buscar jobs pendentes", error=e)
+                continue
+            if self._stopping:
+                # Cancelamento perdido no wait_for: o job continua 'pending' no banco
+                self._enqueued.discard(job_id)
+                self._queue.task_done()
+                return
+
+            try:
+                # Logs do job levam 'job-<id>' como request_id
+                with correlation(f"job-{job_id}"), self.track(job_id):
+                    if settings.SQL_PROFILING:
+                        with profile(f"orquestração job {job_id}"):
+                            await self._handler(job_id)
+                    else:
+                        await self._handler(job_id)
+            except asyncio.CancelledError:
+                if self._stopping:
+                    raise
+                # Cancelamento que não veio do 'stop' (ex.: de uma chamada
+                # compartilhada): o worker continua vivo
+                log.warning("Job de orquestração cancelado", job_id=job_id)
+            except Exception as e:
+                log.error("Worker de orquestração falhou", job_id=job_id, error=e)
+            finally:
+                self._enqueued.discard(job_id)
+                self._queue.task_done()
+
+
+# Instância única usada pelo app (iniciada no lifespan do main.py)
+orchestration_queue = OrchestrationQueue(
+    workers=settings.ORCHESTRATION_WORKERS,
+    maxsize=settings.ORCHESTRATION_QUEUE_SIZE,
+    poll_interval=settings.ORCHESTRATION_POLL_INTERVAL,
+    heartbeat_seconds=settings.ORCHESTRATION_HEARTBEAT_SECONDS,
+    stale_seconds=settings.ORCHESTRATION_STALE_SECONDS,
+)
+registry.register(Gauge(
+    "orchestration_queue_size", "Jobs aguardando na fila de orquestração em memória.",
+    collect=lambda: [((), float(orchestration_queue.size))],
+))
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from app.crud import crud_paciente as crud
+from app.db import session as db_session
+from app.schemas.paciente_schema import PacienteBase
+from app.core.config import settings
+
+# Colunas exportadas: os campos do formulário mais os resultados salvos
+EXPORT_COLUMNS = (
+    "id", "created_at", *PacienteBase.model_fields,
+    "is_outlier", "orchestration_status", "acoes_geradas_llm",
+)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Tamanho mínimo (bytes) de cada pedaço enviado na resposta
+FLUSH_SIZE = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def _iter_ndjson(rows: Iterator[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(
+            dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, default=_json_default
+        ) + "\n"
+
+
+def _iter_csv(rows: Iterator[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, (date, datetime)) else value
+            for value in row
+        )
+        yield flush()
+
+
+def iter_export(
+    format: str, *, search: Optional[str] = None, compress: bool = False
+) -> Iterator[bytes]:
+    """
+    Gera o arquivo de exportação em pedaços de bytes, lendo os pacientes
+    do banco em lotes (EXPORT_BATCH_SIZE). A memória usada não depende do
+    tamanho da tabela. Com 'compress', a saída é gzip.
+    Abre sua própria sessão, pois roda depois do fim do endpoint.
+    """
+    serialize = _iter_ndjson if format == "ndjson" else _iter_csv
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = gzip
+
+    db = db_session.SessionLocal()
+    try:
+        rows = crud.iter_rows(
+            db, columns=EXPORT_COLUMNS, search=search,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+        )
+        pending = []
+        pending_size = 0
+        for text in serialize(rows):
+            pending.append(text)
+            pending_size += len(text)
+            if pending_size < FLUSH_SIZE:
+                continue
+            chunk = "".join(pending).encode()
+            pending, pending_size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+        chunk = "".join(pending).encode()
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
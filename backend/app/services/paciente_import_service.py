@@ -0,0 +1,341 @@
+import asyncio
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import ORCHESTRATION_OUTCOMES
+from app.models.orchestration_models import STATUS_PENDING, STATUS_DONE
+from app.models.paciente_models import SOURCE_LOCAL, SOURCE_ML
+from app.schemas.paciente_schema import PacienteCreate
+from .http_client import call_ml_service_batch
+from .orchestration_queue import orchestration_queue
+from .paciente_service import (
+    _build_ml_input, _features_fingerprint, _score_locally_async,
+    ACOES_PACIENTE_ESTAVEL, LOCAL_SCORER_MODES
+)
+
+log = get_logger(__name__)
+
+# Cada linha lida do corpo vira (dados, erro): um dos dois é sempre None
+ParsedRow = Tuple[Optional[dict], Optional[str]]
+
+# Content-types aceitos pelo POST /pacientes/bulk
+JSON_TYPES = ("application/json",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+# =================================================================
+# Leitura do corpo em streaming (memória limitada)
+# =================================================================
+async def _iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decodifica os bytes do corpo em UTF-8, respeitando caracteres partidos."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Quebra o corpo em linhas sem carregá-lo inteiro na memória."""
+    buffer = ""
+    async for text in _iter_text(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """Um objeto JSON por linha (linhas em branco são ignoradas)."""
+    async for line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield None, f"JSON inválido: {e.msg}"
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """
+    CSV com cabeçalho na primeira linha (nomes iguais aos do PacienteCreate).
+    Células vazias viram None. Campos com quebra de linha não são suportados.
+    """
+    header: Optional[List[str]] = None
+    async for line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield None, f"Esperadas {len(header)} colunas, encontradas {len(values)}"
+            continue
+        yield {
+            name: (value if value != "" else None)
+            for name, value in zip(header, values)
+        }, None
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """
+    Lista JSON ([{...}, {...}]) lida incrementalmente: cada elemento é
+    decodificado assim que chega por completo.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = finished = False
+
+    async for text in _iter_text(chunks):
+        buffer += text
+        while not finished:
+            buffer = buffer.lstrip()
+            if not buffer:
+                break
+            if not started:
+                if buffer[0] != "[":
+                    raise ValueError("O corpo JSON deve ser uma lista de pacientes")
+                started = True
+                buffer = buffer[1:]
+            elif buffer[0] == ",":
+                buffer = buffer[1:]
+            elif buffer[0] == "]":
+                finished = True
+                buffer = buffer[1:]
+            else:
+                try:
+                    obj, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    break # Elemento incompleto: espera o próximo pedaço
+                buffer = buffer[end:]
+                yield obj, None
+
+    if not finished or buffer.strip():
+        raise ValueError("JSON malformado ou incompleto")
+
+
+def parse_body(
+    chunks: AsyncIterator[bytes], content_type: str
+) -> Optional[AsyncIterator[ParsedRow]]:
+    """Escolhe o leitor pelo Content-Type. Retorna None se não for suportado."""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in JSON_TYPES:
+        return iter_json_array(chunks)
+    if media_type in NDJSON_TYPES:
+        return iter_ndjson(chunks)
+    if media_type in CSV_TYPES:
+        return iter_csv(chunks)
+    return None
+
+
+# =================================================================
+# Importação
+# =================================================================
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc']) or 'linha'}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+def _add_error(report: dict, row: int, error: str) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < settings.BULK_IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": row, "error": error})
+
+
+def _insert_rows(
+    db: Session, rows: List[Tuple[int, PacienteCreate]], report: dict
+) -> List[Tuple[int, PacienteCreate]]:
+    """
+    Insere o chunk em um único INSERT multi-row. Se houver conflito
+    (ex: email cadastrado em paralelo), cai para inserção linha a linha.
+    Retorna as linhas criadas como (id_do_paciente, paciente_in).
+    """
+    pacientes_in = [paciente_in for _, paciente_in in rows]
+    try:
+        ids = crud.create_multi(
+            db, pacientes_in=pacientes_in, orchestration_status=STATUS_PENDING
+        )
+        return list(zip(ids, pacientes_in))
+    except IntegrityError:
+        db.rollback()
+
+    created = []
+    for row_number, paciente_in in rows:
+        try:
+            db_paciente = crud.create_paciente(db, paciente_in=paciente_in)
+        except IntegrityError as e:
+            db.rollback()
+            _add_error(report, row_number, f"Erro de integridade: {e.orig}")
+            continue
+        created.append((db_paciente.id, paciente_in))
+    return created
+
+
+def _save_results(
+    db: Session, values: List[dict], job_paciente_ids: List[int], skip_ml: bool
+) -> List[int]:
+    """Grava os resultados do lote e cria os jobs (roda numa thread)."""
+    if values:
+        crud.bulk_update(db, values=values)
+    return crud.create_jobs(db, paciente_ids=job_paciente_ids, skip_ml=skip_ml)
+
+
+async def _classify_batch(
+    db: Session, batch: List[Tuple[int, PacienteCreate]]
+) -> None:
+    """
+    Classifica um lote no ML com uma única chamada e grava os resultados
+    em lote. Outliers (e o lote inteiro, se o ML falhar) vão para a fila.
+    Se o ML falhar, o lote recebe antes o resultado provisório do scorer
+    local (uma chamada vetorizada), substituído quando os jobs rodarem.
+    As escritas no banco rodam numa thread (não bloqueiam o event loop).
+    """
+    ids = [paciente_id for paciente_id, _ in batch]
+    features = [_build_ml_input(paciente_in) for _, paciente_in in batch]
+
+    try:
+        results = await call_ml_service_batch(features)
+    except Exception as e:
+        log.warning("Falha no ML em lote; pacientes irão para a fila", pacientes=len(ids), error=e)
+        local = None
+        if settings.LOCAL_SCORER_MODE in LOCAL_SCORER_MODES:
+            local = await _score_locally_async(features, reason="fallback")
+        values = []
+        if local is not None:
+            flags, version = local
+            values = [
+                {"id": paciente_id, "is_outlier": flag, "model_version": version,
+                 "classification_source": SOURCE_LOCAL}
+                for paciente_id, flag in zip(ids, flags)
+            ]
+        job_ids = await asyncio.to_thread(_save_results, db, values, ids, False)
+        for job_id in job_ids:
+            orchestration_queue.enqueue(job_id)
+        return
+
+    values = []
+    outlier_ids = []
+    for paciente_id, feature, result in zip(ids, features, results):
+        is_outlier = bool(result.get("is_outlier", False))
+        model_version = result.get("model_version") or settings.ML_MODEL_VERSION
+        if is_outlier:
+            outlier_ids.append(paciente_id)
+            values.append({
+                "id": paciente_id,
+                "is_outlier": True,
+                "model_version": model_version,
+                "classification_source": SOURCE_ML,
+            })
+        else:
+            values.append({
+                "id": paciente_id,
+                "is_outlier": False,
+                "model_version": model_version,
+                "classification_source": SOURCE_ML,
+                "acoes_geradas_llm": ACOES_PACIENTE_ESTAVEL,
+                "orchestration_status": STATUS_DONE,
+                "features_fingerprint": _features_fingerprint(feature),
+            })
+    # Só os outliers precisam do LLM (o ML não é chamado de novo)
+    job_ids = await asyncio.to_thread(_save_results, db, values, outlier_ids, True)
+    ORCHESTRATION_OUTCOMES.inc("stable", amount=len(values) - len(outlier_ids))
+    for job_id in job_ids:
+        orchestration_queue.enqueue(job_id)
+
+
+def _store_chunk(
+    db: Session, rows: List[Tuple[int, PacienteCreate]], report: dict
+) -> List[Tuple[int, PacienteCreate]]:
+    """Descarta emails duplicados e insere o chunk (roda numa thread)."""
+    # Emails repetidos no próprio chunk ou já cadastrados
+    existing = crud.get_existing_emails(
+        db, emails={paciente_in.email for _, paciente_in in rows}
+    )
+    unique = []
+    for row_number, paciente_in in rows:
+        if paciente_in.email in existing:
+            _add_error(report, row_number, f"Email já cadastrado: {paciente_in.email}")
+            continue
+        existing.add(paciente_in.email)
+        unique.append((row_number, paciente_in))
+    return _insert_rows(db, unique, report)
+
+
+async def _import_chunk(
+    db: Session, rows: List[Tuple[int, PacienteCreate]], report: dict
+) -> None:
+    """
+    Valida duplicidades, insere o chunk e classifica em lotes no ML.
+    O INSERT em lote roda numa thread: uma importação grande não trava as
+    outras requisições (a sessão só é usada por uma thread de cada vez).
+    """
+    created = await asyncio.to_thread(_store_chunk, db, rows, report)
+    report["created"] += len(created)
+
+    batch_size = settings.BULK_IMPORT_ML_BATCH_SIZE
+    for start in range(0, len(created), batch_size):
+        await _classify_batch(db, created[start:start + batch_size])
+
+
+async def import_pacientes(db: Session, rows: AsyncIterator[ParsedRow]) -> dict:
+    """
+    Importa pacientes em massa a partir de um iterador de linhas.
+    Cada linha é validada no PacienteCreate; linhas inválidas entram no
+    relatório de erros sem interromper a importação. Apenas um chunk
+    (BULK_IMPORT_CHUNK_SIZE linhas) fica na memória por vez.
+    """
+    report = {"total": 0, "created": 0, "failed": 0, "errors": []}
+    chunk: List[Tuple[int, PacienteCreate]] = []
+    row_number = 0
+
+    iterator = rows.__aiter__()
+    while True:
+        # Só a leitura do corpo é tratada como corpo malformado; erros ao
+        # gravar/classificar um chunk sobem normalmente
+        try:
+            data, error = await iterator.__anext__()
+        except StopAsyncIteration:
+            break
+        except ValueError as e:
+            # Corpo malformado: as linhas já lidas são importadas mesmo assim
+            _add_error(report, row_number + 1, str(e))
+            break
+
+        row_number += 1
+        if error is None:
+            try:
+                paciente_in = PacienteCreate.model_validate(data)
+            except ValidationError as e:
+                error = _format_validation_error(e)
+        if error is not None:
+            _add_error(report, row_number, error)
+            continue
+
+        chunk.append((row_number, paciente_in))
+        if len(chunk) >= settings.BULK_IMPORT_CHUNK_SIZE:
+            await _import_chunk(db, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _import_chunk(db, chunk, report)
+
+    report["total"] = row_number
+    return report
@@ -1,154 +1,838 @@
-from typing import Optional
+from typing import AsyncIterator, List, Optional, Sequence, Set, Tuple, Union
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.schemas import paciente_schema
 from app.schemas.paciente_schema import PacienteCreate
-from app.models.paciente_models import Paciente
+from app.models.paciente_models import Paciente, SOURCE_LOCAL, SOURCE_ML
+from app.models.orchestration_models import (
+    STATUS_PENDING, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED, STATUS_DEFERRED
+)
 from app import crud
-# (Verifique se call_llm_service está importado)
-from .http_client import call_ml_service, call_llm_service
+from app.crud import crud_paciente_async, crud_orchestration_async
+from app.db import session as db_session
+from .http_client import call_ml_service, ServiceUnavailable
+from .acoes_broadcast import acoes_broadcast
+from .llm_cache import llm_action_cache
+from .single_flight import payload_key
+from .orchestration_queue import orchestration_queue
 from app.core.config import settings
+from app.core.log import correlation, get_logger
+from app.core.metrics import LOCAL_SCORER_RESULTS, ORCHESTRATION_OUTCOMES
+from app.core.responses import etag_list
+import asyncio
+import base64
+import hashlib
+import json
 import math
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
+
+log = get_logger(__name__)
+
+# Texto salvo quando o ML classifica o paciente como estável (sem chamar o LLM)
+ACOES_PACIENTE_ESTAVEL = "Paciente classificado como estável. Manter acompanhamento padrão."
 
 def _calculate_age(born: date) -> int:
     """Função helper para calcular a idade."""
     today = date.today()
     return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
 
-async def _run_orchestration(db: Session, paciente_in: PacienteCreate, db_paciente: Paciente) -> Paciente:
+def _build_ml_input(paciente_in: PacienteCreate) -> dict:
     """
-    Função helper que executa a orquestração ML/LLM para um paciente.
+    Prepara os dados para os microserviços.
+    (Remove dados que não são features, como nome/email/data)
     """
-    # Prepara dados para os microserviços
     ml_input_data = paciente_in.model_dump()
     ml_input_data["idade"] = _calculate_age(paciente_in.data_nascimento)
     del ml_input_data["data_nascimento"] 
     del ml_input_data["nome"]
     del ml_input_data["email"]
     del ml_input_data["endereco"]
-    
-    try:
+    return ml_input_data
+
+def _features_fingerprint(ml_input_data: dict) -> str:
+    """Hash (SHA-256 do JSON canônico) das features enviadas ao ML."""
+    return payload_key(ml_input_data)
+
+# Modos do LOCAL_SCORER_MODE em que o scorer local é usado
+LOCAL_SCORER_MODES = ("fallback", "prescreen")
+
+def _local_scorer():
+    """Scorer local (NumPy), importado só quando é usado."""
+    from .local_scorer import local_scorer
+    return local_scorer
+
+def _count_local(result, reason: str, total: int) -> Optional[Tuple[List[bool], str]]:
+    if result is None:
+        LOCAL_SCORER_RESULTS.inc(reason, "unavailable", amount=total)
+        return None
+    flags, _, version = result
+    outliers = sum(flags)
+    if outliers:
+        LOCAL_SCORER_RESULTS.inc(reason, "outlier", amount=outliers)
+    if total - outliers:
+        LOCAL_SCORER_RESULTS.inc(reason, "stable", amount=total - outliers)
+    return flags, version
+
+async def _score_locally_async(features: List[dict], *, reason: str) -> Optional[Tuple[List[bool], str]]:
+    """
+    Classifica vários pacientes (payloads do ML) no scorer local, em uma
+    única chamada vetorizada: ([is_outlier, ...], versão), ou None se o
+    scorer ainda não tiver população suficiente para o ajuste. O ajuste
+    (leitura da população) roda fora do event loop.
+    """
+    return _count_local(await _local_scorer().score_async(features), reason, len(features))
+
+def _prescreen(db_paciente: Paciente, local) -> None:
+    """Grava o resultado provisório do scorer local (modo 'prescreen')."""
+    if local is None:
+        return
+    flags, version = local
+    db_paciente.is_outlier = flags[0]
+    db_paciente.model_version = version
+    db_paciente.classification_source = SOURCE_LOCAL
+
+async def _classify(
+    db_paciente: Paciente, ml_input_data: dict, *, skip_ml: bool = False
+) -> bool:
+    """
+    Classifica o paciente no ML e salva o 'is_outlier'.
+    Com 'skip_ml', reaproveita o 'is_outlier' já salvo.
+    """
+    if skip_ml and db_paciente.is_outlier is not None:
+        is_outlier = db_paciente.is_outlier
+    else:
         # Chama o Serviço de ML
-        ml_result = await call_ml_service(ml_input_data)
+        try:
+            ml_result = await call_ml_service(ml_input_data)
+        except ServiceUnavailable:
+            # ML fora do ar: resultado provisório do scorer local, se houver
+            local = None
+            if settings.LOCAL_SCORER_MODE in LOCAL_SCORER_MODES:
+                local = await _score_locally_async([ml_input_data], reason="fallback")
+            if local is None:
+                raise
+            flags, version = local
+            log.warning(
+                "ML indisponível; usando o scorer local", paciente_id=db_paciente.id,
+                sample_rate=settings.LOG_HOT_PATH_SAMPLE_RATE,
+            )
+            db_paciente.is_outlier = flags[0]
+            db_paciente.model_version = version
+            db_paciente.classification_source = SOURCE_LOCAL
+            return flags[0]
         is_outlier = ml_result.get("is_outlier", False)
+        db_paciente.model_version = ml_result.get("model_version") or settings.ML_MODEL_VERSION
+        db_paciente.classification_source = SOURCE_ML
+
+    db_paciente.is_outlier = is_outlier
+    return is_outlier
+
+async def _run_orchestration(
+    db: Session, paciente_in: PacienteCreate, db_paciente: Paciente,
+    *, skip_ml: bool = False
+) -> Paciente:
+    """
+    Função helper que executa a orquestração ML/LLM para um paciente.
+    Com 'skip_ml', reaproveita o 'is_outlier' já salvo e só chama o LLM.
+    Lança exceção se o ML ou o LLM falharem (o worker registra a falha no job).
+    """
+    ml_input_data = _build_ml_input(paciente_in)
+
+    # Chama o Serviço de ML e salva o resultado
+    is_outlier = await _classify(db_paciente, ml_input_data, skip_ml=skip_ml)
+    
+    if is_outlier:
+        log.info(
+            "Paciente outlier; chamando agente LLM", paciente_id=db_paciente.id,
+            sample_rate=settings.LOG_HOT_PATH_SAMPLE_RATE,
+        )
         
-        # Salva o resultado do ML
-        db_paciente.is_outlier = is_outlier
+        # O 'ml_input_data' já tem o formato { "idade": ..., "sexo": ..., etc }
+        llm_input_payload = {
+            "patient_data": ml_input_data
+        }
         
-        if is_outlier:
-            print(f"Paciente {db_paciente.id} é outlier. Chamando Agente LLM...")
-            
-            llm_input_payload = {
-                "patient_data": ml_input_data
-            }
-            
-            llm_result = await call_llm_service(llm_input_payload)
-            generated_text = llm_result.get("generated_actions")
-            db_paciente.acoes_geradas_llm = generated_text
-            
-        else:
-            db_paciente.acoes_geradas_llm = "Paciente classificado como estável. Manter acompanhamento padrão."
-            
-        db.commit()
-        db.refresh(db_paciente)
+        # Pacientes com as mesmas features reaproveitam o texto já gerado.
+        # Os trechos (LLM_STREAM_URL) vão para quem acompanha pelo SSE.
+        parts = []
+        async for chunk in llm_action_cache.stream_actions(llm_input_payload):
+            parts.append(chunk)
+            acoes_broadcast.publish(db_paciente.id, chunk)
+        db_paciente.acoes_geradas_llm = "".join(parts)
         
-    except Exception as e:
-        print(f"ALERTA: Falha na orquestração para paciente {db_paciente.id}: {e}")
+    else:
+        db_paciente.acoes_geradas_llm = ACOES_PACIENTE_ESTAVEL
+
+    # Os resultados acima valem para estas features
+    db_paciente.features_fingerprint = _features_fingerprint(ml_input_data)
+
+    return db_paciente
 
+
+async def _schedule_orchestration(db: Session, db_paciente: Paciente) -> Paciente:
+    """
+    Marca o paciente como 'pending', persiste um job e o coloca na fila.
+    Não espera o ML/LLM: a resposta HTTP volta imediatamente.
+    """
+    db_paciente.orchestration_status = STATUS_PENDING
+    if settings.LOCAL_SCORER_MODE == "prescreen":
+        features = _build_ml_input(PacienteCreate.model_validate(db_paciente, from_attributes=True))
+        _prescreen(db_paciente, await _score_locally_async([features], reason="prescreen"))
+    db.commit()
+
+    job = crud.create_job(db, paciente_id=db_paciente.id)
+    orchestration_queue.enqueue(job.id)
+
+    db.refresh(db_paciente)
     return db_paciente
 
 
+def _failure_status(error: Exception) -> str:
+    """Serviço fora do ar adia o job; outros erros o marcam como falho."""
+    return STATUS_DEFERRED if isinstance(error, ServiceUnavailable) else STATUS_FAILED
+
+
+def _release_job(job, db_paciente: Paciente) -> None:
+    """
+    Devolve à fila um job interrompido no meio (cancelado), em vez de
+    deixá-lo 'running' até o heartbeat expirar (sem commit).
+    """
+    job.status = STATUS_PENDING
+    job.owner = None
+    db_paciente.orchestration_status = STATUS_PENDING
+
+
+def _completed_status(job, db_paciente: Paciente) -> str:
+    """
+    Orquestração concluída com o resultado do scorer local (ML fora do ar)
+    fica adiada: o job volta a tentar o ML e substitui o resultado provisório.
+    """
+    if db_paciente.classification_source == SOURCE_LOCAL and not job.skip_ml:
+        return STATUS_DEFERRED
+    return STATUS_DONE
+
+def _retry_policy(
+    job, status: str, error: Optional[str] = None
+) -> Tuple[str, Optional[str], Optional[datetime]]:
+    """
+    (status, erro, retry_at) finais de um job encerrado. Um job adiado volta
+    depois de um backoff exponencial; depois de ORCHESTRATION_MAX_ATTEMPTS
+    tentativas (contadas no claim), passa a 'failed'.
+    """
+    if status != STATUS_DEFERRED:
+        return status, error, None
+    attempts = max(job.attempts or 0, 1)
+    if attempts >= settings.ORCHESTRATION_MAX_ATTEMPTS:
+        reason = error or "ML indisponível (resultado provisório do scorer local)"
+        return STATUS_FAILED, f"{reason} - desistindo após {attempts} tentativas", None
+    delay = min(
+        settings.ORCHESTRATION_DEFER_SECONDS * 2 ** (attempts - 1),
+        settings.ORCHESTRATION_DEFER_MAX_SECONDS,
+    )
+    return status, error, datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+
+def _record_outcome(status: str, is_outlier: Optional[bool] = None) -> None:
+    """Conta a orquestração encerrada: outlier/stable (done), failed ou deferred."""
+    if status == STATUS_DONE:
+        status = "outlier" if is_outlier else "stable"
+    ORCHESTRATION_OUTCOMES.inc(status)
+
+
+async def run_orchestration_job(job_id: int) -> None:
+    """
+    Handler dos workers da fila: executa um job de orquestração.
+    Abre sua própria sessão, pois roda fora do ciclo da requisição.
+    """
+    if settings.DB_ASYNC:
+        return await _run_orchestration_job_async(job_id)
+
+    db = db_session.SessionLocal()
+    try:
+        job = crud.get_job(db, job_id=job_id)
+        if not job or job.status not in (STATUS_PENDING, STATUS_DEFERRED):
+            return
+
+        db_paciente = crud.get_by_id(db, id=job.paciente_id)
+        if not db_paciente:
+            crud.mark_job(db, job=job, status=STATUS_FAILED, error="Paciente não encontrado")
+            db.commit()
+            _record_outcome(STATUS_FAILED)
+            return
+
+        if not crud.claim_job(db, job_id=job.id, owner=orchestration_queue.owner):
+            return # Outro processo assumiu o job
+
+        # Quem acompanha pelo SSE recebe os trechos do LLM desta execução
+        with acoes_broadcast.running(db_paciente.id):
+            db_paciente.orchestration_status = STATUS_RUNNING
+            db.commit()
+
+            # Os dados são lidos do banco no momento da execução
+            paciente_in = PacienteCreate.model_validate(db_paciente, from_attributes=True)
+            try:
+                await _run_orchestration(
+                    db, paciente_in, db_paciente, skip_ml=job.skip_ml
+                )
+            except asyncio.CancelledError:
+                db.rollback()
+                _release_job(job, db_paciente)
+                db.commit()
+                raise
+            except Exception as e:
+                log.warning("Falha na orquestração", paciente_id=db_paciente.id, job_id=job_id, error=e)
+                db.rollback()
+                failure_status, error, retry_at = _retry_policy(job, _failure_status(e), str(e))
+                crud.mark_job(db, job=job, status=failure_status, error=error, retry_at=retry_at)
+                db_paciente.orchestration_status = failure_status
+                db.commit()
+                _record_outcome(failure_status)
+                return
+
+            status, error, retry_at = _retry_policy(job, _completed_status(job, db_paciente))
+            crud.mark_job(db, job=job, status=status, error=error, retry_at=retry_at)
+            db_paciente.orchestration_status = status
+            db.commit()
+            _record_outcome(status, db_paciente.is_outlier)
+    finally:
+        db.close()
+
+
+# --- Variantes assíncronas (DB_ASYNC=true) ---
+
+async def _schedule_orchestration_async(
+    db: AsyncSession, db_paciente: Paciente
+) -> Paciente:
+    """Igual a '_schedule_orchestration', sobre uma AsyncSession."""
+    db_paciente.orchestration_status = STATUS_PENDING
+    if settings.LOCAL_SCORER_MODE == "prescreen":
+        features = _build_ml_input(PacienteCreate.model_validate(db_paciente, from_attributes=True))
+        _prescreen(db_paciente, await _score_locally_async([features], reason="prescreen"))
+    await db.commit()
+
+    job = await crud_orchestration_async.create_job(db, paciente_id=db_paciente.id)
+    orchestration_queue.enqueue(job.id)
+
+    await db.refresh(db_paciente)
+    return db_paciente
+
+
+async def _run_orchestration_job_async(job_id: int) -> None:
+    """Igual a 'run_orchestration_job', sem bloquear o event loop com o banco."""
+    async with db_session.AsyncSessionLocal() as db:
+        job = await crud_orchestration_async.get_job(db, job_id=job_id)
+        if not job or job.status not in (STATUS_PENDING, STATUS_DEFERRED):
+            return
+
+        db_paciente = await crud_paciente_async.get_by_id(db, id=job.paciente_id)
+        if not db_paciente:
+            crud.mark_job(db, job=job, status=STATUS_FAILED, error="Paciente não encontrado")
+            await db.commit()
+            _record_outcome(STATUS_FAILED)
+            return
+
+        if not await crud_orchestration_async.claim_job(
+            db, job_id=job.id, owner=orchestration_queue.owner
+        ):
+            return # Outro processo assumiu o job
+
+        # Quem acompanha pelo SSE recebe os trechos do LLM desta execução
+        with acoes_broadcast.running(db_paciente.id):
+            await db.refresh(job)
+            db_paciente.orchestration_status = STATUS_RUNNING
+            await db.commit()
+
+            paciente_in = PacienteCreate.model_validate(db_paciente, from_attributes=True)
+            try:
+                await _run_orchestration(
+                    db, paciente_in, db_paciente, skip_ml=job.skip_ml
+                )
+            except asyncio.CancelledError:
+                await db.rollback()
+                await db.refresh(job)
+                await db.refresh(db_paciente)
+                _release_job(job, db_paciente)
+                await db.commit()
+                raise
+            except Exception as e:
+                log.warning("Falha na orquestração", paciente_id=db_paciente.id, job_id=job_id, error=e)
+                await db.rollback()
+                # O rollback expira os objetos; recarrega antes de alterar
+                await db.refresh(job)
+                await db.refresh(db_paciente)
+                failure_status, error, retry_at = _retry_policy(job, _failure_status(e), str(e))
+                crud.mark_job(db, job=job, status=failure_status, error=error, retry_at=retry_at)
+                db_paciente.orchestration_status = failure_status
+                await db.commit()
+                _record_outcome(failure_status)
+                return
+
+            status, error, retry_at = _retry_policy(job, _completed_status(job, db_paciente))
+            crud.mark_job(db, job=job, status=status, error=error, retry_at=retry_at)
+            db_paciente.orchestration_status = status
+            await db.commit()
+            _record_outcome(status, db_paciente.is_outlier)
+
+
 async def create_paciente_with_orchestration(
-    db: Session, *, paciente_in: PacienteCreate
+    db: Union[Session, AsyncSession], *, paciente_in: PacienteCreate
 ) -> Paciente:
     """
-    Orquestra o fluxo completo: Salva, Classifica (ML) e Gera Ações (LLM).
+    Salva o paciente e agenda a orquestração: Classifica (ML) e Gera Ações (LLM).
+    O resultado fica disponível em 'orchestration_status' / GET /{id}/orchestration.
+    Aceita a Session síncrona ou uma AsyncSession (DB_ASYNC=true).
     """
+    if isinstance(db, AsyncSession):
+        db_paciente = await crud_paciente_async.create_paciente(db, paciente_in=paciente_in)
+        return await _schedule_orchestration_async(db, db_paciente)
     
     # 1. Salva o paciente no banco
     db_paciente = crud.create_paciente(db, paciente_in=paciente_in)
     
-    # 2. Prepara dados para os microserviços
-    # (Remove dados que não são features, como nome/email/data)
-    ml_input_data = paciente_in.model_dump()
-    ml_input_data["idade"] = _calculate_age(paciente_in.data_nascimento)
-    del ml_input_data["data_nascimento"] 
-    del ml_input_data["nome"]
-    del ml_input_data["email"]
-    del ml_input_data["endereco"]
-    
-    # 3. Chama o Serviço de ML (Porta 8001)
+    # 2. Agenda o ML/LLM na fila (não bloqueia a requisição)
+    return await _schedule_orchestration(db, db_paciente)
+
+
+def encode_cursor(paciente: Paciente, direction: str) -> str:
+    """
+    Gera um cursor opaco a partir da chave (created_at, id) do paciente.
+    'direction' é 'next' (registros mais antigos) ou 'prev' (mais novos).
+    """
+    raw = json.dumps({
+        "d": direction,
+        "c": paciente.created_at.isoformat(),
+        "i": paciente.id,
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Tuple[datetime, int]]:
+    """
+    Decodifica um cursor gerado por 'encode_cursor'.
+    Lança ValueError se o cursor for inválido.
+    """
     try:
-        ml_result = await call_ml_service(ml_input_data)
-        is_outlier = ml_result.get("is_outlier", False)
-        
-        # Salva o resultado do ML no Banco
-        db_paciente.is_outlier = is_outlier
-        
-        # --- ETAPA FINAL (A CORREÇÃO) ---
-        if is_outlier:
-            print(f"Paciente {db_paciente.id} é outlier. Chamando Agente LLM (Porta 8003)...")
-            
-            # Prepara o JSON para o serviço LLM (que espera PatientDataForLLM)
-            # O 'ml_input_data' já tem o formato { "idade": ..., "sexo": ..., etc }
-            llm_input_payload = {
-                "patient_data": ml_input_data
-            }
-            
-            # Chama o Serviço LLM (Porta 8003)
-            llm_result = await call_llm_service(llm_input_payload)
-            
-            # Salva a resposta REAL do LLM no banco
-            generated_text = llm_result.get("generated_actions")
-            db_paciente.acoes_geradas_llm = generated_text
-            
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = data["d"]
+        key = (datetime.fromisoformat(data["c"]), int(data["i"]))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Cursor inválido") from e
+    if direction not in ("next", "prev"):
+        raise ValueError("Cursor inválido")
+    return direction, key
+
+
+# --- ETags (GET condicional e If-Match) ---
+
+class PreconditionFailed(HTTPException):
+    """O If-Match não corresponde à versão atual do paciente."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="O paciente foi alterado por outra requisição; recarregue e tente de novo",
+        )
+
+
+def paciente_etag(id: int, version: int) -> str:
+    """ETag forte do paciente: muda a cada alteração (coluna 'version')."""
+    return f'"{id}-{version}"'
+
+
+def if_match_versions(header: Optional[str], id: int) -> Optional[List[int]]:
+    """
+    Versões aceitas pelo If-Match do paciente 'id'. None se o cabeçalho não
+    veio ou é '*' (basta o paciente existir); lista vazia se nenhum ETag
+    enviado é deste paciente (a requisição deve falhar com 412).
+    """
+    tags = etag_list(header)
+    if not tags or "*" in tags:
+        return None
+    prefix = f'"{id}-'
+    return [
+        int(tag[len(prefix):-1]) for tag in tags
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit()
+    ]
+
+
+# --- Listagem (completa ou projeção leve) ---
+
+# Campos da listagem com 'view=summary' (sem o texto do LLM nem as
+# features clínicas). Sem 'view' nem 'fields', os itens são completos.
+LIST_VIEWS = ("full", "summary")
+LIST_SUMMARY_FIELDS = (
+    "id", "nome", "email", "data_nascimento", "sexo", "created_at",
+    "is_outlier", "orchestration_status", "classification_source",
+    "risco_diabetes", "risco_hipertensao",
+)
+
+# Campos calculados do schema Paciente -> colunas de que dependem
+COMPUTED_FIELDS = {
+    "risco_diabetes": ("is_outlier", "classification_source"),
+    "risco_hipertensao": ("is_outlier", "classification_source"),
+    "recomendacao_geral": ("acoes_geradas_llm",),
+    "probabilidade_diabetes": (),
+    "probabilidade_hipertensao": (),
+}
+
+# Campos lidos direto das colunas
+COLUMN_FIELDS = tuple(
+    name for name in paciente_schema.Paciente.model_fields if name not in COMPUTED_FIELDS
+)
+
+# Todos os campos do schema Paciente, na ordem em que o Pydantic os serializa
+PACIENTE_FIELDS = (
+    tuple(paciente_schema.Paciente.model_fields)
+    + tuple(paciente_schema.Paciente.model_computed_fields)
+)
+
+# Ordem dos campos no schema da listagem (a mesma da resposta serializada)
+_SUMMARY_ORDER = {name: n for n, name in enumerate(paciente_schema.PacienteSummary.model_fields)}
+
+
+def parse_fields(fields: Optional[str], view: str = "full") -> Tuple[str, ...]:
+    """
+    Interpreta o parâmetro 'fields' (nomes separados por vírgula).
+    Sem ele, usa todos os campos do schema Paciente (view="full", o formato
+    de sempre da listagem) ou LIST_SUMMARY_FIELDS (view="summary").
+    Lança ValueError com campos ou 'view' desconhecidos.
+    Os campos voltam na ordem do schema PacienteSummary, a mesma da resposta.
+    """
+    if view not in LIST_VIEWS:
+        raise ValueError(f"'view' deve ser um de: {', '.join(LIST_VIEWS)}")
+    names = tuple(dict.fromkeys(
+        name.strip() for name in (fields or "").split(",") if name.strip()
+    )) or (LIST_SUMMARY_FIELDS if view == "summary" else PACIENTE_FIELDS)
+    unknown = [name for name in names if name not in _SUMMARY_ORDER]
+    if unknown:
+        raise ValueError(f"Campos desconhecidos em 'fields': {', '.join(unknown)}")
+    return tuple(sorted(names, key=_SUMMARY_ORDER.__getitem__))
+
+
+def _columns_for(fields: Tuple[str, ...]) -> Tuple[str, ...]:
+    columns = []
+    for name in fields:
+        columns.extend(COMPUTED_FIELDS.get(name, (name,)))
+    return tuple(dict.fromkeys(columns))
+
+
+def _summarize(paciente: Paciente, fields: Tuple[str, ...]) -> dict:
+    """Monta o item da listagem só com os campos pedidos (sem schema completo)."""
+    item = {}
+    for name in fields:
+        if name in ("risco_diabetes", "risco_hipertensao"):
+            item[name] = paciente_schema.risco_label(
+                paciente.is_outlier, paciente.classification_source
+            )
+        elif name == "recomendacao_geral":
+            item[name] = paciente.acoes_geradas_llm or paciente_schema.SEM_RECOMENDACAO
+        elif name in ("probabilidade_diabetes", "probabilidade_hipertensao"):
+            item[name] = 0.0
         else:
-            # Se não for outlier, apenas salvamos a mensagem padrão
-            db_paciente.acoes_geradas_llm = "Paciente classificado como estável. Manter acompanhamento padrão."
-        # --- FIM DA CORREÇÃO ---
-            
-        db.commit()
-        db.refresh(db_paciente)
-        
-    except Exception as e:
-        print(f"ALERTA: Paciente {db_paciente.id} criado, mas falha na orquestração: {e}")
+            item[name] = getattr(paciente, name)
+    return item
 
-    return db_paciente
+
+def paciente_to_dict(paciente: Paciente) -> dict:
+    """
+    O paciente completo como dict pronto para JSON (mesmos campos e ordem
+    do schema Paciente), sem validar pelo Pydantic. Usado pelo FAST_JSON.
+    """
+    return _summarize(paciente, PACIENTE_FIELDS)
 
 
-def get_pacientes_paginados(
-    db: Session, *, page: int, page_size: int, search: str
-):
+def _fetch_page(
+    db: Session, *, page: int, page_size: int, search: str,
+    cursor: Optional[str], columns: Tuple[str, ...]
+) -> Tuple[list, dict]:
+    """Pacientes da página (só 'columns' + id/created_at/version) e o 'meta'."""
+    if cursor:
+        direction, key = decode_cursor(cursor)
+        if direction == "next":
+            pacientes, has_more = crud.get_multi_keyset(
+                db, page_size=page_size, search=search, after=key, columns=columns
+            )
+            has_next, has_prev = has_more, True
+        else:
+            pacientes, has_more = crud.get_multi_keyset(
+                db, page_size=page_size, search=search, before=key, columns=columns
+            )
+            has_next, has_prev = True, has_more
+
+        meta = {"total": None, "page": None, "page_size": page_size, "total_pages": None}
+    else:
+        pacientes, total = crud.get_multi(
+            db, page=page, page_size=page_size, search=search, columns=columns
+        )
+        has_next = page * page_size < total
+        has_prev = page > 1
+
+        meta = {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": math.ceil(total / page_size)
+        }
+
+    meta["next_cursor"] = meta["prev_cursor"] = None
+    if pacientes:
+        meta["next_cursor"] = encode_cursor(pacientes[-1], "next") if has_next else None
+        meta["prev_cursor"] = encode_cursor(pacientes[0], "prev") if has_prev else None
+    return pacientes, meta
+
+
+def _list_etag(fields: Tuple[str, ...], meta: dict, pacientes: list) -> str:
+    """
+    ETag da página: o corpo depende só dos campos pedidos, do 'meta' e da
+    versão de cada paciente listado.
+    """
+    raw = json.dumps([fields, meta, [[p.id, p.version] for p in pacientes]])
+    return f'"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+
+def get_pacientes_page(
+    db: Session, *, page: int, page_size: int, search: str,
+    cursor: Optional[str] = None, fields: Optional[str] = None, view: str = "full"
+) -> Tuple[dict, str]:
     """
     Busca pacientes paginados e prepara a resposta 
     exatamente como o frontend (api.ts) espera.
+
+    Sem 'cursor' usa page/page_size (com total). Com 'cursor' usa a
+    paginação keyset, sem COUNT nem OFFSET. Nos dois modos a resposta
+    traz 'next_cursor'/'prev_cursor' para navegar por cursor.
+
+    Os itens trazem só os campos de 'fields' (padrão: o paciente completo;
+    com view="summary", LIST_SUMMARY_FIELDS) e só as colunas necessárias
+    são lidas do banco.
+    Retorna uma tupla (resposta, etag).
+    Lança ValueError se o cursor ou 'fields' forem inválidos.
     """
-    pacientes, total = crud.get_multi(
-        db, page=page, page_size=page_size, search=search
+    fields = parse_fields(fields, view)
+    pacientes, meta = _fetch_page(
+        db, page=page, page_size=page_size, search=search, cursor=cursor,
+        columns=_columns_for(fields)
     )
-    
-    meta = {
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": math.ceil(total / page_size)
-    }
-    
-    return {"items": pacientes, "meta": meta}
+    result = {"items": [_summarize(p, fields) for p in pacientes], "meta": meta}
+    return result, _list_etag(fields, meta, pacientes)
+
+
+def get_pacientes_paginados(
+    db: Session, *, page: int, page_size: int, search: str,
+    cursor: Optional[str] = None, fields: Optional[str] = None, view: str = "full"
+) -> dict:
+    """A resposta de 'get_pacientes_page', sem o ETag."""
+    return get_pacientes_page(
+        db, page=page, page_size=page_size, search=search, cursor=cursor,
+        fields=fields, view=view
+    )[0]
+
+
+def get_pacientes_etag(
+    db: Session, *, page: int, page_size: int, search: str,
+    cursor: Optional[str] = None, fields: Optional[str] = None, view: str = "full"
+) -> str:
+    """
+    Só o ETag da página (para o If-None-Match): a mesma consulta, mas lendo
+    apenas id/created_at/version e sem montar os itens.
+    """
+    fields = parse_fields(fields, view)
+    pacientes, meta = _fetch_page(
+        db, page=page, page_size=page_size, search=search, cursor=cursor, columns=()
+    )
+    return _list_etag(fields, meta, pacientes)
 
 
 async def update_paciente_with_orchestration(
-    db: Session, *, id: int, paciente_in: PacienteCreate
+    db: Union[Session, AsyncSession], *, id: int, paciente_in: PacienteCreate,
+    force: bool = False, versions: Optional[Sequence[int]] = None
 ) -> Optional[Paciente]:
     """
     Atualiza um paciente e re-executa o fluxo de orquestração (ML/LLM).
+
+    A orquestração só é re-agendada se as features enviadas ao ML mudaram
+    (ou se a última execução não terminou com sucesso). Com 'force', re-agenda
+    sempre. Aceita a Session síncrona ou uma AsyncSession (DB_ASYNC=true).
+    Com 'versions' (If-Match), lança PreconditionFailed se a versão atual
+    do paciente não for uma delas.
     """
-    db_paciente = crud.get_by_id(db, id=id)
+    is_async = isinstance(db, AsyncSession)
+    if versions is not None:
+        if is_async:
+            locked = await crud_paciente_async.lock_version(db, id=id, versions=versions)
+        else:
+            locked = crud.lock_version(db, id=id, versions=versions)
+        if not locked:
+            exists = (
+                await crud_paciente_async.get_by_id(db, id=id) if is_async
+                else crud.get_by_id(db, id=id)
+            )
+            if exists:
+                raise PreconditionFailed()
+            return None
+
+    if is_async:
+        db_paciente = await crud_paciente_async.get_by_id(db, id=id)
+    else:
+        db_paciente = crud.get_by_id(db, id=id)
     if not db_paciente:
         return None
         
     # Atualiza os campos do paciente
     for field, value in paciente_in.model_dump().items():
         setattr(db_paciente, field, value)
+
+    unchanged = (
+        not force
+        and db_paciente.orchestration_status == STATUS_DONE
+        and db_paciente.features_fingerprint == _features_fingerprint(_build_ml_input(paciente_in))
+    )
+    if unchanged:
+        # Só mudaram dados que o ML não usa: os resultados atuais continuam válidos
+        if is_async:
+            await db.commit()
+            await db.refresh(db_paciente)
+        else:
+            db.commit()
+            db.refresh(db_paciente)
+        return db_paciente
     
-    # Re-executa a orquestração
-    return await _run_orchestration(db, paciente_in, db_paciente)
\ No newline at end of file
+    # Salva as alterações e re-agenda a orquestração
+    if is_async:
+        return await _schedule_orchestration_async(db, db_paciente)
+    return await _schedule_orchestration(db, db_paciente)
+
+
+def get_orchestration_status(db: Session, *, id: int) -> Optional[dict]:
+    """
+    Retorna o estado da orquestração de um paciente (para polling do frontend).
+    """
+    db_paciente = crud.get_by_id(db, id=id)
+    if not db_paciente:
+        return None
+
+    job = crud.get_latest_job(db, paciente_id=id)
+    return {
+        "paciente_id": db_paciente.id,
+        "orchestration_status": db_paciente.orchestration_status,
+        "job_id": job.id if job else None,
+        "attempts": job.attempts if job else 0,
+        "error": job.error if job else None,
+        "created_at": job.created_at if job else None,
+        "started_at": job.started_at if job else None,
+        "finished_at": job.finished_at if job else None,
+        "is_outlier": db_paciente.is_outlier,
+        "acoes_geradas_llm": db_paciente.acoes_geradas_llm,
+    }
+
+# --- Streaming das ações (SSE) ---
+
+# Sem trechos novos, intervalo entre as consultas ao estado do job (ele pode
+# estar rodando em outro processo) e espera máxima pelo fim da orquestração
+STREAM_POLL_INTERVAL = 0.5
+STREAM_WAIT_SECONDS = 120.0
+
+# Execuções disparadas pelo SSE (referência forte até terminarem)
+_stream_runs: Set[asyncio.Task] = set()
+
+
+async def _run_job_now(job_id: int) -> None:
+    """Executa o job fora da fila, como um worker (o claim evita execução dupla)."""
+    try:
+        with correlation(f"job-{job_id}"), orchestration_queue.track(job_id):
+            await run_orchestration_job(job_id)
+    except Exception as e:
+        log.error("Falha na orquestração disparada pelo SSE", job_id=job_id, error=e)
+
+
+def _stream_snapshot(id: int, job_id: Optional[int] = None) -> Optional[dict]:
+    """
+    Estado do paciente e do job (o mais recente, ou 'job_id') em dados
+    simples, com sessão própria (roda numa thread: o SSE não bloqueia o
+    event loop). None se o paciente não existe mais.
+    """
+    with db_session.SessionLocal() as db:
+        db_paciente = crud.get_by_id(db, id=id)
+        if db_paciente is None:
+            return None
+        if job_id is None:
+            job = crud.get_latest_job(db, paciente_id=id)
+        else:
+            job = crud.get_job(db, job_id=job_id)
+        return {
+            "orchestration_status": db_paciente.orchestration_status,
+            "acoes": db_paciente.acoes_geradas_llm,
+            # Sem job: nunca teve, ou foi removido com o paciente
+            "job_id": job.id if job else None,
+            "job_status": job.status if job else None,
+            "job_error": job.error if job else None,
+            "job_finished_at": job.finished_at if job else None,
+        }
+
+
+async def stream_acoes(id: int) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Gera eventos (evento, dado) com as ações do paciente, para o SSE.
+
+    Os trechos do LLM vêm de quem estiver executando a orquestração neste
+    processo (acoes_broadcast). Se o job ainda está pendente, ele é
+    executado agora, sem esperar a fila, pelo mesmo código dos workers: o
+    claim atômico garante que só um dos dois rode o ML/LLM, e a execução
+    continua mesmo que o cliente desconecte. Se outro processo estiver
+    com o job, o estado é acompanhado pelo banco.
+
+    Eventos: 'status' (estado inicial), 'token' (trecho do texto),
+    'done' (texto completo, já salvo em 'acoes_geradas_llm') e 'error'
+    (inclusive se o paciente for removido durante o stream).
+    """
+    snapshot = await asyncio.to_thread(_stream_snapshot, id)
+    if snapshot is None:
+        yield "error", "Paciente não encontrado"
+        return
+
+    yield "status", snapshot["orchestration_status"] or STATUS_PENDING
+
+    job_id, job_status = snapshot["job_id"], snapshot["job_status"]
+    if job_id is None or snapshot["orchestration_status"] == STATUS_DONE:
+        yield "done", snapshot["acoes"] or ""
+        return
+    if job_status not in (STATUS_PENDING, STATUS_DEFERRED, STATUS_RUNNING):
+        yield "error", snapshot["job_error"] or f"Orquestração em '{job_status}'"
+        return
+    initial = (job_status, snapshot["job_finished_at"])
+
+    # Inscreve antes de disparar a execução: nenhum trecho se perde
+    with acoes_broadcast.subscribe(id) as chunks:
+        if job_status in (STATUS_PENDING, STATUS_DEFERRED):
+            task = asyncio.create_task(_run_job_now(job_id))
+            _stream_runs.add(task)
+            task.add_done_callback(_stream_runs.discard)
+
+        waited = 0.0
+        while waited < STREAM_WAIT_SECONDS:
+            try:
+                chunk = await asyncio.wait_for(chunks.get(), timeout=STREAM_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                waited += STREAM_POLL_INTERVAL
+                current = await asyncio.to_thread(_stream_snapshot, id, job_id)
+                if current is None or current["job_id"] is None:
+                    break # Removido durante o stream
+                state = (current["job_status"], current["job_finished_at"])
+                # Encerrado (em qualquer processo) desde o início do stream
+                if state[0] not in (STATUS_PENDING, STATUS_RUNNING) and state != initial:
+                    break
+                continue
+            if chunk is None:
+                break # Execução terminou (resultado já gravado)
+            yield "token", chunk
+
+    final = await asyncio.to_thread(_stream_snapshot, id, job_id)
+    if final is None or final["job_id"] is None:
+        yield "error", "Paciente não encontrado"
+    elif final["job_status"] in (STATUS_DONE, STATUS_DEFERRED) and not final["job_error"] and final["acoes"]:
+        # 'deferred' sem erro: resultado provisório do scorer local
+        yield "done", final["acoes"]
+    else:
+        yield "error", final["job_error"] or f"Orquestração em '{final['job_status']}'"
@@ -0,0 +1,241 @@
+"""
+Re-classificação da base quando o modelo de ML muda.
+
+Percorre os pacientes classificados por outra versão do modelo (ou sem
+versão) em lotes por ID, monta as features de cada lote de forma vetorizada
+(ml_features), chama o ML em lote (ML_BATCH_SERVICE_URL) com algumas
+chamadas simultâneas e grava os resultados com UPDATE em lote:
+  - estável: texto padrão, orquestração concluída;
+  - virou outlier: volta para a fila, só para o LLM (o ML não é chamado de novo);
+  - continua outlier: mantém as ações já geradas, só troca a versão.
+
+É retomável: cada paciente gravado passa a ter a nova versão e deixa de ser
+selecionado; se o ML falhar, a execução para e a próxima continua de onde
+parou. Pacientes alterados durante a execução (versão/ETag mudou) ficam de
+fora e são pegos na próxima.
+
+Uso (a partir de backend/), depois de trocar ML_MODEL_VERSION:
+    python -m app.services.rescoring_service
+    python -m app.services.rescoring_service --model-version v2 --chunk-size 5000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.log import get_logger
+from app.models.orchestration_models import STATUS_DONE, STATUS_PENDING
+from app.models.paciente_models import SOURCE_ML
+from . import ml_features
+from .http_client import call_ml_service_batch, close_clients
+from .paciente_service import ACOES_PACIENTE_ESTAVEL, _features_fingerprint
+
+log = get_logger(__name__)
+
+
+@dataclass
+class RescoreProgress:
+    model_version: str
+    total: int # Pacientes a re-classificar no início da execução
+    processed: int = 0 # Enviados ao ML
+    updated: int = 0 # Gravados com a nova versão
+    changed: int = 0 # Classificação mudou
+    queued_llm: int = 0 # Novos outliers enviados para a fila (LLM)
+    skipped: int = 0 # Alterados durante a execução (ficam para a próxima)
+    failed: int = 0 # Lotes em que o ML falhou (ficam para a próxima)
+    last_id: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def per_minute(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.processed / elapsed * 60 if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        if not self.processed:
+            return None
+        return max(0, self.total - self.processed) / self.processed * self.elapsed_seconds
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        del data["started_at"]
+        data.update(
+            elapsed_seconds=round(self.elapsed_seconds, 1),
+            per_minute=round(self.per_minute),
+        )
+        return data
+
+
+def _result_values(row, features: dict, result: dict, model_version: str) -> dict:
+    """Valores gravados para um paciente a partir da resposta do ML."""
+    id, _, was_outlier = row[:3]
+    is_outlier = bool(result.get("is_outlier", False))
+    values = {
+        "id": id,
+        "is_outlier": is_outlier,
+        "model_version": result.get("model_version") or model_version,
+        "classification_source": SOURCE_ML,
+    }
+    if not is_outlier:
+        values.update(
+            acoes_geradas_llm=ACOES_PACIENTE_ESTAVEL,
+            orchestration_status=STATUS_DONE,
+            features_fingerprint=_features_fingerprint(features),
+        )
+    elif not was_outlier:
+        # As ações serão geradas pelo job (skip_ml), que grava o fingerprint
+        values["orchestration_status"] = STATUS_PENDING
+    return values
+
+
+async def _score_chunk(rows: list, batch_size: int, concurrency: int):
+    """Features do lote e resultados do ML por sub-lote (ou a exceção)."""
+    features = ml_features.build_ml_inputs([row[3:] for row in rows])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def score(start: int):
+        async with semaphore:
+            return await call_ml_service_batch(features[start:start + batch_size])
+
+    starts = range(0, len(rows), batch_size)
+    results = await asyncio.gather(*(score(start) for start in starts), return_exceptions=True)
+    return features, list(zip(starts, results))
+
+
+async def rescore_population(
+    db: Session,
+    *,
+    model_version: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    on_progress: Optional[Callable[[RescoreProgress], None]] = None,
+) -> RescoreProgress:
+    """
+    Re-classifica os pacientes que não estão em 'model_version' (padrão:
+    ML_MODEL_VERSION). Para no primeiro lote em que o ML falhar
+    (progress.failed > 0); rodar de novo continua de onde parou.
+    """
+    model_version = model_version or settings.ML_MODEL_VERSION
+    chunk_size = chunk_size or settings.RESCORE_CHUNK_SIZE
+    batch_size = batch_size or settings.RESCORE_ML_BATCH_SIZE
+    concurrency = concurrency or settings.RESCORE_CONCURRENCY
+    columns = ml_features.source_columns()
+
+    progress = RescoreProgress(
+        model_version=model_version,
+        total=crud.count_for_rescoring(db, model_version=model_version),
+    )
+    log.info("Re-classificação iniciada", model_version=model_version, total=progress.total)
+
+    while True:
+        rows = crud.get_for_rescoring(
+            db, model_version=model_version, after_id=progress.last_id,
+            limit=chunk_size, columns=columns,
+        )
+        db.rollback() # Não segura a transação de leitura durante as chamadas ao ML
+        if not rows:
+            break
+        progress.last_id = rows[-1][0]
+
+        features, batches = await _score_chunk(rows, batch_size, concurrency)
+        values: List[dict] = []
+        for start, results in batches:
+            if isinstance(results, BaseException):
+                progress.failed += 1
+                log.error(
+                    "Falha no ML durante a re-classificação", model_version=model_version,
+                    pacientes=len(rows[start:start + batch_size]), error=results,
+                )
+                continue
+            for row, feature, result in zip(
+                rows[start:start + batch_size], features[start:start + batch_size], results
+            ):
+                values.append(_result_values(row, feature, result, model_version))
+        progress.processed += len(values)
+
+        updated = set(crud.bulk_update(
+            db, values=values, expected_versions={row[0]: row[1] for row in rows}
+        ))
+        was_outlier = {row[0]: row[2] for row in rows}
+        new_outliers = [
+            value["id"] for value in values
+            if value["id"] in updated and value["is_outlier"] and not was_outlier[value["id"]]
+        ]
+        # Os workers do app pegam os jobs pendentes (fila persistida no banco)
+        crud.create_jobs(db, paciente_ids=new_outliers, skip_ml=True)
+
+        progress.updated += len(updated)
+        progress.skipped += len(values) - len(updated)
+        progress.changed += sum(
+            1 for value in values
+            if value["id"] in updated and bool(was_outlier[value["id"]]) != value["is_outlier"]
+        )
+        progress.queued_llm += len(new_outliers)
+        log.info("Re-classificação em andamento", **progress.as_dict())
+        if on_progress is not None:
+            on_progress(progress)
+        if progress.failed:
+            break
+
+    log.info("Re-classificação encerrada", **progress.as_dict())
+    return progress
+
+
+def _print_progress(progress: RescoreProgress) -> None:
+    eta = progress.eta_seconds
+    print(
+        f"{progress.processed}/{progress.total} pacientes "
+        f"({progress.per_minute:,.0f}/min; mudaram {progress.changed}, "
+        f"para o LLM {progress.queued_llm}, ignorados {progress.skipped})"
+        + (f" - restante ~{eta:.0f}s" if eta is not None else "")
+    )
+
+
+async def _run(args) -> RescoreProgress:
+    from app.db.session import SessionLocal
+
+    try:
+        with SessionLocal() as db:
+            return await rescore_population(
+                db, model_version=args.model_version, chunk_size=args.chunk_size,
+                batch_size=args.batch_size, concurrency=args.concurrency,
+                on_progress=_print_progress,
+            )
+    finally:
+        await close_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-version", default=None, help="Padrão: ML_MODEL_VERSION")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Padrão: RESCORE_CHUNK_SIZE")
+    parser.add_argument("--batch-size", type=int, default=None, help="Padrão: RESCORE_ML_BATCH_SIZE")
+    parser.add_argument("--concurrency", type=int, default=None, help="Padrão: RESCORE_CONCURRENCY")
+    args = parser.parse_args()
+
+    if not settings.ML_BATCH_SERVICE_URL:
+        print("Aviso: sem ML_BATCH_SERVICE_URL, o ML é chamado um paciente por vez.")
+    progress = asyncio.run(_run(args))
+    print(
+        f"Concluído: {progress.updated} pacientes na versão {progress.model_version} "
+        f"em {progress.elapsed_seconds:.1f}s ({progress.per_minute:,.0f}/min)."
+    )
+    if progress.failed:
+        print("O ML falhou em um dos lotes; rode de novo para continuar de onde parou.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+import copy
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Quem executava a chamada compartilhada foi cancelado."""
+
+
+def payload_key(payload: Any) -> str:
+    """
+    Endereço do conteúdo: SHA-256 do JSON canônico do payload
+    (chaves ordenadas, sem espaços). Payloads iguais geram a mesma chave.
+    """
+    canonical = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas idênticas simultâneas em uma só.
+
+    A primeira chamada de uma chave executa a função; as que chegam enquanto
+    ela está em andamento aguardam o mesmo resultado (ou a mesma exceção).
+    Cada uma recebe uma cópia do resultado, então podem alterá-lo à vontade.
+    Se quem executa for cancelado, os que aguardam não são: um deles assume
+    a execução e os demais passam a aguardá-lo.
+
+    No máximo 'max_keys' chaves ficam em andamento; acima disso a chamada
+    segue direto, sem agrupamento.
+    """
+
+    def __init__(self, *, max_keys: int):
+        self.max_keys = max_keys
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # Contadores
+        self.calls = 0       # Chamadas que executaram a função
+        self.coalesced = 0   # Chamadas que reaproveitaram uma em andamento
+        self.bypassed = 0    # Chamadas sem agrupamento (limite atingido)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        waited = False
+        while (future := self._inflight.get(key)) is not None:
+            if not waited:
+                self.coalesced += 1
+                waited = True
+            try:
+                # 'shield': cancelar quem espera não cancela a chamada compartilhada
+                return copy.deepcopy(await asyncio.shield(future))
+            except _LeaderCancelled:
+                # O primeiro a acordar vira o novo líder; os outros o aguardam
+                continue
+
+        if len(self._inflight) >= self.max_keys:
+            self.bypassed += 1
+            return await fn()
+
+        future = asyncio.get_running_loop().create_future()
+        # Evita o aviso "exception was never retrieved" quando ninguém espera
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "max_keys": self.max_keys,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+        }
@@ -0,0 +1,119 @@
+"""
+Benchmark da serialização das respostas de pacientes: Pydantic x FAST_JSON.
+
+Para a mesma página de pacientes (já carregada do banco), compara:
+  - pydantic: validação pelo response_model + JSONResponse (caminho padrão
+    do FastAPI, usado com FAST_JSON=false);
+  - fast:     dicts montados das linhas do ORM + FastJSONResponse
+    (orjson, se instalado; FAST_JSON=true).
+
+Os dois corpos precisam ser idênticos byte a byte; o benchmark aborta se
+não forem. Mede o paciente completo (GET /{id}, POST, PUT) e a listagem.
+
+Uso (a partir de backend/):
+    python -m benchmarks.json_benchmark --size 2000 --page-size 100
+"""
+import argparse
+import os
+import tempfile
+from typing import List
+
+# Settings exige estas variáveis; o benchmark não chama ML/LLM nem usa JWT
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("ML_SERVICE_URL", "http://localhost:8001/classify")
+os.environ.setdefault("LLM_SERVICE_URL", "http://localhost:8003/generate")
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.core import responses
+from app.core.responses import FastJSONResponse
+from app.crud import crud_paciente
+from app.db.search import install_sqlite_functions
+from app.models.paciente_models import Paciente
+from app.schemas import paciente_schema
+from app.services import paciente_service
+from benchmarks.list_benchmark import ACOES_LLM, _measure
+from benchmarks.search_benchmark import seed
+
+PACIENTES = TypeAdapter(List[paciente_schema.Paciente])
+
+
+def pydantic_full(pacientes) -> bytes:
+    content = PACIENTES.dump_python(
+        PACIENTES.validate_python(pacientes, from_attributes=True), mode="json"
+    )
+    return JSONResponse(content).body
+
+
+def fast_full(pacientes) -> bytes:
+    return FastJSONResponse([paciente_service.paciente_to_dict(p) for p in pacientes]).body
+
+
+def pydantic_list(result) -> bytes:
+    response = paciente_schema.PacienteSummaryListResponse.model_validate(result)
+    return JSONResponse(response.model_dump(mode="json", exclude_unset=True)).body
+
+
+def fast_list(result) -> bytes:
+    return FastJSONResponse(result).body
+
+
+def run(size: int, page_size: int, repeat: int, database_url=None) -> list:
+    url = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'json.db')}"
+    engine = create_engine(url)
+    install_sqlite_functions(engine)
+    seed(engine, size)
+    with engine.begin() as conn:
+        conn.execute(update(Paciente).where(Paciente.id % 2 == 0).values(
+            acoes_geradas_llm=ACOES_LLM, is_outlier=True, orchestration_status="done"
+        ))
+
+    db = sessionmaker(bind=engine)()
+    try:
+        pacientes, _ = crud_paciente.get_multi(db, page=1, page_size=page_size)
+        listing = paciente_service.get_pacientes_paginados(
+            db, page=1, page_size=page_size, search=None, view="summary"
+        )
+        cases = [
+            ("completo", lambda: pydantic_full(pacientes), lambda: fast_full(pacientes)),
+            ("listagem", lambda: pydantic_list(listing), lambda: fast_list(listing)),
+        ]
+
+        backend = "orjson" if responses.orjson is not None else "json (stdlib)"
+        print(f"\n== página de {page_size} pacientes (fast: {backend})")
+        print(f"{'resposta':<10} {'pydantic ms':>12} {'fast ms':>9} {'ganho':>7} {'bytes':>9}")
+        results = []
+        for label, slow_fn, fast_fn in cases:
+            if slow_fn() != fast_fn():
+                raise SystemExit(f"ERRO: corpo do caminho rápido difere em '{label}'")
+            slow_ms, size_bytes = _measure(slow_fn, repeat)
+            fast_ms, _ = _measure(fast_fn, repeat)
+            print(f"{label:<10} {slow_ms:>12.2f} {fast_ms:>9.2f} "
+                  f"{slow_ms / fast_ms:>6.1f}x {size_bytes:>9}")
+            results.append({
+                "case": label, "pydantic_ms": slow_ms, "fast_ms": fast_ms, "bytes": size_bytes,
+            })
+    finally:
+        db.close()
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+    run(args.size, args.page_size, args.repeat, args.database_url)
+
+
+if __name__ == "__main__":
+    main()
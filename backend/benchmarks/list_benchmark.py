@@ -0,0 +1,120 @@
+"""
+Benchmark da listagem de pacientes: schema completo x projeção leve.
+
+Mede, por página, o tempo de consulta + serialização e o tamanho do JSON:
+  - completo: linhas inteiras do ORM serializadas pelo schema Paciente
+    (caminho antigo do GET /pacientes/);
+  - resumo:   colunas de LIST_SUMMARY_FIELDS, demais adiadas (view=summary);
+  - fields:   apenas "id,nome,risco_diabetes".
+
+Uso (a partir de backend/):
+    python -m benchmarks.list_benchmark --size 20000 --page-size 100
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Settings exige estas variáveis; o benchmark não chama ML/LLM nem usa JWT
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("ML_SERVICE_URL", "http://localhost:8001/classify")
+os.environ.setdefault("LLM_SERVICE_URL", "http://localhost:8003/generate")
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import crud_paciente
+from app.db.search import install_sqlite_functions
+from app.models.paciente_models import Paciente
+from app.schemas import paciente_schema
+from app.services import paciente_service
+from benchmarks.search_benchmark import seed
+
+# Texto típico devolvido pelo LLM (alguns parágrafos)
+ACOES_LLM = (
+    "1. Agendar consulta com cardiologista nas próximas duas semanas. "
+    "2. Solicitar perfil lipídico completo e hemoglobina glicada. "
+    "3. Orientar dieta com redução de sódio e açúcares simples. "
+    "4. Iniciar programa de atividade física supervisionada, 150 min/semana. "
+) * 6
+
+
+def full_page(db, page_size: int) -> bytes:
+    """Caminho antigo: ORM completo + schema Paciente (com campos calculados)."""
+    pacientes, total = crud_paciente.get_multi(db, page=1, page_size=page_size)
+    response = paciente_schema.PacienteListResponse.model_validate({
+        "items": [
+            paciente_schema.Paciente.model_validate(p, from_attributes=True)
+            for p in pacientes
+        ],
+        "meta": {"total": total, "page": 1, "page_size": page_size, "total_pages": 1},
+    })
+    return response.model_dump_json().encode()
+
+
+def summary_page(db, page_size: int, fields=None) -> bytes:
+    """Projeção leve: só as colunas pedidas + PacienteSummary."""
+    result = paciente_service.get_pacientes_paginados(
+        db, page=1, page_size=page_size, search=None, fields=fields, view="summary"
+    )
+    response = paciente_schema.PacienteSummaryListResponse.model_validate(result)
+    return response.model_dump_json(exclude_unset=True).encode()
+
+
+def _measure(fn, repeat: int):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(body)
+
+
+def run(size: int, page_size: int, repeat: int, database_url=None) -> list:
+    url = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'list.db')}"
+    engine = create_engine(url)
+    install_sqlite_functions(engine)
+    seed(engine, size)
+    with engine.begin() as conn:
+        conn.execute(update(Paciente).values(
+            acoes_geradas_llm=ACOES_LLM, is_outlier=True, orchestration_status="done"
+        ))
+
+    db = sessionmaker(bind=engine)()
+    cases = [
+        ("completo", lambda: full_page(db, page_size)),
+        ("resumo", lambda: summary_page(db, page_size)),
+        ("fields=id,nome,risco", lambda: summary_page(db, page_size, "id,nome,risco_diabetes")),
+    ]
+    print(f"\n== {size} pacientes, página de {page_size} ({engine.dialect.name})")
+    print(f"{'caminho':<22} {'ms':>8} {'bytes':>10}")
+    results = []
+    try:
+        for label, fn in cases:
+            db.expire_all()
+            ms, size_bytes = _measure(fn, repeat)
+            print(f"{label:<22} {ms:>8.2f} {size_bytes:>10}")
+            results.append({"case": label, "ms": ms, "bytes": size_bytes})
+    finally:
+        db.close()
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+    run(args.size, args.page_size, args.repeat, args.database_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Benchmark de carga reproduzível (app + stubs de ML/LLM + mistura de operações).
+
+Uso (a partir de backend/):
+    python -m benchmarks.load --help
+"""
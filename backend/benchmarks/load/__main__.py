@@ -0,0 +1,3 @@
+from benchmarks.load.driver import main
+
+main()
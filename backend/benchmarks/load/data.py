@@ -0,0 +1,57 @@
+"""
+Pacientes sintéticos para o benchmark de carga, no formato do PacienteCreate.
+
+Determinísticos pela semente: o mesmo (seed, índice) gera sempre o mesmo
+paciente, então bancos semeados em commits diferentes têm os mesmos dados.
+"""
+import random
+from datetime import date
+from typing import Iterator
+
+from app.schemas.paciente_schema import PacienteCreate
+from benchmarks.search_benchmark import FIRST_NAMES, LAST_NAMES
+
+SEXOS = ["M", "F"]
+ESCOLARIDADE = ["Fundamental", "Médio", "Superior", "Pós-graduação"]
+RENDA = ["Até 1", "1 a 3", "3 a 5", "Acima de 5"]
+NIVEIS = ["Baixo", "Moderado", "Alto"]
+QUALIDADE = ["Ruim", "Regular", "Boa"]
+FREQUENCIA = ["Nunca", "Às vezes", "Frequente"]
+ACESSO = ["Fácil", "Moderado", "Difícil"]
+
+
+def paciente(index: int, *, seed: int = 42, prefix: str = "carga") -> dict:
+    """Paciente sintético (JSON pronto para o POST /pacientes/)."""
+    rng = random.Random(f"{seed}:{index}")
+    return PacienteCreate(
+        email=f"{prefix}{index}@clinica.com.br",
+        nome=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+        endereco=f"Rua {rng.choice(LAST_NAMES)}, {rng.randint(1, 2000)}",
+        data_nascimento=date(rng.randint(1940, 2005), rng.randint(1, 12), rng.randint(1, 28)),
+        sexo=rng.choice(SEXOS),
+        escolaridade=rng.choice(ESCOLARIDADE),
+        renda_familiar_sm=rng.choice(RENDA),
+        atividade_fisica=rng.choice(NIVEIS),
+        consumo_alcool=rng.choice(FREQUENCIA),
+        tabagismo_atual=rng.random() < 0.2,
+        qualidade_dieta=rng.choice(QUALIDADE),
+        qualidade_sono=rng.choice(QUALIDADE),
+        nivel_estresse=rng.choice(NIVEIS),
+        suporte_social=rng.choice(NIVEIS),
+        historico_familiar_dc=rng.random() < 0.4,
+        acesso_servico_saude=rng.choice(ACESSO),
+        aderencia_medicamento=rng.choice(NIVEIS),
+        consultas_ultimo_ano=rng.randint(0, 12),
+        imc=round(rng.uniform(17, 42), 1),
+        pressao_sistolica_mmHg=rng.randint(100, 180),
+        pressao_diastolica_mmHg=rng.randint(60, 110),
+        glicemia_jejum_mg_dl=rng.randint(70, 200),
+        colesterol_total_mg_dl=rng.randint(140, 300),
+        hdl_mg_dl=rng.randint(30, 80),
+        triglicerides_mg_dl=rng.randint(60, 400),
+    ).model_dump(mode="json")
+
+
+def pacientes(n: int, *, seed: int = 42, prefix: str = "carga") -> Iterator[dict]:
+    for index in range(n):
+        yield paciente(index, seed=seed, prefix=prefix)
@@ -0,0 +1,137 @@
+"""
+Stubs locais dos microserviços de ML e LLM para o benchmark de carga.
+
+Seguem o contrato usado pelo http_client:
+  - POST /classify          {features}            -> {"is_outlier": bool}
+  - POST /classify/batch    {"items": [features]} -> {"results": [{"is_outlier": bool}]}
+  - POST /generate          {"patient_data": {}}  -> {"generated_actions": str}
+  - POST /generate/stream   {"patient_data": {}}  -> text/event-stream ('data:' + [DONE])
+
+A latência (média + variação uniforme) e a taxa de erro (HTTP 503, que o
+cliente trata como falha transitória) são configuráveis por serviço. As
+respostas são determinísticas: o mesmo paciente sempre tem o mesmo
+resultado, então execuções diferentes fazem o mesmo trabalho.
+
+Uso (a partir de backend/):
+    python -m benchmarks.load.stubs --port 8901 --ml-latency-ms 30 --llm-latency-ms 400
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Mesmo critério do ML de referência: IMC alto ou glicemia alterada
+IMC_LIMITE = 30.0
+GLICEMIA_LIMITE = 126
+
+
+@dataclass
+class StubConfig:
+    ml_latency_ms: float = 20.0
+    llm_latency_ms: float = 200.0
+    jitter_ms: float = 10.0 # Variação uniforme (+/-) sobre a latência média
+    error_rate: float = 0.0 # Fração das chamadas que recebem HTTP 503
+    seed: int = 42
+
+
+def _is_outlier(features: dict) -> bool:
+    return (
+        float(features.get("imc") or 0) >= IMC_LIMITE
+        or int(features.get("glicemia_jejum_mg_dl") or 0) >= GLICEMIA_LIMITE
+    )
+
+
+def _acoes(patient_data: dict) -> str:
+    return (
+        f"1. Reavaliar paciente de {patient_data.get('idade', '?')} anos em 30 dias. "
+        "2. Solicitar perfil lipídico e hemoglobina glicada. "
+        "3. Orientar dieta e atividade física supervisionada."
+    )
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Stubs ML/LLM (benchmark)")
+    rng = random.Random(config.seed)
+
+    async def _delay(latency_ms: float) -> None:
+        jitter = rng.uniform(-config.jitter_ms, config.jitter_ms)
+        await asyncio.sleep(max(0.0, latency_ms + jitter) / 1000)
+
+    def _failed() -> bool:
+        return rng.random() < config.error_rate
+
+    def _unavailable() -> JSONResponse:
+        return JSONResponse({"detail": "stub: falha simulada"}, status_code=503)
+
+    @app.post("/classify")
+    async def classify(request: Request):
+        features = await request.json()
+        await _delay(config.ml_latency_ms)
+        if _failed():
+            return _unavailable()
+        return {"is_outlier": _is_outlier(features)}
+
+    @app.post("/classify/batch")
+    async def classify_batch(request: Request):
+        items = (await request.json())["items"]
+        await _delay(config.ml_latency_ms)
+        if _failed():
+            return _unavailable()
+        return {"results": [{"is_outlier": _is_outlier(item)} for item in items]}
+
+    @app.post("/generate")
+    async def generate(request: Request):
+        patient_data = (await request.json())["patient_data"]
+        await _delay(config.llm_latency_ms)
+        if _failed():
+            return _unavailable()
+        return {"generated_actions": _acoes(patient_data)}
+
+    @app.post("/generate/stream")
+    async def generate_stream(request: Request):
+        patient_data = (await request.json())["patient_data"]
+        if _failed():
+            return _unavailable()
+        sentences = _acoes(patient_data).split(". ")
+
+        async def events():
+            # A latência total é dividida entre as frases
+            for sentence in sentences:
+                await _delay(config.llm_latency_ms / len(sentences))
+                yield f"data: {sentence}. \n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--ml-latency-ms", type=float, default=StubConfig.ml_latency_ms)
+    parser.add_argument("--llm-latency-ms", type=float, default=StubConfig.llm_latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=StubConfig.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig(
+        ml_latency_ms=args.ml_latency_ms, llm_latency_ms=args.llm_latency_ms,
+        jitter_ms=args.jitter_ms, error_rate=args.error_rate, seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark da busca de pacientes: ILIKE '%x%' (caminho antigo) x busca indexada.
+
+Uso (a partir de backend/):
+    python -m benchmarks.search_benchmark --sizes 10000,100000,1000000
+
+Por padrão cada tamanho usa um banco SQLite novo em um diretório temporário.
+Para Postgres, passe --database-url (a tabela 'pacientes' é recriada!).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+# Settings exige estas variáveis; o benchmark não chama ML/LLM nem usa JWT
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("ML_SERVICE_URL", "http://localhost:8001/classify")
+os.environ.setdefault("LLM_SERVICE_URL", "http://localhost:8003/generate")
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import crud_paciente
+from app.db.base import Base
+from app.db.search import install_sqlite_functions, setup_search
+from app.models import orchestration_models  # noqa: F401 (registra a tabela)
+from app.models.paciente_models import Paciente
+
+FIRST_NAMES = [
+    "José", "João", "Maria", "Ana", "Antônio", "Francisco", "Carlos", "Paulo",
+    "Lúcia", "Fernanda", "Márcia", "Luís", "Sebastião", "Conceição", "Inês",
+    "Rafael", "Gabriela", "Letícia", "Vinícius", "Júlia", "André", "Cláudia",
+]
+LAST_NAMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Pereira", "Lima", "Carvalho",
+    "Gonçalves", "Araújo", "Ribeiro", "Rodrigues", "Almeida", "Nascimento",
+    "Conceição", "Magalhães", "Brandão", "Assunção", "Fonseca", "Guimarães",
+]
+
+# (rótulo, termo): exato, prefixo, sem acento, com erro de digitação, email
+QUERIES = [
+    ("nome exato", "Gonçalves"),
+    ("prefixo", "Magal"),
+    ("sem acento", "conceicao"),
+    ("erro de digitação", "Guimaraens"),
+    ("email", "paciente12345@"),
+]
+
+
+def _rows(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    for i in range(n):
+        nome = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+        yield {
+            "email": f"paciente{i}@clinica.com.br",
+            "nome": nome,
+            "data_nascimento": date(rng.randint(1940, 2005), rng.randint(1, 12), rng.randint(1, 28)),
+            "tabagismo_atual": rng.random() < 0.2,
+            "historico_familiar_dc": rng.random() < 0.4,
+            "consultas_ultimo_ano": rng.randint(0, 12),
+            "imc": round(rng.uniform(17, 42), 1),
+            "pressao_sistolica_mmHg": rng.randint(100, 180),
+            "pressao_diastolica_mmHg": rng.randint(60, 110),
+            "glicemia_jejum_mg_dl": rng.randint(70, 200),
+            "colesterol_total_mg_dl": rng.randint(140, 300),
+            "hdl_mg_dl": rng.randint(30, 80),
+            "triglicerides_mg_dl": rng.randint(60, 400),
+        }
+
+
+def seed(engine, n: int, chunk_size: int = 5000) -> None:
+    """Recria a tabela e insere N pacientes sintéticos em lotes."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    setup_search(engine)
+
+    chunk = []
+    with engine.begin() as conn:
+        for row in _rows(n):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                conn.execute(insert(Paciente), chunk)
+                chunk = []
+        if chunk:
+            conn.execute(insert(Paciente), chunk)
+
+
+def legacy_search(db, search: str, page_size: int = 10):
+    """Caminho original do get_multi: ILIKE em nome/email + COUNT + OFFSET."""
+    query = db.query(Paciente).filter(
+        (Paciente.nome.ilike(f"%{search}%")) |
+        (Paciente.email.ilike(f"%{search}%"))
+    )
+    total = query.count()
+    pacientes = query.order_by(Paciente.created_at.desc()).limit(page_size).all()
+    return pacientes, total
+
+
+def indexed_search(db, search: str, page_size: int = 10):
+    return crud_paciente.get_multi(db, page=1, page_size=page_size, search=search)
+
+
+def _time(fn, db, term: str, repeat: int) -> float:
+    """Mediana (ms) de 'repeat' execuções, após um aquecimento."""
+    fn(db, term)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(db, term)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(sizes, database_url, repeat: int) -> list:
+    results = []
+    for n in sizes:
+        url = database_url
+        if url is None:
+            path = os.path.join(tempfile.mkdtemp(), f"search_{n}.db")
+            url = f"sqlite:///{path}"
+        engine = create_engine(url)
+        install_sqlite_functions(engine)
+
+        start = time.perf_counter()
+        seed(engine, n)
+        print(f"\n== {n} pacientes ({engine.dialect.name}; carga em {time.perf_counter() - start:.1f}s)")
+        print(f"{'consulta':<20} {'termo':<16} {'ILIKE ms':>10} {'índice ms':>10} {'ganho':>7} {'hits':>7}")
+
+        db = sessionmaker(bind=engine)()
+        try:
+            for label, term in QUERIES:
+                legacy_ms = _time(legacy_search, db, term, repeat)
+                indexed_ms = _time(indexed_search, db, term, repeat)
+                legacy_hits = legacy_search(db, term)[1]
+                hits = indexed_search(db, term)[1]
+                print(
+                    f"{label:<20} {term:<16} {legacy_ms:>10.2f} {indexed_ms:>10.2f} "
+                    f"{legacy_ms / indexed_ms:>6.1f}x {hits:>7}"
+                )
+                results.append({
+                    "size": n, "query": label, "term": term,
+                    "ilike_ms": legacy_ms, "indexed_ms": indexed_ms,
+                    "ilike_hits": legacy_hits, "indexed_hits": hits,
+                })
+        finally:
+            db.close()
+            engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    run(sizes, args.database_url, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Verificação do startup: 'import app.main' sem efeitos colaterais e dentro
+do orçamento de tempo.
+
+Em processos novos (import a frio), importa o app com a rede e o banco
+vigiados e falha (código de saída 1) se:
+  - alguma conexão de rede ou resolução de nome for tentada;
+  - alguma conexão com o banco for aberta (pool do SQLAlchemy ou sqlite3),
+    ou o arquivo do banco SQLite for criado;
+  - a mediana do tempo de import passar de --budget-ms.
+
+Uso (a partir de backend/):
+    python -m benchmarks.startup_check --runs 5 --budget-ms 1500 --top 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Executado no processo filho: vigia rede/banco e mede o import
+CHILD = r"""
+import json, socket, sqlite3, sys, time
+
+calls = []
+
+def _blocked(name):
+    def blocked(*args, **kwargs):
+        calls.append(f"{name}{args[1:] if name.startswith('socket.') else args}")
+        raise OSError(f"{name} bloqueado durante o import")
+    return blocked
+
+socket.socket.connect = _blocked("socket.connect")
+socket.socket.connect_ex = _blocked("socket.connect_ex")
+socket.create_connection = _blocked("create_connection")
+socket.getaddrinfo = _blocked("getaddrinfo")
+sqlite3.connect = _blocked("sqlite3.connect")
+
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+@event.listens_for(Pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    calls.append("db pool connect")
+
+start = time.perf_counter()
+error = None
+try:
+    import app.main
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed_ms, "calls": calls, "error": error}))
+"""
+
+
+def _env(db_path: str) -> dict:
+    env = dict(os.environ)
+    # Settings exige estas variáveis; os serviços apontam para hosts que
+    # nunca devem ser resolvidos durante o import
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "SECRET_KEY": "startup-check",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+        "ML_SERVICE_URL": "http://ml.invalid/classify",
+        "LLM_SERVICE_URL": "http://llm.invalid/generate",
+        "DB_INIT_ON_STARTUP": "false",
+    })
+    return env
+
+
+def _run_child(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=False
+    )
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"ms": None, "calls": [], "error": result.stderr.strip()[-2000:]}
+    report = json.loads(lines[-1])
+    # Qualquer saída antes do relatório é um print no import
+    report["output"] = lines[:-1]
+    return report
+
+
+def _slowest_imports(env: dict, top: int) -> list:
+    """Módulos com maior tempo acumulado de import (python -X importtime)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env, capture_output=True, text=True, check=False,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue # Cabeçalho ou outra saída
+        rows.append((int(fields[1]), fields[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def run(runs: int, budget_ms: float, top: int) -> bool:
+    db_path = os.path.join(tempfile.mkdtemp(), "startup.db")
+    env = _env(db_path)
+
+    reports = [_run_child(env) for _ in range(runs)]
+    errors = [r["error"] for r in reports if r["error"]]
+    calls = sorted({call for r in reports for call in r["calls"]})
+    output = sorted({line for r in reports for line in r.get("output", [])})
+    timings = [r["ms"] for r in reports if r["ms"] is not None]
+
+    ok = True
+    if errors:
+        ok = False
+        print(f"ERRO no import: {errors[0]}")
+    if calls:
+        ok = False
+        print("ERRO: o import acessou a rede/banco:")
+        for call in calls:
+            print(f"  - {call}")
+    if os.path.exists(db_path):
+        ok = False
+        print(f"ERRO: o import criou o arquivo do banco ({db_path})")
+    if output:
+        ok = False
+        print("ERRO: o import escreveu na saída padrão:")
+        for line in output:
+            print(f"  {line}")
+
+    if timings:
+        median = statistics.median(timings)
+        status = "ok" if median <= budget_ms else "ACIMA DO ORÇAMENTO"
+        print(f"import app.main: mediana {median:.0f} ms em {len(timings)} execuções "
+              f"(orçamento {budget_ms:.0f} ms) -> {status}")
+        ok = ok and median <= budget_ms
+
+    if top:
+        print("\nImports mais lentos (tempo acumulado):")
+        for cumulative_us, name in _slowest_imports(env, top):
+            print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    print("\nOK" if ok else "\nFALHOU")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=0, help="Lista os N imports mais lentos")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.runs, args.budget_ms, args.top) else 1)
+
+
+if __name__ == "__main__":
+    main()